@@ -0,0 +1,94 @@
+"""
+Benchmark suite of the API and data pipeline.
+
+Generates a seeded synthetic dataset (benchmarks/datasets.py), runs the
+micro benchmarks (benchmarks/micro.py) and the in-process API load test
+(benchmarks/load.py), and writes the results as JSON. With --compare the run
+is checked against an earlier result file; the exit status is 1 when a
+benchmark's median got slower by more than --threshold.
+
+Usage (from backend-app/):
+    python -m benchmarks --size medium --output benchmark_results.json
+    python -m benchmarks --size medium --compare benchmark_results.json --output new.json
+    python -m benchmarks --suite micro --group features
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import (
+    MAX_TIME, MIN_ROUNDS, REGRESSION_THRESHOLD, compare_results, load_results, save_results,
+)
+from benchmarks.datasets import SIZES, dataset
+
+SUITES = ("micro", "load")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API and data pipeline benchmarks")
+    parser.add_argument("--size", default="small", choices=sorted(SIZES), help="synthetic dataset size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--suite", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--group", nargs="+", help="only these micro benchmark groups")
+    parser.add_argument("--endpoint", nargs="+", help="only these load-test endpoints")
+    parser.add_argument("--rounds", type=int, default=MIN_ROUNDS, help="minimum timed rounds per micro benchmark")
+    parser.add_argument("--max-time", type=float, default=MAX_TIME, help="minimum seconds per micro benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients of the load test")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown of the median reported as a regression")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    cwd = os.getcwd()
+    previous = load_results(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="wpm-benchmark-")
+    try:
+        from benchmarks.load import isolate, write_sources
+
+        # Before the app's modules are imported: their settings are read at import time
+        isolate(workdir)
+        started = time.perf_counter()
+        sales, orders = dataset(args.size, args.seed)
+        print(f"Dataset '{args.size}': {len(sales)} daily sales rows, {sales['product'].nunique()} products, "
+              f"{len(orders)} order lines ({time.perf_counter() - started:.1f}s)")
+
+        results = []
+        if "micro" in args.suite:
+            from benchmarks.harness import run_micro
+            from benchmarks.micro import prepare
+
+            print("Micro benchmarks:")
+            results += run_micro(prepare(sales, orders, workdir), args.group, args.rounds, args.max_time)
+        if "load" in args.suite:
+            from benchmarks.load import run_load
+
+            write_sources(sales, orders, workdir)
+            print(f"API load test ({args.requests} requests per endpoint, {args.concurrency} concurrent):")
+            results += run_load(args.requests, args.concurrency, endpoints=args.endpoint)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    settings = {"size": args.size, "seed": args.seed, "rows": len(sales), "order_lines": len(orders),
+                "requests": args.requests, "concurrency": args.concurrency}
+    current = save_results(output, results, settings)
+    print(f"Results saved to {output}")
+
+    if previous is not None:
+        rows, regressions = compare_results(previous, current, args.threshold)
+        print(f"Compared with {args.compare} (median):")
+        for name, before, after, change in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"  {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({change:+.1%}){flag}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
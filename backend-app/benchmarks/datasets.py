@@ -0,0 +1,27 @@
+"""
+Synthetic datasets for the benchmark suite.
+
+The data comes from data_ingestion/synthetic_data.py: the daily sales of
+every product x day are drawn in one vectorized pass (with the default mix of
+steady, seasonal, trending, promo and intermittent products) and the order
+export is derived from them, so the completed order lines add up to the
+daily sales.
+
+Everything is seeded: the same size and seed give the same data on every run,
+which keeps benchmark results comparable between commits.
+"""
+from data_ingestion.synthetic_data import SyntheticSales
+
+# products, days
+SIZES = {
+    'small': (200, 365),
+    'medium': (2000, 730),
+    'large': (5000, 1095),
+}
+START_DATE = '2022-01-01'
+
+
+def dataset(size='small', seed=42):
+    """(daily sales, order lines) for one of SIZES or a (products, days) tuple."""
+    n_products, n_days = SIZES[size] if isinstance(size, str) else size
+    return SyntheticSales(n_products, n_days, START_DATE, seed=seed).dataset()
@@ -0,0 +1,168 @@
+"""
+Timing harness and result files of the benchmark suite.
+
+Micro benchmarks follow pytest-benchmark's model without depending on it: a
+benchmark is a function registered with @benchmark(group) that receives a
+`bench` callable and the suite's data, and calls bench(fn, *args). fn is run
+once untimed, then timed until it has run at least `min_rounds` times and for
+at least `max_time` seconds; `setup` (untimed) builds fresh arguments for
+every round when fn modifies its input.
+
+Results are written as JSON (machine and commit info plus one entry per
+benchmark with min/max/mean/stddev/median/iqr/ops, and p50/p95/p99/rps for
+the load test) so a later run can be compared with compare_results().
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+MIN_ROUNDS = 5
+MAX_TIME = 1.0
+MAX_ROUNDS = 1000
+REGRESSION_THRESHOLD = 0.10
+
+REGISTRY = []
+
+
+def benchmark(group, name=None):
+    """Register a micro benchmark `fn(bench, data)` under `group`."""
+    def register(fn):
+        REGISTRY.append((group, name or fn.__name__, fn))
+        return fn
+    return register
+
+
+def timing_stats(seconds):
+    """pytest-benchmark style statistics of a list of durations (in seconds)."""
+    values = np.asarray(seconds, dtype=np.float64)
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    mean = float(values.mean())
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": mean,
+        "stddev": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "median": float(median),
+        "iqr": float(q3 - q1),
+        "rounds": len(values),
+        "ops": 1 / mean if mean > 0 else None,
+    }
+
+
+class Bench:
+    """The `bench` callable handed to a benchmark; keeps the stats of its last call."""
+
+    def __init__(self, min_rounds=MIN_ROUNDS, max_time=MAX_TIME, max_rounds=MAX_ROUNDS):
+        self.min_rounds = min_rounds
+        self.max_time = max_time
+        self.max_rounds = max_rounds
+        self.stats = None
+        self.params = {}
+
+    def __call__(self, fn, *args, setup=None, **kwargs):
+        if setup is not None:
+            args = setup()
+        result = fn(*args, **kwargs)  # warmup (imports, caches)
+        durations = []
+        began = time.perf_counter()
+        while len(durations) < self.max_rounds and (
+                len(durations) < self.min_rounds or time.perf_counter() - began < self.max_time):
+            if setup is not None:
+                args = setup()
+            start = time.perf_counter()
+            fn(*args, **kwargs)
+            durations.append(time.perf_counter() - start)
+        self.stats = timing_stats(durations)
+        return result
+
+
+def run_micro(data, groups=None, min_rounds=MIN_ROUNDS, max_time=MAX_TIME, report=print):
+    """Run the registered micro benchmarks (optionally only `groups`); returns their result entries."""
+    results = []
+    for group, name, fn in REGISTRY:
+        if groups and group not in groups:
+            continue
+        bench = Bench(min_rounds, max_time)
+        fn(bench, data)
+        results.append({"group": group, "name": f"{group}.{name}", "params": bench.params, "stats": bench.stats})
+        if report is not None:
+            report(f"  {group}.{name}: median {bench.stats['median'] * 1000:.1f} ms "
+                   f"({bench.stats['rounds']} rounds)")
+    return results
+
+
+def machine_info():
+    import pandas as pd
+
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def commit_info():
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"id": git("rev-parse", "HEAD"), "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+                "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, benchmarks, settings):
+    document = {
+        "datetime": datetime.now(timezone.utc).isoformat(),
+        "machine_info": machine_info(),
+        "commit_info": commit_info(),
+        "settings": settings,
+        "benchmarks": benchmarks,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return document
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(previous, current, threshold=REGRESSION_THRESHOLD, stat="median"):
+    """Rows (name, previous, current, change) for benchmarks present in both, and the names that regressed.
+
+    A benchmark regressed when its `stat` grew by more than `threshold`
+    (relative). Results of different dataset sizes are not comparable.
+    """
+    if previous.get("settings", {}).get("size") != current.get("settings", {}).get("size"):
+        raise ValueError("The results were produced with different dataset sizes")
+    before = {entry["name"]: entry["stats"][stat] for entry in previous["benchmarks"]}
+    rows, regressions = [], []
+    for entry in current["benchmarks"]:
+        name, value = entry["name"], entry["stats"][stat]
+        if name not in before or not before[name]:
+            continue
+        change = value / before[name] - 1
+        rows.append((name, before[name], value, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def percentile_stats(latencies, elapsed):
+    """Latency percentiles (seconds) and throughput of one load-test endpoint."""
+    stats = timing_stats(latencies)
+    p50, p95, p99 = np.percentile(np.asarray(latencies), [50, 95, 99])
+    stats.update({"p50": float(p50), "p95": float(p95), "p99": float(p99),
+                  "rps": len(latencies) / elapsed if elapsed > 0 else None})
+    return stats
@@ -0,0 +1,105 @@
+"""
+In-process load test of the API.
+
+The FastAPI app is driven through httpx's ASGI transport (no server, no
+sockets), with the lifespan run as in production. Every endpoint gets
+`warmup` untimed requests (so the dataset caches are filled), then `requests`
+timed ones issued by `concurrency` concurrent clients. Reported per endpoint:
+latency p50/p95/p99 and the usual timing stats (seconds), requests per second
+and the number of error responses.
+
+isolate() must run before main (or any module reading these settings) is
+imported: the database, Parquet store, model registry and CSV sources all
+point into the benchmark's working directory, never at real data.
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.harness import percentile_stats
+
+ADMIN_LOGIN = {"email": "admin@example.com", "password": "admin123"}
+
+# name, method, path, JSON body
+ENDPOINTS = [
+    ("dashboard", "GET", "/api/dashboard/1", None),
+    ("sales_forecasts_page", "GET", "/api/sales-forecasts/1?limit=100", None),
+    ("orders_page", "GET", "/api/woocommerce/orders/1?limit=100", None),
+    ("products_page", "GET", "/api/woocommerce/products/1?limit=100", None),
+    ("reorder_report", "GET", "/api/inventory/reorder/1?only_reorder=true", None),
+    ("cache_stats", "GET", "/api/system/cache", None),
+    ("login", "POST", "/api/auth/login", ADMIN_LOGIN),
+]
+
+
+def isolate(workdir):
+    """Point the app's storage settings at `workdir` and make it the working directory."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.sqlite3')}"
+    os.environ["SALES_STORE_DIR"] = os.path.join(workdir, "store")
+    os.environ["MODEL_REGISTRY_DIR"] = os.path.join(workdir, "model_registry")
+    os.environ["WOOCOMMERCE_SYNC_DIR"] = os.path.join(workdir, "woocommerce_sync")
+    os.chdir(workdir)
+
+
+def write_sources(sales, orders, workdir):
+    """The sources the endpoints read: the sales in the store, the WooCommerce exports as CSV."""
+    from storage.parquet_store import ParquetStore, SALES_FEATURES, DEFAULT_ORGANIZATION_ID
+
+    ParquetStore(os.environ["SALES_STORE_DIR"]).write(SALES_FEATURES, sales, DEFAULT_ORGANIZATION_ID)
+    daily = sales.assign(quantity=sales['sales'])
+    daily.to_csv(os.path.join(workdir, "woocommerce_sales_with_features.csv"), index=False)
+    if not os.path.exists(os.path.join(workdir, "woocommerce_orders_export.csv")):
+        orders.to_csv(os.path.join(workdir, "woocommerce_orders_export.csv"), index=False)
+
+
+async def _drive(client, method, path, body, headers, count, concurrency):
+    latencies, errors = [], 0
+    remaining = count
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - began
+
+
+async def _run(app, requests, concurrency, warmup, endpoints, report):
+    import httpx
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            login = await client.post("/api/auth/login", json=ADMIN_LOGIN)
+            headers = {"Authorization": f"Bearer {login.json()['data']['access_token']}"}
+            for name, method, path, body in endpoints:
+                await _drive(client, method, path, body, headers, warmup, 1)
+                latencies, errors, elapsed = await _drive(client, method, path, body, headers, requests, concurrency)
+                stats = percentile_stats(latencies, elapsed)
+                results.append({
+                    "group": "api",
+                    "name": f"api.{name}",
+                    "params": {"method": method, "path": path, "requests": requests, "concurrency": concurrency,
+                               "errors": errors},
+                    "stats": stats,
+                })
+                if report is not None:
+                    report(f"  api.{name}: p50 {stats['p50'] * 1000:.1f} ms, p95 {stats['p95'] * 1000:.1f} ms, "
+                           f"p99 {stats['p99'] * 1000:.1f} ms, {stats['rps']:.0f} req/s"
+                           + (f", {errors} errors" if errors else ""))
+    return results
+
+
+def run_load(requests=200, concurrency=8, warmup=5, endpoints=None, report=print):
+    """Load-test the API endpoints (all of ENDPOINTS, or those named in `endpoints`); returns result entries."""
+    import main
+
+    selected = [e for e in ENDPOINTS if not endpoints or e[0] in endpoints]
+    return asyncio.run(_run(main.app, requests, concurrency, warmup, selected, report))
@@ -0,0 +1,68 @@
+"""
+Micro benchmarks of the data pipeline: ingestion, feature engineering, safety
+stock and serialization, each run on the suite's synthetic dataset.
+"""
+import os
+
+from benchmarks.harness import benchmark
+from data_ingestion.process_woocommerce_export import WooCommerceDataProcessor
+from deployment.serialization import dumps, forecast_columns, order_columns, records
+from feature_engineering import window_features
+from models.safety_stock_and_reorder import compute_reorder_report
+
+SERIALIZATION_ROWS = 10000  # rows of one serialized listing page
+
+
+def prepare(sales, orders, workdir):
+    """The data handed to every benchmark; writes the order export CSV into `workdir`."""
+    orders_csv = os.path.join(workdir, "woocommerce_orders_export.csv")
+    orders.to_csv(orders_csv, index=False)
+    return {"sales": sales, "orders": orders, "orders_csv": orders_csv}
+
+
+@benchmark("ingestion")
+def export_csv_to_daily_sales(bench, data):
+    bench.params = {"rows": len(data["orders"])}
+    bench(lambda: WooCommerceDataProcessor().daily_sales(data["orders_csv"]))
+
+
+@benchmark("ingestion")
+def order_lines_to_daily_sales(bench, data):
+    bench.params = {"rows": len(data["orders"])}
+    bench(WooCommerceDataProcessor().daily_sales_frame, data["orders"])
+
+
+@benchmark("features")
+def build_window_features(bench, data):
+    sales = data["sales"][['date', 'product', 'sales']]
+    bench.params = {"rows": len(sales)}
+    # build_features adds columns to its input: every round gets a fresh copy
+    bench(window_features.build_features, setup=lambda: (sales.copy(),))
+
+
+@benchmark("safety_stock")
+def reorder_report(bench, data):
+    bench.params = {"rows": len(data["sales"]), "products": int(data["sales"]['product'].nunique())}
+    bench(compute_reorder_report, data["sales"])
+
+
+@benchmark("serialization")
+def forecast_listing(bench, data):
+    page = data["sales"].head(SERIALIZATION_ROWS).rename(columns={'sales': 'quantity'})
+    bench.params = {"rows": len(page)}
+
+    def serialize():
+        columns = forecast_columns(page, 1)
+        return dumps({"success": True, "data": records(columns)}, columns)
+    bench(serialize)
+
+
+@benchmark("serialization")
+def order_listing(bench, data):
+    page = data["orders"].head(SERIALIZATION_ROWS)
+    bench.params = {"rows": len(page)}
+
+    def serialize():
+        columns = order_columns(page)
+        return dumps({"success": True, "data": records(columns)}, columns)
+    bench(serialize)
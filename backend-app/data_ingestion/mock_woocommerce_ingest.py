@@ -1,24 +1,26 @@
-import pandas as pd
-import numpy as np
+"""
+Mock daily sales for three products (mock_sales.csv: date, product, sales).
+
+Two years up to today with a yearly cycle around 20 sales a day, drawn in one
+pass by data_ingestion/synthetic_data.py (use that module directly for
+larger datasets).
+
+Usage (from backend-app/):
+    python -m data_ingestion.mock_woocommerce_ingest
+"""
 from datetime import datetime, timedelta
 
+from data_ingestion.synthetic_data import SyntheticSales
+
 # Parameters
 days = 365 * 2  # 2 years of data
 products = ['Widget A', 'Widget B', 'Widget C']
-np.random.seed(42)
+mock_profile = {'level': 20, 'yearly': 0.25, 'weekly': 0}
 
-rows = []
 start_date = datetime.today() - timedelta(days=days)
-for day in range(days):
-    date = start_date + timedelta(days=day)
-    for product in products:
-        sales = np.random.poisson(lam=20 + 5 * np.sin(2 * np.pi * day / 365) + np.random.randn())
-        rows.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'product': product,
-            'sales': max(sales, 0)
-        })
-
-df = pd.DataFrame(rows)
+generator = SyntheticSales(len(products), days, start_date, profiles=['mock'] * len(products),
+                           specs={'mock': mock_profile}, names=products, seed=42)
+df = generator.daily_sales()[['date', 'product', 'sales']]
+df['date'] = df['date'].dt.strftime('%Y-%m-%d')
 df.to_csv('mock_sales.csv', index=False)
-print('Mock sales data saved to mock_sales.csv') 
\ No newline at end of file
+print('Mock sales data saved to mock_sales.csv')
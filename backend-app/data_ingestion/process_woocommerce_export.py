@@ -1,26 +1,129 @@
+"""
+WooCommerce order export -> daily sales per product.
+
+WooCommerceDataProcessor streams the export in chunks of `chunksize` rows,
+reading only the columns it needs with explicit dtypes. Each chunk is
+filtered to completed orders and reduced to per-(date, product) quantities,
+and the partial sums are merged into a running total. Peak memory therefore
+depends on the chunk size and the number of distinct (date, product) keys,
+not on the size of the export.
+
+The daily sales are written to the `cleaned_sales` dataset of the Parquet
+store (replacing the organization's previous data); --output additionally
+exports them as CSV.
+
+Usage (from backend-app/):
+    python -m data_ingestion.process_woocommerce_export --input woocommerce_orders_export.csv
+"""
+import argparse
+import os
+
 import pandas as pd
 
+from storage.parquet_store import sales_store, ParquetStore, CLEANED_SALES, DEFAULT_ORGANIZATION_ID, STORE_DIR
+
 # Sample WooCommerce export file name
-input_file = 'woocommerce_orders_export.csv'
-output_file = 'cleaned_sales.csv'
+INPUT_FILE = 'woocommerce_orders_export.csv'
+OUTPUT_FILE = 'cleaned_sales.csv'
+
+CHUNK_ROWS = int(os.getenv("WOOCOMMERCE_CHUNK_ROWS", "100000"))
+
+REQUIRED_COLUMNS = {'date_created', 'product_name', 'quantity'}
+
+# Dtypes of the export columns the processor reads; dates are parsed per chunk
+EXPORT_DTYPES = {
+    'date_created': 'string',
+    'product_name': 'string',
+    'quantity': 'Int64',
+    'status': 'string',
+}
+
+
+class WooCommerceDataProcessor:
+    def __init__(self, chunksize=CHUNK_ROWS, encoding='utf-8'):
+        self.chunksize = chunksize
+        self.encoding = encoding
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.chunks = 0
+        self.peak_keys = 0
+
+    def _columns(self, input_file):
+        header = pd.read_csv(input_file, nrows=0, encoding=self.encoding).columns
+        if not REQUIRED_COLUMNS.issubset(header):
+            raise ValueError(f"Input file must contain columns: {REQUIRED_COLUMNS}")
+        return [column for column in header if column in EXPORT_DTYPES]
+
+    def iter_completed(self, input_file):
+        """Chunks of completed order lines (all lines if the export has no status column)."""
+        columns = self._columns(input_file)
+        reader = pd.read_csv(input_file, usecols=columns, dtype={c: EXPORT_DTYPES[c] for c in columns},
+                             chunksize=self.chunksize, encoding=self.encoding)
+        for chunk in reader:
+            self.chunks += 1
+            self.rows_read += len(chunk)
+            if 'status' in chunk.columns:
+                chunk = chunk[(chunk['status'].str.lower() == 'completed').fillna(False)]
+            self.rows_kept += len(chunk)
+            yield chunk
+
+    def daily_sales(self, input_file=INPUT_FILE):
+        """DataFrame(date, product, sales) with the quantity sold per product and day."""
+        return self._reduce(self.iter_completed(input_file))
+
+    def daily_sales_frame(self, lines):
+        """daily_sales() for order lines already in memory (e.g. synced from the REST API)."""
+        if 'status' in lines.columns:
+            lines = lines[(lines['status'].astype('string').str.lower() == 'completed').fillna(False)]
+        return self._reduce([lines])
+
+    def _reduce(self, chunks):
+        total = None
+        for chunk in chunks:
+            dates = pd.to_datetime(chunk['date_created']).dt.normalize()
+            partial = chunk['quantity'].groupby([dates.rename('date'), chunk['product_name']]).sum()
+            total = partial if total is None else pd.concat([total, partial]).groupby(level=[0, 1]).sum()
+            self.peak_keys = max(self.peak_keys, len(total))
+
+        if total is None:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'product': pd.Series(dtype='string'),
+                                 'sales': pd.Series(dtype='Int64')})
+        agg = total.sort_index().reset_index()
+        return agg.rename(columns={'product_name': 'product', 'quantity': 'sales'})
 
-# Read the WooCommerce export (assume UTF-8 and ',' separator)
-df = pd.read_csv(input_file, parse_dates=['date_created'])
+    def process(self, input_file=INPUT_FILE, output_file=None, organization_id=DEFAULT_ORGANIZATION_ID, store=None):
+        """Aggregate the export into the store's cleaned_sales (and `output_file`, if given, as CSV)."""
+        agg = self.daily_sales(input_file)
+        (store or sales_store).write(CLEANED_SALES, agg, organization_id)
+        if output_file:
+            agg.to_csv(output_file, index=False)
+        return agg
 
-# Filter for completed orders only (if status column exists)
-if 'status' in df.columns:
-    df = df[df['status'].str.lower() == 'completed']
+    def stats(self):
+        return {
+            "chunks": self.chunks,
+            "rows_read": self.rows_read,
+            "rows_kept": self.rows_kept,
+            "peak_keys": self.peak_keys,
+        }
 
-# Ensure necessary columns exist
-required_cols = {'date_created', 'product_name', 'quantity'}
-if not required_cols.issubset(df.columns):
-    raise ValueError(f"Input file must contain columns: {required_cols}")
 
-# Aggregate daily sales per product
-df['date'] = df['date_created'].dt.date
-agg = df.groupby(['date', 'product_name'])['quantity'].sum().reset_index()
-agg = agg.rename(columns={'product_name': 'product', 'quantity': 'sales'})
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate a WooCommerce order export into daily sales per product")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", help=f"also export the daily sales as CSV (e.g. {OUTPUT_FILE})")
+    parser.add_argument("--organization-id", type=int, default=DEFAULT_ORGANIZATION_ID)
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument("--encoding", default="utf-8")
+    args = parser.parse_args()
 
-# Save cleaned data
-agg.to_csv(output_file, index=False)
-print(f'Cleaned sales data saved to {output_file}') 
\ No newline at end of file
+    processor = WooCommerceDataProcessor(chunksize=args.chunksize, encoding=args.encoding)
+    store = ParquetStore(args.store)
+    processor.process(args.input, args.output, args.organization_id, store)
+    stats = processor.stats()
+    print(f"Read {stats['rows_read']} order lines in {stats['chunks']} chunks, "
+          f"kept {stats['rows_kept']} completed, {stats['peak_keys']} (date, product) keys")
+    print(f'Cleaned sales data saved to {store.path(CLEANED_SALES, args.organization_id)}')
+    if args.output:
+        print(f'Exported as CSV to {args.output}')
@@ -0,0 +1,358 @@
+"""
+Vectorized synthetic sales and WooCommerce order exports.
+
+SyntheticSales draws the daily sales of every product x date cell in a few
+array operations (one Poisson draw per block of products) instead of a Python
+loop per cell, so a 10k-product x 3-year dataset takes seconds.
+
+Every product follows a profile, and its parameters are drawn from the
+profile's ranges (`level` log-uniformly, the others uniformly):
+
+- level:              mean daily sales before the effects below
+- growth:             yearly trend (0.2 = +20% per year, compounded daily)
+- yearly / weekly:    amplitude of the yearly sine and of the weekend uplift
+- promo_rate:         promotions per year, each lasting `promo_days` days
+                      and multiplying demand by `promo_lift`
+- demand_probability: share of days with any demand (intermittency)
+
+PROFILES has steady, seasonal, trending, promo and intermittent products;
+`mix` sets the share of each, `profiles` assigns them per product, and
+`specs` adds or overrides profiles.
+
+order_lines() turns daily sales into a WooCommerce-style order export: each
+(date, product) with sales is one completed line, lines of the same day are
+grouped into orders, and extra processing/refunded/cancelled lines are added,
+so the completed lines add up to the daily sales.
+
+Products are generated in blocks of `block_products` with a random stream
+per block (the data depends on the seed and the block size only), and
+write() streams the blocks to CSV or Parquet files, or into the Parquet
+store's cleaned_sales, so datasets larger than memory can be produced.
+
+Usage (from backend-app/):
+    python -m data_ingestion.synthetic_data --products 10000 --days 1095 --format parquet --output data/synthetic
+    python -m data_ingestion.synthetic_data --verify
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+START_DATE = '2022-01-01'
+BLOCK_PRODUCTS = int(os.getenv("SYNTHETIC_BLOCK_PRODUCTS", "1000"))
+
+# Parameter ranges of each profile: (low, high) draws uniformly (log-uniformly for level), a number is fixed
+PROFILES = {
+    'steady': {'level': (2, 40), 'growth': (-0.05, 0.05), 'yearly': (0, 0.1), 'weekly': (0, 0.1)},
+    'seasonal': {'level': (2, 40), 'growth': (-0.05, 0.1), 'yearly': (0.3, 0.8), 'weekly': (0.05, 0.3)},
+    'trending': {'level': (1, 20), 'growth': (0.2, 1.0), 'yearly': (0, 0.2), 'weekly': (0, 0.2)},
+    'promo': {'level': (2, 30), 'yearly': (0, 0.2), 'weekly': (0, 0.2), 'promo_rate': (4, 12),
+              'promo_lift': (1.5, 3.0), 'promo_days': (3, 10)},
+    'intermittent': {'level': (1, 4), 'growth': (-0.1, 0.1), 'demand_probability': (0.05, 0.3)},
+}
+PARAMETER_DEFAULTS = {'level': 5.0, 'growth': 0.0, 'yearly': 0.0, 'weekly': 0.0, 'promo_rate': 0.0,
+                      'promo_lift': 1.0, 'promo_days': 0, 'demand_probability': 1.0}
+DEFAULT_MIX = {'steady': 0.3, 'seasonal': 0.25, 'trending': 0.1, 'promo': 0.15, 'intermittent': 0.2}
+PRICE_RANGE = (5, 200)
+
+ORDER_STATUSES = np.array(['completed', 'processing', 'refunded', 'cancelled'], dtype=object)
+STATUS_WEIGHTS = [0.85, 0.07, 0.04, 0.04]
+ORDER_LINE_COLUMNS = ['order_id', 'date_created', 'product_id', 'product_name', 'quantity', 'line_total',
+                      'status', 'customer_id', 'total']
+CUSTOMERS = 5000
+
+
+def _draw(rng, spec, n, log=False):
+    if np.isscalar(spec):
+        return np.full(n, float(spec))
+    low, high = spec
+    if log:
+        return np.exp(rng.uniform(np.log(low), np.log(high), n))
+    return rng.uniform(low, high, n)
+
+
+class SyntheticSales:
+    def __init__(self, products=1000, days=365, start=START_DATE, mix=None, profiles=None, specs=None, names=None,
+                 seed=42, block_products=BLOCK_PRODUCTS, lines_per_order=2.0):
+        self.days = days
+        self.dates = pd.date_range(pd.Timestamp(start).normalize(), periods=days)
+        self.seed = seed
+        self.block_products = block_products
+        self.lines_per_order = lines_per_order
+        self.specs = {**PROFILES, **(specs or {})}
+        self.names = (np.asarray(names, dtype=object) if names is not None
+                      else np.array([f"Product {i:05d}" for i in range(1, products + 1)], dtype=object))
+        self.parameters = self._parameters(len(self.names), mix or DEFAULT_MIX, profiles)
+
+    def _parameters(self, n, mix, profiles):
+        """One row of profile parameters (and a price) per product."""
+        rng = np.random.default_rng([self.seed, 0])
+        if profiles is None:
+            names = list(mix)
+            weights = np.asarray([mix[name] for name in names], dtype=np.float64)
+            profiles = rng.choice(np.asarray(names, dtype=object), n, p=weights / weights.sum())
+        profiles = np.asarray(profiles, dtype=object)
+        unknown = set(profiles) - set(self.specs)
+        if unknown:
+            raise ValueError(f"Unknown profiles: {', '.join(sorted(unknown))} (available: {', '.join(self.specs)})")
+
+        parameters = pd.DataFrame({'product_id': np.arange(1, n + 1), 'product': self.names, 'profile': profiles})
+        for name, default in PARAMETER_DEFAULTS.items():
+            values = np.full(n, float(default))
+            for profile in np.unique(profiles):
+                mask = profiles == profile
+                values[mask] = _draw(rng, self.specs[profile].get(name, default), int(mask.sum()), log=name == 'level')
+            parameters[name] = values
+        parameters['promo_days'] = parameters['promo_days'].round().astype(np.int64)
+        parameters['phase'] = rng.uniform(0, 2 * np.pi, n)
+        parameters['price'] = rng.integers(*PRICE_RANGE, n).astype(np.float64)
+        return parameters
+
+    # -- daily sales -----------------------------------------------------
+
+    def _rng(self, block):
+        return np.random.default_rng([self.seed, 1, block])
+
+    def grid(self, block):
+        """Daily sales matrix (products of `block` x days) drawn in one pass."""
+        p = self.parameters.iloc[block * self.block_products:(block + 1) * self.block_products]
+        rng = self._rng(block)
+        n, t = len(p), np.arange(self.days, dtype=np.float64)
+        col = lambda name: p[name].to_numpy()[:, None]  # noqa: E731
+
+        mean = col('level') * (1 + col('growth')) ** (t / 365.25)
+        mean = mean * (1 + col('yearly') * np.sin(2 * np.pi * t / 365.25 + col('phase')))
+        weekend = np.asarray(self.dates.dayofweek >= 5)[None, :]
+        mean = mean * (1 + col('weekly') * weekend)
+
+        # A promotion is active for promo_days days after each start
+        starts = rng.random((n, self.days)) < col('promo_rate') / 365.25
+        running = np.cumsum(starts, axis=1)
+        before = np.arange(self.days)[None, :] - col('promo_days')
+        previous = np.where(before >= 0, np.take_along_axis(running, np.clip(before, 0, None), axis=1), 0)
+        promo = (running - previous) > 0
+        mean = mean * np.where(promo, col('promo_lift'), 1.0)
+
+        demand = rng.random((n, self.days)) < col('demand_probability')
+        return rng.poisson(np.clip(mean, 0, None)) * demand
+
+    @property
+    def blocks(self):
+        return -(-len(self.parameters) // self.block_products)
+
+    def block_sales(self, block):
+        """DataFrame(date, product, product_id, sales) of one block, sorted by date then product."""
+        matrix = self.grid(block)
+        p = self.parameters.iloc[block * self.block_products:(block + 1) * self.block_products]
+        return pd.DataFrame({
+            'date': np.repeat(self.dates.to_numpy(), len(p)),
+            'product': np.tile(p['product'].to_numpy(), self.days),
+            'product_id': np.tile(p['product_id'].to_numpy(), self.days),
+            'sales': matrix.T.ravel(),
+        })
+
+    def daily_sales(self):
+        """All products' daily sales in memory (date, product, product_id, sales), sorted by date then product."""
+        frames = [self.block_sales(block) for block in range(self.blocks)]
+        sales = pd.concat(frames, ignore_index=True) if frames else self.block_sales(0)
+        return sales.sort_values(['date', 'product_id'], kind='stable', ignore_index=True)
+
+    # -- order export ----------------------------------------------------
+
+    def order_lines(self, sales, block=0, first_order_id=1000):
+        """WooCommerce-style order export (one row per line item) for `sales`."""
+        rng = np.random.default_rng([self.seed, 2, block])
+        completed = sales[sales['sales'] > 0]
+        extra = completed.sample(frac=sum(STATUS_WEIGHTS[1:]), random_state=rng.integers(2 ** 31))
+        lines = pd.concat([completed.assign(extra=False), extra.assign(extra=True)], ignore_index=True)
+        lines = lines.sort_values('date', kind='stable', ignore_index=True)
+        n = len(lines)
+
+        day = lines['date'].to_numpy()
+        new_order = rng.random(n) < 1 / self.lines_per_order
+        new_order[:1] = True
+        new_order[1:] |= day[1:] != day[:-1]
+        order_index = np.cumsum(new_order) - 1
+        n_orders = int(order_index[-1]) + 1 if n else 0
+        # Orders mixing completed and extra lines keep per-line statuses (lines are what the processor filters on)
+        weights = np.asarray(STATUS_WEIGHTS[1:]) / sum(STATUS_WEIGHTS[1:])
+        order_status = rng.choice(ORDER_STATUSES[1:], n_orders, p=weights)
+        status = np.where(lines['extra'].to_numpy(), order_status[order_index], ORDER_STATUSES[0])
+
+        prices = self.parameters['price'].to_numpy()[lines['product_id'].to_numpy() - 1]
+        line_total = lines['sales'].to_numpy() * prices
+        order_total = np.bincount(order_index, weights=line_total, minlength=n_orders)
+        created = lines['date'] + pd.to_timedelta(rng.integers(0, 86400, n_orders)[order_index], unit='s')
+        return pd.DataFrame({
+            'order_id': first_order_id + order_index,
+            'date_created': created.dt.strftime('%Y-%m-%d %H:%M:%S'),
+            'product_id': lines['product_id'],
+            'product_name': lines['product'],
+            'quantity': lines['sales'],
+            'line_total': line_total.astype(np.float64),
+            'status': status,
+            'customer_id': rng.integers(1, CUSTOMERS, n_orders)[order_index],
+            'total': order_total[order_index],
+        }, columns=ORDER_LINE_COLUMNS)
+
+    def iter_blocks(self, orders=True):
+        """(daily sales, order lines or None) per block of products; order ids are unique across blocks."""
+        next_order_id = 1000
+        for block in range(self.blocks):
+            sales = self.block_sales(block)
+            lines = None
+            if orders:
+                lines = self.order_lines(sales, block, next_order_id)
+                if len(lines):
+                    next_order_id = int(lines['order_id'].max()) + 1
+            yield sales, lines
+
+    def dataset(self):
+        """(daily sales, order lines) in memory; use write() for datasets that do not fit."""
+        blocks = list(self.iter_blocks())
+        sales = pd.concat([s for s, _ in blocks], ignore_index=True)
+        lines = pd.concat([o for _, o in blocks], ignore_index=True)
+        return sales.sort_values(['date', 'product_id'], kind='stable', ignore_index=True), lines
+
+    # -- output ----------------------------------------------------------
+
+    def write(self, output_dir, fmt='parquet', orders=True):
+        """Stream the blocks to sales.<fmt> (and order_lines.<fmt>) in `output_dir`; returns the row counts."""
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError("fmt must be 'csv' or 'parquet'")
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = {'sales': _ChunkWriter(os.path.join(output_dir, f"sales.{fmt}"), fmt)}
+        if orders:
+            outputs['order_lines'] = _ChunkWriter(os.path.join(output_dir, f"order_lines.{fmt}"), fmt)
+        try:
+            for sales, lines in self.iter_blocks(orders):
+                outputs['sales'].write(sales)
+                if orders:
+                    outputs['order_lines'].write(lines)
+        finally:
+            for writer in outputs.values():
+                writer.close()
+        return {name: writer.rows for name, writer in outputs.items()}
+
+    def write_store(self, store, organization_id=1, dataset=None):
+        """Replace the organization's `dataset` (default cleaned_sales) with the synthetic sales, block by block."""
+        from storage.parquet_store import CLEANED_SALES
+
+        dataset = dataset or CLEANED_SALES
+        rows = 0
+        for block, (sales, _) in enumerate(self.iter_blocks(orders=False)):
+            frame = sales[['date', 'product', 'sales']]
+            rows += (store.write if block == 0 else store.append)(dataset, frame, organization_id)
+        return rows
+
+
+class _ChunkWriter:
+    """Appends DataFrames to one CSV or Parquet file."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def verify(products=120, days=400, block_products=50):
+    """Check chunked output, order export and profiles on a small dataset; returns the problems found."""
+    from data_ingestion.process_woocommerce_export import WooCommerceDataProcessor
+
+    generator = SyntheticSales(products, days, block_products=block_products, seed=7)
+    sales, lines = generator.dataset()
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ('csv', 'parquet'):
+            counts = generator.write(os.path.join(tmp, fmt), fmt)
+            path = os.path.join(tmp, fmt, f"sales.{fmt}")
+            written = pd.read_csv(path, parse_dates=['date']) if fmt == 'csv' else pd.read_parquet(path)
+            written = written.sort_values(['date', 'product_id'], kind='stable', ignore_index=True)
+            if counts != {'sales': len(sales), 'order_lines': len(lines)} or not written.equals(sales):
+                problems.append(f"{fmt} output differs from the in-memory dataset")
+        export = os.path.join(tmp, "csv", "order_lines.csv")
+        daily = WooCommerceDataProcessor().daily_sales(export)
+        expected = sales[sales['sales'] > 0].groupby(['date', 'product'])['sales'].sum()
+        processed = daily.set_index(['date', 'product'])['sales'].astype(np.int64)
+        if not processed.sort_index().equals(expected.sort_index().astype(np.int64)):
+            problems.append("completed order lines do not add up to the daily sales")
+    if len(lines) and lines.groupby('order_id')['date_created'].nunique().max() > 1:
+        problems.append("an order id is shared by orders of different days")
+
+    zero_share = (sales['sales'] == 0).groupby(sales['product_id']).mean()
+    profile = generator.parameters.set_index('product_id')['profile']
+    by_profile = zero_share.groupby(profile).mean()
+    if 'intermittent' in by_profile and by_profile['intermittent'] <= by_profile.drop('intermittent').max():
+        problems.append("intermittent products do not have the most days without sales")
+    if not SyntheticSales(products, days, block_products=block_products, seed=7).daily_sales().equals(sales):
+        problems.append("the same seed does not reproduce the data")
+    return problems
+
+
+if __name__ == "__main__":
+    from storage.parquet_store import ParquetStore, CLEANED_SALES, DEFAULT_ORGANIZATION_ID, STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Generate synthetic daily sales and a WooCommerce order export")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", default=START_DATE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", nargs="+", metavar="PROFILE=SHARE",
+                        help=f"profile shares (default: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv", "store"],
+                        help="files in --output, or the Parquet store's cleaned_sales")
+    parser.add_argument("--output", default="data/synthetic", help="output directory (parquet/csv)")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory (--format store)")
+    parser.add_argument("--organization-id", type=int, default=DEFAULT_ORGANIZATION_ID)
+    parser.add_argument("--no-orders", action="store_true", help="only write the daily sales")
+    parser.add_argument("--block-products", type=int, default=BLOCK_PRODUCTS, help="products generated per block")
+    parser.add_argument("--verify", action="store_true", help="check the generator on a small dataset")
+    args = parser.parse_args()
+
+    if args.verify:
+        problems = verify()
+        for problem in problems:
+            print(f"  {problem}")
+        print("Synthetic data OK" if not problems else "Synthetic data FAILED")
+        raise SystemExit(1 if problems else 0)
+
+    mix = None
+    if args.mix:
+        mix = {name: float(share) for name, share in (item.split("=", 1) for item in args.mix)}
+    generator = SyntheticSales(args.products, args.days, args.start, mix=mix, seed=args.seed,
+                               block_products=args.block_products)
+    started = time.perf_counter()
+    if args.format == "store":
+        counts = {"sales": generator.write_store(ParquetStore(args.store), args.organization_id)}
+        target = f"{CLEANED_SALES} of organization {args.organization_id} in {args.store}"
+    else:
+        counts = generator.write(args.output, args.format, orders=not args.no_orders)
+        target = args.output
+    seconds = time.perf_counter() - started
+    print(f"Generated {args.products} products x {args.days} days "
+          f"({generator.parameters['profile'].value_counts().to_dict()}): "
+          + ", ".join(f"{rows} {name} rows" for name, rows in counts.items())
+          + f" in {seconds:.1f}s; saved to {target}")
@@ -0,0 +1,169 @@
+"""
+Local stand-in for the WooCommerce REST API, for exercising the sync engine.
+
+Serves generated orders and products under /wp-json/wc/v3/ with the parts of
+the real API the sync relies on: HTTP Basic authentication, page/per_page
+pagination with X-WP-Total and X-WP-TotalPages headers, orderby=modified and
+strict modified_after / modified_before filters on date_modified_gmt. Every
+`rate_limit_every`-th request is answered with 429 and Retry-After: 0.
+
+    with StandInServer(orders=500) as server:
+        ...  # server.url, server.consumer_key, server.consumer_secret
+"""
+import base64
+import json
+import math
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/wp-json/wc/v3/"
+STATUSES = ["completed", "completed", "completed", "processing", "on-hold", "cancelled", "refunded"]
+
+
+def _stamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class StandInServer:
+    def __init__(self, orders=1000, products=50, rate_limit_every=0, seed=42,
+                 consumer_key="ck_standin", consumer_secret="cs_standin"):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.rate_limit_every = rate_limit_every
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self._start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.products = [self._product(i + 1) for i in range(products)]
+        self.orders = [self._order(1000 + i, self._start + timedelta(minutes=37 * i)) for i in range(orders)]
+        self._server = None
+        self._thread = None
+
+    def _product(self, product_id):
+        created = self._start - timedelta(days=self._random.randint(30, 400))
+        return {
+            "id": product_id,
+            "name": f"Product {product_id}",
+            "categories": [{"id": product_id % 5 + 1, "name": f"Category {product_id % 5 + 1}"}],
+            "price": f"{self._random.randint(5, 200)}.00",
+            "status": "publish",
+            "stock_quantity": self._random.randint(0, 500),
+            "date_created": _stamp(created),
+            "date_created_gmt": _stamp(created),
+            "date_modified_gmt": _stamp(created + timedelta(days=self._random.randint(0, 29))),
+        }
+
+    def _order(self, order_id, created):
+        items = [
+            {"product_id": product["id"], "name": product["name"], "quantity": self._random.randint(1, 5),
+             "total": f"{self._random.randint(5, 500)}.00"}
+            for product in self._random.sample(self.products, self._random.randint(1, min(3, len(self.products))))
+        ]
+        return {
+            "id": order_id,
+            "status": self._random.choice(STATUSES),
+            "date_created": _stamp(created),
+            "date_created_gmt": _stamp(created),
+            "date_modified_gmt": _stamp(created + timedelta(minutes=self._random.randint(0, 30))),
+            "customer_id": self._random.randint(1, 300),
+            "total": f"{sum(float(item['total']) for item in items):.2f}",
+            "line_items": items,
+        }
+
+    def modify(self, orders=0, products=0, new_orders=0, now=None):
+        """Change some records (stamped with `now`, default the current time); returns how many records changed."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            for order in self._random.sample(self.orders, min(orders, len(self.orders))):
+                order["status"] = self._random.choice(STATUSES)
+                order["line_items"][0]["quantity"] += 1
+                order["date_modified_gmt"] = _stamp(now)
+            for product in self._random.sample(self.products, min(products, len(self.products))):
+                product["stock_quantity"] = self._random.randint(0, 500)
+                product["date_modified_gmt"] = _stamp(now)
+            next_id = max((order["id"] for order in self.orders), default=999) + 1
+            for i in range(new_orders):
+                order = self._order(next_id + i, now)
+                order["date_modified_gmt"] = _stamp(now)
+                self.orders.append(order)
+        return {"orders": min(orders, len(self.orders)) + new_orders, "products": min(products, len(self.products))}
+
+    def page(self, resource, query):
+        """(status, headers, body) for one API request."""
+        records = {"orders": self.orders, "products": self.products}.get(resource)
+        if records is None:
+            return 404, {}, {"code": "rest_no_route"}
+        per_page = int(query.get("per_page", ["10"])[0])
+        page = int(query.get("page", ["1"])[0])
+        modified_after = query.get("modified_after", [None])[0]
+        modified_before = query.get("modified_before", [None])[0]
+        with self._lock:
+            selected = [dict(record) for record in records
+                        if (modified_after is None or record["date_modified_gmt"] > modified_after)
+                        and (modified_before is None or record["date_modified_gmt"] < modified_before)]
+        if query.get("orderby", [None])[0] == "modified":
+            selected.sort(key=lambda record: (record["date_modified_gmt"], record["id"]),
+                          reverse=query.get("order", ["desc"])[0] == "desc")
+        total_pages = max(1, math.ceil(len(selected) / per_page))
+        headers = {"X-WP-Total": str(len(selected)), "X-WP-TotalPages": str(total_pages)}
+        return 200, headers, selected[(page - 1) * per_page:page * per_page]
+
+    def _handler(self):
+        server = self
+        expected_auth = "Basic " + base64.b64encode(
+            f"{self.consumer_key}:{self.consumer_secret}".encode()).decode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                with server._lock:
+                    server.requests += 1
+                    limited = server.rate_limit_every and server.requests % server.rate_limit_every == 0
+                    server.rate_limited += bool(limited)
+                if self.headers.get("Authorization") != expected_auth:
+                    status, headers, body = 401, {}, {"code": "woocommerce_rest_cannot_view"}
+                elif limited:
+                    status, headers, body = 429, {"Retry-After": "0"}, {"code": "rate_limited"}
+                elif not url.path.startswith(API_PREFIX):
+                    status, headers, body = 404, {}, {"code": "rest_no_route"}
+                else:
+                    status, headers, body = server.page(url.path[len(API_PREFIX):].strip("/"), parse_qs(url.query))
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,436 @@
+"""
+Incremental WooCommerce REST sync.
+
+WooCommerceClient reads /wp-json/wc/v3/orders and /products with an async
+httpx client over one bounded connection pool (orders and products, and the
+syncs of several organizations, share it). A resource is read in disjoint
+date_modified_gmt windows (modified_after / modified_before) fetched
+concurrently: the first page and the newest change give the time span, which
+is split into as many windows as the pool has connections (at most one per
+page). Each window is read with keyset paging, oldest change first: every
+request asks for the first page of records modified after the last
+date_modified_gmt seen so far, less CURSOR_OVERLAP_SECONDS since the filter
+has one-second resolution; when a whole page shares one second the window
+cannot advance and the next page of the same window is read instead. The
+last window is open-ended: a record edited while the sync runs moves into it
+(never between offset pages), and it is read again once the other windows
+are done. 429 and 5xx responses are retried with the server's Retry-After,
+or with exponential backoff and jitter when it sends none.
+
+WooCommerceSync keeps a `modified_after` cursor per organization and resource
+(`<WOOCOMMERCE_SYNC_DIR>/organization_<id>.json`), so a sync only transfers
+records changed since the previous one. The cursor is the newest
+date_modified_gmt seen; requests overlap it by CURSOR_OVERLAP_SECONDS and
+records are upserted by id, so records sharing the cursor's second are not
+lost.
+
+Synced orders are flattened to one row per line item (the columns of the
+order export) and upserted into the store's woocommerce_orders dataset and
+products (with their first category) into woocommerce_products. Only the
+month partitions holding fetched records (or their previous versions) are
+rewritten, and the organization's cleaned_sales is re-aggregated for those
+months only.
+
+Connection settings come from WOOCOMMERCE_URL, WOOCOMMERCE_CONSUMER_KEY and
+WOOCOMMERCE_CONSUMER_SECRET; a `_<organization_id>` suffix overrides them for
+one organization.
+
+Check against the local stand-in server (data_ingestion/woocommerce_standin.py):
+    python -m data_ingestion.woocommerce_sync --standin
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from data_ingestion.process_woocommerce_export import WooCommerceDataProcessor
+from storage.parquet_store import sales_store, months_of, ParquetStore, CLEANED_SALES, MONTH_COLUMN
+
+WOOCOMMERCE_ORDERS = "woocommerce_orders"
+WOOCOMMERCE_PRODUCTS = "woocommerce_products"
+
+SYNC_DIR = os.getenv("WOOCOMMERCE_SYNC_DIR", "data/woocommerce_sync")
+MAX_CONNECTIONS = int(os.getenv("WOOCOMMERCE_MAX_CONNECTIONS", "8"))
+PER_PAGE = 100  # WooCommerce's maximum page size
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 30.0
+CURSOR_OVERLAP_SECONDS = 1
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+ORDER_LINE_COLUMNS = ['order_id', 'date_created', 'product_id', 'product_name', 'quantity', 'line_total',
+                      'status', 'customer_id', 'total', 'date_modified']
+PRODUCT_COLUMNS = ['product_id', 'name', 'category', 'price', 'status', 'stock_quantity', 'date_created',
+                   'date_modified']
+
+
+class WooCommerceNotConfigured(Exception):
+    pass
+
+
+class WooCommerceSyncError(Exception):
+    pass
+
+
+def connection_settings(organization_id):
+    """(url, consumer_key, consumer_secret) for the organization; raises WooCommerceNotConfigured."""
+    values = []
+    for name in ("WOOCOMMERCE_URL", "WOOCOMMERCE_CONSUMER_KEY", "WOOCOMMERCE_CONSUMER_SECRET"):
+        value = os.getenv(f"{name}_{organization_id}") or os.getenv(name)
+        if not value:
+            raise WooCommerceNotConfigured(f"{name} is not set for organization {organization_id}")
+        values.append(value)
+    return tuple(values)
+
+
+def _gmt(value):
+    """WooCommerce *_gmt timestamps carry no offset; return them as aware UTC datetimes."""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def _wc_time(value):
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class WooCommerceClient:
+    def __init__(self, base_url, consumer_key, consumer_secret, max_connections=MAX_CONNECTIONS, per_page=PER_PAGE,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE_SECONDS, timeout=REQUEST_TIMEOUT_SECONDS):
+        import httpx
+
+        self.per_page = per_page
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_windows = max_connections
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/wp-json/wc/v3/",
+            auth=(consumer_key, consumer_secret),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.requests = 0
+        self.retries = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), BACKOFF_MAX_SECONDS)
+            except ValueError:
+                pass
+        return min(self.backoff_base * 2 ** attempt, BACKOFF_MAX_SECONDS) * (0.5 + random.random() / 2)
+
+    async def get_page(self, resource, params, page, per_page=None):
+        """(records, total_pages) of one page; retries rate limits, server and connection errors."""
+        import httpx
+
+        params = {**params, "page": page, "per_page": per_page or self.per_page}
+        for attempt in range(self.max_retries + 1):
+            response = None
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    response = await self._client.get(resource, params=params)
+                except httpx.TransportError as e:
+                    error = e
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    error = f"HTTP {response.status_code}"
+            if attempt == self.max_retries:
+                raise WooCommerceSyncError(f"{resource} page {page}: giving up after {attempt + 1} attempts ({error})")
+            self.retries += 1
+            await asyncio.sleep(self._delay(attempt, response))
+        if response.status_code >= 400:
+            raise WooCommerceSyncError(f"{resource} page {page}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json(), int(response.headers.get("X-WP-TotalPages", "1"))
+
+    async def fetch_all(self, resource, modified_after=None):
+        """Every record of `resource` (modified after `modified_after`, if given), read in concurrent windows."""
+        params = {"orderby": "modified", "order": "asc", "dates_are_gmt": "true"}
+        if resource == "orders":
+            params["status"] = "any"
+        if modified_after is not None:
+            params["modified_after"] = _wc_time(modified_after)
+        records = {}
+        (first, total_pages), (newest, _) = await asyncio.gather(
+            self.get_page(resource, params, 1), self.get_page(resource, {**params, "order": "desc"}, 1, per_page=1))
+        _keep(records, first)
+        if len(first) < self.per_page:
+            return list(records.values())
+
+        # Window bounds, whole seconds between the oldest and the newest change
+        oldest, newest = _gmt(first[0]["date_modified_gmt"]), _gmt(newest[0]["date_modified_gmt"])
+        count = max(1, min(self.max_windows, total_pages))
+        bounds = {(oldest + (newest - oldest) * i / count).replace(microsecond=0) for i in range(1, count)}
+        bounds = sorted(bound for bound in bounds if bound > oldest)
+        starts = [modified_after, *bounds]
+        ends = [*bounds, None]
+
+        closed_done = asyncio.Event()
+        # The first page is the start of the first window
+        after, page = _next_window(first, modified_after, 1)
+        windows = [self._fetch_window(resource, params, after, ends[0], records, page=page,
+                                      done=closed_done if ends[0] is None else None)]
+        windows += [self._fetch_window(resource, params, start - timedelta(seconds=CURSOR_OVERLAP_SECONDS), end,
+                                       records, done=closed_done if end is None else None)
+                    for start, end in zip(starts[1:], ends[1:])]
+        closed, open_window = windows[:-1], windows[-1]
+
+        async def read_closed():
+            try:
+                await asyncio.gather(*closed)
+            finally:
+                closed_done.set()
+
+        await asyncio.gather(read_closed(), open_window)
+        return list(records.values())
+
+    async def _fetch_window(self, resource, params, after, before, records, page=1, done=None):
+        """Keyset-page the records modified after `after` and before `before` into `records`.
+
+        The open-ended window (no `before`) is read again from where it
+        stopped once `done` is set, so records edited meanwhile are not missed.
+        """
+        params = dict(params)
+        if before is not None:
+            params["modified_before"] = _wc_time(before + timedelta(seconds=CURSOR_OVERLAP_SECONDS))
+        while True:
+            if after is not None:
+                params["modified_after"] = _wc_time(after)
+            batch, _ = await self.get_page(resource, params, page)
+            _keep(records, batch)
+            if len(batch) < self.per_page:
+                if done is None or done.is_set():
+                    return
+                await done.wait()
+                continue
+            after, page = _next_window(batch, after, page)
+
+
+def _keep(records, batch):
+    """Add `batch` to `records` by id; a record read twice (the windows overlap) keeps its latest version."""
+    for record in batch:
+        previous = records.get(record["id"])
+        if previous is None or (previous.get("date_modified_gmt") or "") <= (record.get("date_modified_gmt") or ""):
+            records[record["id"]] = record
+
+
+def _next_window(batch, after, page):
+    """(modified_after, page) of the request following a full page."""
+    window = _gmt(batch[-1]["date_modified_gmt"]) - timedelta(seconds=CURSOR_OVERLAP_SECONDS)
+    if after is not None and window <= after:
+        return after, page + 1
+    return window, 1
+
+
+def order_lines(orders):
+    """One row per line item, with the columns of the WooCommerce order export."""
+    rows = [
+        {
+            'order_id': order['id'],
+            'date_created': (order.get('date_created') or '').replace('T', ' '),
+            'product_id': item.get('product_id'),
+            'product_name': item.get('name'),
+            'quantity': item.get('quantity'),
+            'line_total': item.get('total'),
+            'status': order.get('status'),
+            'customer_id': order.get('customer_id'),
+            'total': order.get('total'),
+            'date_modified': order.get('date_modified_gmt'),
+        }
+        for order in orders
+        for item in order.get('line_items') or []
+    ]
+    df = pd.DataFrame(rows, columns=ORDER_LINE_COLUMNS)
+    return df.astype({'order_id': 'int64', 'product_id': 'Int64', 'quantity': 'Int64', 'customer_id': 'Int64',
+                      'line_total': 'float64'})
+
+
+def product_rows(products):
+    df = pd.DataFrame([
+        {
+            'product_id': product['id'],
+            'name': product.get('name'),
+            # The first category; forecasts are reconciled per category (models/hierarchy.py)
+            'category': next((c.get('name') for c in product.get('categories') or []), None),
+            'price': product.get('price') or '0',
+            'status': product.get('status'),
+            'stock_quantity': product.get('stock_quantity'),
+            'date_created': (product.get('date_created') or '').replace('T', ' '),
+            'date_modified': product.get('date_modified_gmt'),
+        }
+        for product in products
+    ], columns=PRODUCT_COLUMNS)
+    return df.astype({'product_id': 'int64', 'stock_quantity': 'Int64'})
+
+
+class WooCommerceSync:
+    def __init__(self, store=None, state_dir=SYNC_DIR, max_connections=MAX_CONNECTIONS, per_page=PER_PAGE,
+                 backoff_base=BACKOFF_BASE_SECONDS):
+        self.store = store or sales_store
+        self.state_dir = state_dir
+        self.max_connections = max_connections
+        self.per_page = per_page
+        self.backoff_base = backoff_base
+
+    def _state_path(self, organization_id):
+        return os.path.join(self.state_dir, f"organization_{int(organization_id)}.json")
+
+    def load_cursors(self, organization_id):
+        path = self._state_path(organization_id)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_cursors(self, organization_id, cursors):
+        os.makedirs(self.state_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.state_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cursors, f)
+        os.replace(tmp, self._state_path(organization_id))
+
+    async def sync(self, organization_id, connection=None, full=False):
+        """Fetch the organization's changed orders and products and merge them into the store."""
+        base_url, key, secret = connection or connection_settings(organization_id)
+        cursors = {} if full else self.load_cursors(organization_id)
+        since = {}
+        for resource in ("orders", "products"):
+            cursor = cursors.get(resource)
+            since[resource] = _gmt(cursor) - timedelta(seconds=CURSOR_OVERLAP_SECONDS) if cursor else None
+
+        began = time.perf_counter()
+        async with WooCommerceClient(base_url, key, secret, self.max_connections, self.per_page,
+                                     backoff_base=self.backoff_base) as client:
+            orders, products = await asyncio.gather(client.fetch_all("orders", since["orders"]),
+                                                    client.fetch_all("products", since["products"]))
+        fetch_seconds = time.perf_counter() - began
+
+        # Merging reads and rewrites Parquet partitions: keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.merge, organization_id, orders, products, full or not cursors)
+
+        for resource, records in (("orders", orders), ("products", products)):
+            newest = max((_gmt(r["date_modified_gmt"]) for r in records if r.get("date_modified_gmt")), default=None)
+            previous = cursors.get(resource)
+            if newest is not None and (previous is None or newest > _gmt(previous)):
+                cursors[resource] = _wc_time(newest)
+        self._save_cursors(organization_id, cursors)
+        return {
+            "orders": len(orders),
+            "products": len(products),
+            "requests": client.requests,
+            "retries": client.retries,
+            "fetch_seconds": round(fetch_seconds, 3),
+            "cursors": cursors,
+        }
+
+    def merge(self, organization_id, orders, products, replace=False):
+        """Upsert the fetched records by id (replacing everything when `replace`)."""
+        if orders or replace:
+            lines, months = self._upsert(WOOCOMMERCE_ORDERS, order_lines(orders), 'order_id', organization_id,
+                                         replace)
+            if months is not None and not self.store.exists(CLEANED_SALES, organization_id):
+                lines, months = self.store.read(WOOCOMMERCE_ORDERS, organization_id=organization_id), None
+            daily = WooCommerceDataProcessor().daily_sales_frame(lines)
+            if months is None:
+                self.store.write(CLEANED_SALES, daily, organization_id)
+            else:
+                self.store.replace_months(CLEANED_SALES, daily, organization_id, months)
+        if products or replace:
+            self._upsert(WOOCOMMERCE_PRODUCTS, product_rows(products), 'product_id', organization_id, replace)
+
+    def _upsert(self, dataset, rows, key, organization_id, replace):
+        """Upsert `rows` by `key`; returns the rows of the rewritten months and the months (None: all of them)."""
+        if replace or not self.store.exists(dataset, organization_id):
+            self.store.write(dataset, rows, organization_id, date_col='date_created')
+            return rows, None
+        # The months of the fetched records and of their stored versions (an order's month does not change,
+        # but a record edited on the server must not be left behind in its old partition)
+        stored = self.store.read(dataset, columns=[key, MONTH_COLUMN], organization_id=organization_id,
+                                 filters={key: rows[key].unique().tolist()})
+        months = sorted(set(months_of(rows['date_created']).dropna()) | set(stored[MONTH_COLUMN].astype(str)))
+        existing = self.store.read(dataset, organization_id=organization_id, filters={MONTH_COLUMN: months})
+        existing = existing[~existing[key].isin(rows[key])]
+        rows = pd.concat([existing, rows], ignore_index=True) if len(existing) else rows
+        self.store.replace_months(dataset, rows, organization_id, months, date_col='date_created')
+        return rows, months
+
+
+def sync_organization(organization_id, full=False):
+    """Coroutine syncing one organization with the default store and cursor directory."""
+    return WooCommerceSync().sync(organization_id, full=full)
+
+
+def _check_against_standin(args):
+    from data_ingestion.woocommerce_standin import StandInServer
+
+    with tempfile.TemporaryDirectory() as tmp, StandInServer(orders=args.orders, products=args.products,
+                                                              rate_limit_every=7) as server:
+        sync = WooCommerceSync(ParquetStore(os.path.join(tmp, "store")), os.path.join(tmp, "sync"),
+                               backoff_base=0.01)
+        connection = (server.url, server.consumer_key, server.consumer_secret)
+
+        first = asyncio.run(sync.sync(1, connection))
+        print(f"Full sync: {first['orders']} orders, {first['products']} products, "
+              f"{first['requests']} requests ({first['retries']} retried) in {first['fetch_seconds']}s")
+        server.modify(orders=25, products=5, new_orders=10)
+        second = asyncio.run(sync.sync(1, connection))
+        print(f"Incremental sync: {second['orders']} orders, {second['products']} products, "
+              f"{second['requests']} requests ({second['retries']} retried) in {second['fetch_seconds']}s")
+
+        problems = []
+        if first['orders'] != args.orders or first['products'] != args.products:
+            problems.append("full sync did not fetch every record")
+        for resource, records in (("orders", server.orders), ("products", server.products)):
+            since = _gmt(first['cursors'][resource]) - timedelta(seconds=CURSOR_OVERLAP_SECONDS)
+            changed = sum(_gmt(record['date_modified_gmt']) > since for record in records)
+            if second[resource] != changed:
+                problems.append(f"incremental sync fetched {second[resource]} {resource}, expected {changed}")
+
+        columns = ['order_id', 'product_id', 'quantity', 'status']
+        stored = sync.store.read(WOOCOMMERCE_ORDERS, columns=columns, organization_id=1)
+        expected = order_lines(server.orders)[columns]
+        if sorted(stored.astype(str).values.tolist()) != sorted(expected.astype(str).values.tolist()):
+            problems.append("stored order lines differ from the server")
+        stored = sync.store.read(WOOCOMMERCE_PRODUCTS, columns=['product_id', 'stock_quantity'], organization_id=1)
+        if sorted(stored.astype(str).values.tolist()) != sorted(
+                [str(p['id']), str(p['stock_quantity'])] for p in server.products):
+            problems.append("stored products differ from the server")
+        if server.rate_limited == 0 or first['retries'] == 0:
+            problems.append("rate limiting was not exercised")
+        for problem in problems:
+            print(f"  {problem}")
+        print("Stand-in sync OK" if not problems else "Stand-in sync FAILED")
+        return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync WooCommerce orders and products into the Parquet store")
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--full", action="store_true", help="ignore the stored cursors and fetch everything")
+    parser.add_argument("--standin", action="store_true",
+                        help="run a full and an incremental sync against the local stand-in server and check them")
+    parser.add_argument("--orders", type=int, default=1000, help="orders served by the stand-in server")
+    parser.add_argument("--products", type=int, default=50, help="products served by the stand-in server")
+    args = parser.parse_args()
+
+    if args.standin:
+        raise SystemExit(0 if _check_against_standin(args) else 1)
+    result = asyncio.run(sync_organization(args.organization_id, full=args.full))
+    print(f"Synced {result['orders']} orders and {result['products']} products "
+          f"in {result['requests']} requests ({result['retries']} retried)")
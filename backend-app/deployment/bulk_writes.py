@@ -0,0 +1,131 @@
+"""
+Batched validation and writing of large request bodies.
+
+POST /api/sales-forecasts/{organization_id}/bulk accepts a JSON array or an
+NDJSON stream (Content-Type application/x-ndjson, one object per line) of any
+size. The rows are cut into batches of BULK_BATCH_ROWS; each batch is
+validated against a Pydantic model row by row and its valid rows are handed
+to a set-based writer (one upsert per batch, committed per batch). NDJSON
+bodies are consumed as they arrive, so a batch is written while the client is
+still sending the next one.
+
+Parsing, validation and writing run in the data thread pool. Invalid rows do
+not fail their batch: they are counted and reported with their position in
+the body (up to BULK_MAX_ERRORS per batch), and the response lists the result
+of every batch. A batch whose write fails is logged with its traceback and
+reported to the client as failed without the exception text (which may carry
+SQL or connection details).
+"""
+import json
+import logging
+import os
+
+from pydantic import ValidationError
+
+from deployment.event_loop import run_blocking
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+BULK_BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", "5000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "20"))
+# application/json-seq (RFC 7464) frames records with RS characters, which the line splitter does not handle
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+WRITE_FAILED = "the batch could not be written"
+
+logger = logging.getLogger(__name__)
+
+
+def is_ndjson(content_type):
+    return (content_type or "").split(";")[0].strip().lower() in NDJSON_TYPES
+
+
+def _parse_array(body):
+    rows = _loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("expected a JSON array of rows (or an NDJSON body)")
+    return rows
+
+
+async def json_batches(request, batch_rows=BULK_BATCH_ROWS):
+    """(first row index, rows) batches of a JSON array body."""
+    rows = await run_blocking(_parse_array, await request.body())
+    for offset in range(0, len(rows), batch_rows):
+        yield offset, rows[offset:offset + batch_rows]
+
+
+async def ndjson_batches(request, batch_rows=BULK_BATCH_ROWS):
+    """(first row index, raw lines) batches of an NDJSON body, read as it streams in; blank lines are skipped."""
+    pending = b""
+    lines = []
+    first_row = 0
+    async for chunk in request.stream():
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        lines.extend(line for line in complete if line.strip())
+        while len(lines) >= batch_rows:
+            yield first_row, lines[:batch_rows]
+            first_row += batch_rows
+            lines = lines[batch_rows:]
+    if pending.strip():
+        lines.append(pending)
+    if lines:
+        yield first_row, lines
+
+
+def _message(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+                         for detail in error.errors(include_url=False))
+    return str(error)
+
+
+def process_batch(model, rows, first_row, write, parse=False, check=None, max_errors=BULK_MAX_ERRORS):
+    """Validate one batch and write its valid rows; returns the batch result."""
+    valid = []
+    errors = []
+    rejected = 0
+    for position, row in enumerate(rows):
+        try:
+            record = model.model_validate(_loads(row) if parse else row)
+            if check is not None:
+                check(record)
+        except ValueError as e:  # also covers ValidationError and JSON decode errors
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append({"row": first_row + position, "error": _message(e)})
+        else:
+            valid.append(record)
+    result = {"first_row": first_row, "rows": len(rows), "written": 0, "rejected": rejected, "errors": errors}
+    if valid:
+        try:
+            result["written"] = write(valid)
+        except Exception:
+            logger.exception("Bulk write of rows %d-%d failed", first_row, first_row + len(rows) - 1)
+            result["error"] = WRITE_FAILED
+    return result
+
+
+async def bulk_write(batches, model, write, parse=False, check=None):
+    """Run every batch of `batches` through process_batch(); returns totals and the per-batch results.
+
+    `write(records)` receives the validated model instances of one batch and
+    returns the number of rows written; `check(record)` may raise ValueError
+    to reject a row that is valid on its own.
+    """
+    results = []
+    async for first_row, rows in batches:
+        result = await run_blocking(process_batch, model, rows, first_row, write, parse, check)
+        result["batch"] = len(results)
+        results.append(result)
+    return {
+        "rows": sum(result["rows"] for result in results),
+        "written": sum(result["written"] for result in results),
+        "rejected": sum(result["rejected"] for result in results),
+        "failed_batches": sum("error" in result for result in results),
+        "batches": results,
+    }
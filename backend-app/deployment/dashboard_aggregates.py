@@ -0,0 +1,255 @@
+"""
+Materialized dashboard aggregates, maintained incrementally.
+
+The dashboard used to recompute the number of distinct products and the total
+quantity over the whole sales file on every request. This module keeps, per
+organization, the running rollups of its rows of the sales_features store
+dataset (quantity per product and per day, row count, grand total) and the
+finished summary, so a dashboard request is a dictionary lookup plus one
+stat() of the organization's store version file. Each organization has its
+own lock: refreshing one does not hold up requests for another.
+
+When the version changes the part files of the organization are listed. If
+the files seen before are all still there, the data was only appended to
+(incremental feature runs add part files) and only the new files are read
+and folded into the rollups; otherwise (a rebuild or a month rewritten) the
+aggregates are rebuilt from scratch.
+
+Verification:
+    python -m deployment.dashboard_aggregates --organization-id 1 --verify
+replays the organization's rows in slices through the incremental path (in
+a temporary store) and compares the result with a from-scratch recompute.
+"""
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from storage.parquet_store import ParquetStore, SALES_FEATURES, STORE_DIR, sales_store
+
+_NAN_KEY = None  # rollup key used for missing products / dates
+
+
+def _key(value):
+    return _NAN_KEY if pd.isna(value) else str(value)
+
+
+class OrganizationAggregates:
+    """Rollups of one organization's rows of a store dataset."""
+
+    def __init__(self, store, dataset, organization_id, date_col='date', product_col='product', value_col='sales'):
+        self.store = store
+        self.dataset = dataset
+        self.organization_id = organization_id
+        self.date_col = date_col
+        self.product_col = product_col
+        self.value_col = value_col
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.files = set()
+        self.row_count = 0
+        self.total_quantity = 0.0
+        self.product_quantities = defaultdict(float)
+        self.daily_quantities = defaultdict(float)
+        self.summary = None
+
+    def _read(self, files):
+        columns = [self.date_col, self.product_col, self.value_col]
+        return self.store.read_files(self.dataset, sorted(files), columns=columns)
+
+    def _fold(self, df):
+        """Add the rows of `df` to the rollups."""
+        self.row_count += len(df)
+        if df.empty:
+            return
+        quantity = df[self.value_col].astype(float)
+        self.total_quantity += float(quantity.sum())
+        per_product = quantity.groupby(df[self.product_col], dropna=False).sum()
+        for product, value in per_product.items():
+            self.product_quantities[_key(product)] += float(value)
+        days = pd.to_datetime(df[self.date_col]).dt.strftime('%Y-%m-%d')
+        for day, value in quantity.groupby(days, dropna=False).sum().items():
+            self.daily_quantities[_key(day)] += float(value)
+
+    def _finish(self):
+        self.summary = {
+            "totalProducts": len(self.product_quantities),
+            "totalForecastedSales": self.total_quantity,
+        } if self.row_count else None
+
+    def rebuild(self, files=None):
+        """Recompute every rollup from all of the organization's part files."""
+        if files is None:
+            files = set(self.store.files(self.dataset, self.organization_id))
+        self._reset()
+        self._fold(self._read(files))
+        self.files = set(files)
+        self._finish()
+
+    def refresh(self):
+        """Bring the rollups up to date with the store; returns how ("hit", "append", "rebuild", "missing")."""
+        try:
+            version = self.store.version(self.dataset, self.organization_id)
+        except FileNotFoundError:
+            self._reset()
+            return "missing"
+        if version == self.version:
+            return "hit"
+        files = set(self.store.files(self.dataset, self.organization_id))
+        mode = "rebuild"
+        if self.version is not None and self.files <= files:
+            try:
+                self._fold(self._read(files - self.files))
+            except FileNotFoundError:
+                # Rewritten while it was being read
+                pass
+            else:
+                self.files = files
+                self._finish()
+                mode = "append"
+        if mode == "rebuild":
+            self.rebuild(files)
+        self.version = version
+        return mode
+
+    def state(self):
+        return {
+            "row_count": self.row_count,
+            "total_quantity": self.total_quantity,
+            "product_quantities": dict(self.product_quantities),
+            "daily_quantities": dict(self.daily_quantities),
+            "summary": self.summary,
+        }
+
+
+class DashboardAggregateStore:
+    """Per-organization aggregate store shared by the dashboard endpoints."""
+
+    def __init__(self, store=sales_store, dataset=SALES_FEATURES):
+        self.store = store
+        self.dataset = dataset
+        self._organizations = {}
+        self._lock = threading.Lock()
+        self.appends = 0
+        self.rebuilds = 0
+
+    def _aggregates(self, organization_id):
+        with self._lock:
+            aggregates = self._organizations.get(organization_id)
+            if aggregates is None:
+                aggregates = self._organizations[organization_id] = OrganizationAggregates(
+                    self.store, self.dataset, organization_id)
+            return aggregates
+
+    def _refresh(self, aggregates):
+        # Called with aggregates.lock held
+        mode = aggregates.refresh()
+        if mode in ("append", "rebuild"):
+            with self._lock:
+                if mode == "append":
+                    self.appends += 1
+                else:
+                    self.rebuilds += 1
+
+    def summary(self, organization_id):
+        """Dashboard summary for `organization_id`, or None while it has no sales rows."""
+        aggregates = self._aggregates(organization_id)
+        with aggregates.lock:
+            self._refresh(aggregates)
+            return aggregates.summary
+
+    def rollups(self, organization_id, start=None, end=None, top=None):
+        """Quantity per day (within [start, end], "YYYY-MM-DD") and per product (the `top` largest first)."""
+        aggregates = self._aggregates(organization_id)
+        with aggregates.lock:
+            self._refresh(aggregates)
+            daily = sorted((day, value) for day, value in aggregates.daily_quantities.items()
+                           if day is not None and (start is None or day >= start) and (end is None or day <= end))
+            products = sorted(aggregates.product_quantities.items(), key=lambda item: (-item[1], str(item[0])))
+        return {
+            "daily": [{"date": day, "quantity": value} for day, value in daily],
+            "products": [{"product": product, "quantity": value} for product, value in products[:top]],
+            "totalProducts": len(products),
+        }
+
+    def verify(self, organization_id):
+        """Recompute `organization_id` from scratch and compare with the incremental state."""
+        aggregates = self._aggregates(organization_id)
+        with aggregates.lock:
+            self._refresh(aggregates)
+            scratch = OrganizationAggregates(self.store, self.dataset, organization_id)
+            scratch.rebuild(aggregates.files)
+            return compare_states(aggregates.state(), scratch.state())
+
+    def invalidate(self, organization_id=None):
+        with self._lock:
+            if organization_id is None:
+                self._organizations.clear()
+            else:
+                self._organizations.pop(organization_id, None)
+
+
+def compare_states(incremental, scratch, tolerance=1e-6):
+    """Differences between two rollup states (empty dict when they agree)."""
+    differences = {}
+    for name in ("row_count", "total_quantity"):
+        if abs(incremental[name] - scratch[name]) > tolerance:
+            differences[name] = (incremental[name], scratch[name])
+    for name in ("product_quantities", "daily_quantities"):
+        left, right = incremental[name], scratch[name]
+        keys = set(left) | set(right)
+        bad = {k: (left.get(k), right.get(k)) for k in keys
+               if k not in left or k not in right or abs(left[k] - right[k]) > tolerance}
+        if bad:
+            differences[name] = bad
+    left, right = incremental["summary"], scratch["summary"]
+    if (left is None) != (right is None) or (left is not None and (
+            left["totalProducts"] != right["totalProducts"]
+            or abs(left["totalForecastedSales"] - right["totalForecastedSales"]) > tolerance)):
+        differences["summary"] = (left, right)
+    return {"consistent": not differences, "differences": differences}
+
+
+# Shared instance used by the API process
+dashboard_aggregates = DashboardAggregateStore()
+
+
+def _replay(df, organization_id, slices, dataset=SALES_FEATURES):
+    """Feed `df` to a fresh aggregate through `slices` successive appends to a temporary store."""
+    step = max(1, len(df) // slices)
+    with tempfile.TemporaryDirectory(prefix="dashboard-replay-") as root:
+        store = ParquetStore(root)
+        store.write(dataset, df.iloc[:step], organization_id)
+        aggregates = OrganizationAggregates(store, dataset, organization_id)
+        aggregates.refresh()
+        for start in range(step, len(df), step):
+            store.append(dataset, df.iloc[start:start + step], organization_id)
+            if aggregates.refresh() != "append":
+                raise AssertionError("an append was not folded incrementally")
+        return aggregates.state()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute dashboard aggregates from scratch")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--dataset", default=SALES_FEATURES)
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--verify", action="store_true", help="compare against an incremental replay of the rows")
+    parser.add_argument("--slices", type=int, default=10, help="number of appends used by --verify")
+    args = parser.parse_args()
+
+    store = ParquetStore(args.store)
+    scratch = OrganizationAggregates(store, args.dataset, args.organization_id)
+    scratch.rebuild()
+    print(f"Rows: {scratch.row_count}")
+    print(f"Summary: {scratch.summary}")
+    if args.verify:
+        rows = store.read(args.dataset, columns=['date', 'product', 'sales'], organization_id=args.organization_id)
+        result = compare_states(_replay(rows, args.organization_id, args.slices, args.dataset), scratch.state())
+        print("Incremental aggregates match" if result["consistent"] else f"Mismatch: {result['differences']}")
+        raise SystemExit(0 if result["consistent"] else 1)
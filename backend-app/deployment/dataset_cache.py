@@ -0,0 +1,152 @@
+"""
+Process-wide DataFrame cache for the datasets served by the API.
+
+Each file is parsed once and kept in memory. Entries are keyed on the absolute
+path (plus any reader options) and validated against the file's mtime and size
+on every lookup, so a rewritten export is picked up on the next request without
+restarting the server. Other sources plug in their own loader and signature
+(the API caches Parquet store reads against the dataset's version file).
+
+Concurrent misses for the same entry are coalesced: the first caller loads the
+file and the others wait for its result instead of parsing it again.
+
+The cache holds at most DATASET_CACHE_MAX_BYTES of DataFrame memory (default
+512 MB) and evicts the least recently used entries when the budget is exceeded.
+Frames returned by the cache are shared between requests and must be treated
+as read-only.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def file_signature(path):
+    """Return the (mtime_ns, size) pair used to detect changed files."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a DataFrame, including object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class DatasetCache:
+    """LRU cache of parsed datasets with a memory budget and hit/miss counters."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, loader=pd.read_csv, signature=file_signature):
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._signature = signature
+        self._entries = OrderedDict()  # key -> (signature, frame, nbytes)
+        self._loading = {}  # key -> (signature, Future) of the load in progress
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def _key(self, path, read_kwargs):
+        return os.path.abspath(path), repr(sorted(read_kwargs.items()))
+
+    def get(self, path, **read_kwargs):
+        """Return the parsed dataset at `path`, loading or reloading it if needed."""
+        key = self._key(path, read_kwargs)
+        try:
+            signature = self._signature(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            loading = self._loading.get(key)
+            if loading is not None and loading[0] == signature:
+                self.coalesced += 1
+                future = loading[1]
+            else:
+                if entry is not None:
+                    self.reloads += 1
+                    self._drop(key)
+                else:
+                    self.misses += 1
+                future = None
+                loading = (signature, Future())
+                self._loading[key] = loading
+        if future is not None:
+            # Another request is already parsing this version of the file
+            return future.result()
+
+        try:
+            df = self._loader(path, **read_kwargs)
+        except BaseException as e:
+            loading[1].set_exception(e)
+            raise
+        else:
+            self._store(key, signature, df)
+            loading[1].set_result(df)
+            return df
+        finally:
+            with self._lock:
+                if self._loading.get(key) is loading:
+                    del self._loading[key]
+
+    def _store(self, key, signature, df):
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                # Larger than the whole budget: serve it but do not keep it.
+                return
+            self._entries[key] = (signature, df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def invalidate(self, path=None):
+        """Forget one file (all reader variants) or, with no argument, everything."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            abspath = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == abspath]:
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.reloads
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared instance used by the API process
+dataset_cache = DatasetCache()
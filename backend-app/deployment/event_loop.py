@@ -0,0 +1,116 @@
+"""
+Keeping blocking work off the asyncio event loop.
+
+Every API handler is `async def`, so a pandas read or a large serialization
+run directly in a handler stalls all other requests of the uvicorn worker.
+run_blocking() runs such work in a dedicated, bounded thread pool of
+DATA_THREADS workers (default 8): data loads queue up there instead of
+multiplying memory use, and they do not compete with Starlette's own thread
+pool, which serves the sync dependencies and streaming bodies.
+
+LoopLagMonitor measures how late the event loop wakes up from a short sleep.
+A handler that blocks shows up as lag; samples above LOOP_LAG_WARN_MS are
+counted and logged together with the path of a request that was in flight.
+"""
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+DATA_THREADS = int(os.getenv("DATA_THREADS", "8"))
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+
+logger = logging.getLogger(__name__)
+
+data_executor = ThreadPoolExecutor(max_workers=DATA_THREADS, thread_name_prefix="data")
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Await `function(*args, **kwargs)` run in the bounded data thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(data_executor, functools.partial(function, *args, **kwargs))
+
+
+def executor_stats(executor=data_executor):
+    return {
+        "max_workers": executor._max_workers,
+        "threads": len(executor._threads),
+        "queued": executor._work_queue.qsize(),
+    }
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling delay every `interval` seconds."""
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL_SECONDS, warn_ms=LOOP_LAG_WARN_MS):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.samples = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.slow_samples = 0
+        self.in_flight = {}  # id -> request path, maintained by the middleware in main.py
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - start - self.interval) * 1000)
+            self.samples += 1
+            self.total_ms += lag_ms
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms >= self.warn_ms:
+                self.slow_samples += 1
+                logger.warning("Event loop blocked for %.0f ms (requests in flight: %s)",
+                               lag_ms, ", ".join(sorted(set(self.in_flight.values()))) or "none")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def track(self, path):
+        """Context manager recording `path` as in flight while a request is handled."""
+        return _InFlight(self.in_flight, path)
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "last_ms": round(self.last_ms, 3),
+            "mean_ms": round(self.total_ms / self.samples, 3) if self.samples else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "slow_samples": self.slow_samples,
+            "warn_ms": self.warn_ms,
+            "interval_seconds": self.interval,
+        }
+
+
+class _InFlight:
+    def __init__(self, registry, path):
+        self.registry = registry
+        self.path = path
+
+    def __enter__(self):
+        self.registry[id(self)] = self.path
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.pop(id(self), None)
+
+
+# Shared instance used by the API process
+loop_lag = LoopLagMonitor()
@@ -0,0 +1,159 @@
+"""
+Online forecast serving from the model registry.
+
+Fitted Prophet models are loaded from models.model_registry (preloaded at
+startup, otherwise on first use) and kept in an LRU of FORECAST_MAX_MODELS
+entries. Recent predict() outputs are kept in a second LRU keyed by the model's
+data fingerprint, horizon and interval width, so a repeated request is a
+dictionary lookup. A model is revalidated against the registry's latest.json
+(one os.stat) on every request and reloaded after a retrain.
+
+All methods are blocking; the API calls them from a worker thread.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from models.batch_forecast import PROPHET_PARAMS
+from models.model_registry import ModelRegistry
+
+FORECAST_MAX_MODELS = int(os.getenv("FORECAST_MAX_MODELS", "256"))
+FORECAST_MAX_PREDICTIONS = int(os.getenv("FORECAST_MAX_PREDICTIONS", "1024"))
+MAX_HORIZON = 365
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+class _LoadedModel:
+    def __init__(self, model, meta, signature):
+        self.model = model
+        self.meta = meta
+        self.signature = signature
+        # predict() reads interval_width from the model, so calls are serialized per model
+        self.lock = threading.Lock()
+
+
+class ForecastService:
+    def __init__(self, registry=None, params=None, max_models=FORECAST_MAX_MODELS,
+                 max_predictions=FORECAST_MAX_PREDICTIONS):
+        self.registry = registry or ModelRegistry()
+        self.params = params or PROPHET_PARAMS
+        self.max_models = max_models
+        self.max_predictions = max_predictions
+        self._models = OrderedDict()       # (organization_id, product) -> _LoadedModel
+        self._predictions = OrderedDict()  # (organization_id, product, fingerprint, horizon, interval) -> dict
+        self._lock = threading.Lock()
+        self.prediction_hits = 0
+        self.prediction_misses = 0
+        self.model_loads = 0
+
+    def _latest_path(self, organization_id, product):
+        return os.path.join(self.registry._dir(organization_id, product, self.params), 'latest.json')
+
+    def _model(self, organization_id, product):
+        key = (organization_id, product)
+        try:
+            signature = os.stat(self._latest_path(organization_id, product)).st_mtime_ns
+        except FileNotFoundError:
+            raise ModelNotFound(f"No fitted model for product {product!r}")
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is not None and loaded.signature == signature:
+                self._models.move_to_end(key)
+                return loaded
+
+        meta = self.registry.latest(organization_id, product, self.params)
+        model = self.registry.load(organization_id, product, self.params, meta['fingerprint']) if meta else None
+        if model is None:
+            raise ModelNotFound(f"No fitted model for product {product!r}")
+        loaded = _LoadedModel(model, meta, signature)
+        with self._lock:
+            self.model_loads += 1
+            self._models[key] = loaded
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return loaded
+
+    def preload(self, organization_id=None):
+        """Load every registered model (of one organization, or all) up to the LRU size."""
+        loaded = 0
+        for meta in self._registered(organization_id):
+            if loaded >= self.max_models:
+                break
+            try:
+                self._model(meta['organization_id'], meta['product'])
+                loaded += 1
+            except Exception as e:
+                print(f"Warning: could not preload model for {meta.get('product')}: {e}")
+        return loaded
+
+    def _registered(self, organization_id=None):
+        root = self.registry.root
+        if not os.path.isdir(root):
+            return
+        for dirpath, _, filenames in os.walk(root):
+            if 'latest.json' not in filenames:
+                continue
+            with open(os.path.join(dirpath, 'latest.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('params') != self.params:
+                continue
+            if organization_id is None or meta.get('organization_id') == organization_id:
+                yield meta
+
+    def forecast(self, organization_id, product, horizon=14, interval_width=0.8):
+        """Forecast the `horizon` days after the end of the model's training data."""
+        loaded = self._model(organization_id, product)
+        key = (organization_id, product, loaded.meta['fingerprint'], horizon, round(interval_width, 4))
+        with self._lock:
+            cached = self._predictions.get(key)
+            if cached is not None:
+                self._predictions.move_to_end(key)
+                self.prediction_hits += 1
+                return cached
+            self.prediction_misses += 1
+
+        with loaded.lock:
+            model = loaded.model
+            model.interval_width = interval_width
+            future = model.make_future_dataframe(periods=horizon, include_history=False)
+            prediction = model.predict(future)
+
+        result = {
+            "product": product,
+            "organization_id": organization_id,
+            "horizon": horizon,
+            "interval_width": interval_width,
+            "model": {
+                "fingerprint": loaded.meta['fingerprint'],
+                "last_ds": loaded.meta.get('last_ds'),
+                "fitted_at": loaded.meta.get('fitted_at'),
+            },
+            "forecast": [
+                {"ds": ds.date().isoformat(), "yhat": float(yhat), "yhat_lower": float(lower), "yhat_upper": float(upper)}
+                for ds, yhat, lower, upper in zip(prediction['ds'], prediction['yhat'],
+                                                  prediction['yhat_lower'], prediction['yhat_upper'])
+            ],
+        }
+        with self._lock:
+            self._predictions[key] = result
+            while len(self._predictions) > self.max_predictions:
+                self._predictions.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "predictions": len(self._predictions),
+                "model_loads": self.model_loads,
+                "prediction_hits": self.prediction_hits,
+                "prediction_misses": self.prediction_misses,
+            }
+
+
+# Shared instance used by the API process
+forecast_service = ForecastService()
@@ -0,0 +1,186 @@
+"""
+Reorder-point evaluation for the inventory API.
+
+Wraps the vectorized calculation in models.safety_stock_and_reorder with two
+levels of reuse between calls, both kept per organization:
+
+- Demand statistics (mean / std of daily sales per product) of the
+  organization's sales rows. When the rows change, a per-product fingerprint
+  (sum of row hashes) finds the products whose history actually changed, and
+  only those are recomputed.
+- The last report row of every product, together with the stock level, lead
+  time and service level it was computed from. A new evaluation recomputes
+  only the products whose inputs or statistics changed.
+
+Live stock levels posted to the API are remembered per organization and used
+by later GET requests.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.safety_stock_and_reorder import (
+    demand_statistics, reorder_points, whole_units, LEAD_TIME_DAYS, SERVICE_LEVEL, CURRENT_STOCK, REPORT_COLUMNS,
+)
+
+
+def product_fingerprints(df, product_col='product', sales_col='sales'):
+    """Order-independent fingerprint of each product's sales rows."""
+    hashes = pd.util.hash_pandas_object(df[[product_col, sales_col]], index=False)
+    return hashes.groupby(df[product_col].to_numpy(), sort=False).sum()
+
+
+class _OrganizationState:
+    def __init__(self):
+        self.stock = {}          # product -> live stock level
+        self.report = None       # DataFrame indexed by product
+        self.inputs = None       # DataFrame indexed by product: lead_time_days, service_level, current_stock
+        self.frame = None        # sales rows the statistics were computed from
+        self.demand = None       # DataFrame indexed by product
+        self.fingerprints = None
+        self.changed_products = set()
+        self.demand_version = 0
+        self.stats_version = -1  # demand_version the report rows are up to date with
+
+
+class InventoryService:
+    """Reorder reports of each organization's products.
+
+    `loader(organization_id=...)` returns the organization's sales rows (a 'product'
+    and a 'sales' column; the same object while they are unchanged) and raises
+    FileNotFoundError while it has none.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._organizations = {}
+        self.stats_recomputed_products = 0
+        self.rows_recomputed = 0
+
+    def _demand_stats(self, organization_id, state):
+        """Per-product demand statistics, refreshed for changed products only."""
+        try:
+            df = self.loader(organization_id=organization_id)
+        except FileNotFoundError:
+            df = pd.DataFrame({'product': pd.Series(dtype=object), 'sales': pd.Series(dtype=np.float64)})
+        if df is state.frame:
+            return state.demand
+        for column in ('product', 'sales'):
+            if column not in df.columns:
+                raise ValueError(f"The sales data of organization {organization_id} has no '{column}' column")
+
+        # Products are addressed by name in the API, whatever dtype they were stored as
+        source = df
+        df = pd.DataFrame({'product': df['product'].astype(str), 'sales': df['sales']})
+        fingerprints = product_fingerprints(df)
+        if state.demand is None:
+            changed = fingerprints.index
+        else:
+            previous = state.fingerprints.reindex(fingerprints.index)
+            changed = fingerprints.index[previous.isna().to_numpy() | (previous.to_numpy() != fingerprints.to_numpy())]
+
+        if len(changed) == len(fingerprints):
+            stats = demand_statistics(df).set_index('product')
+        else:
+            fresh = demand_statistics(df[df['product'].isin(changed)]).set_index('product')
+            stats = state.demand.reindex(fingerprints.index)
+            stats.loc[fresh.index] = fresh
+        state.frame = source
+        state.demand = stats
+        state.fingerprints = fingerprints
+        state.changed_products = set(changed)
+        state.demand_version += 1
+        self.stats_recomputed_products += len(changed)
+        return stats
+
+    def evaluate(self, organization_id, products=None, stock=None, lead_time_days=LEAD_TIME_DAYS,
+                 service_level=SERVICE_LEVEL, overrides=None):
+        """Reorder report for `products` (default: every product with sales history).
+
+        `stock` updates the organization's live stock levels before evaluating;
+        `overrides` maps product -> {lead_time_days, service_level} for
+        products that differ from the defaults. Returns (report, unknown_products).
+        """
+        with self._lock:
+            state = self._organizations.setdefault(organization_id, _OrganizationState())
+            stats = self._demand_stats(organization_id, state)
+            if stock:
+                state.stock.update(stock)
+
+            if products is None:
+                wanted = stats.index
+                unknown = []
+            else:
+                wanted = pd.Index(pd.unique(pd.Series([str(p) for p in products], dtype=object)))
+                known = wanted.isin(stats.index)
+                unknown = list(wanted[~known])
+                wanted = wanted[known]
+
+            inputs = pd.DataFrame({
+                'lead_time_days': float(lead_time_days),
+                'service_level': float(service_level),
+                'current_stock': pd.Series(state.stock, dtype=np.float64).reindex(wanted).fillna(CURRENT_STOCK).to_numpy(),
+            }, index=wanted)
+            for name in ('lead_time_days', 'service_level'):
+                values = pd.Series({product: values[name] for product, values in (overrides or {}).items()
+                                    if values.get(name) is not None}, dtype=np.float64)
+                values = values[values.index.isin(inputs.index)]
+                inputs.loc[values.index, name] = values
+
+            dirty = self._dirty(state, inputs)
+            if len(dirty):
+                fresh = reorder_points(
+                    stats.loc[dirty].rename_axis('product').reset_index(),
+                    lead_time_days=inputs.loc[dirty, 'lead_time_days'].to_numpy(),
+                    service_level=inputs.loc[dirty, 'service_level'].to_numpy(),
+                    current_stock=inputs.loc[dirty, 'current_stock'].to_numpy(),
+                ).set_index('product')
+                # Kept as floats; the report casts them once it is assembled
+                for column in ('current_stock', 'recommended_order_qty'):
+                    fresh[column] = fresh[column].astype(np.float64)
+                if state.report is None:
+                    state.report, state.inputs = fresh, inputs.loc[dirty].copy()
+                else:
+                    state.report = pd.concat([state.report.drop(dirty, errors='ignore'), fresh])
+                    state.inputs = pd.concat([state.inputs.drop(dirty, errors='ignore'), inputs.loc[dirty]])
+                self.rows_recomputed += len(dirty)
+            state.stats_version = state.demand_version
+
+            if state.report is None:
+                return pd.DataFrame(columns=REPORT_COLUMNS), unknown
+            report = state.report.loc[wanted].rename_axis('product').reset_index()
+            # Rows recomputed in different calls report whole units the same way
+            for column in ('current_stock', 'recommended_order_qty'):
+                report[column] = whole_units(report[column])
+            return report[REPORT_COLUMNS], unknown
+
+    def _dirty(self, state, inputs):
+        """Products whose report row must be (re)computed."""
+        if state.report is None:
+            return inputs.index
+        previous = state.inputs.reindex(inputs.index)
+        changed_inputs = ~(previous == inputs).all(axis=1)
+        dirty = inputs.index[changed_inputs.to_numpy()]
+        if state.stats_version != state.demand_version:
+            dirty = dirty.union(inputs.index.intersection(pd.Index(list(state.changed_products), dtype=object)))
+            if state.stats_version != state.demand_version - 1:
+                # missed more than one statistics refresh: recompute everything requested
+                dirty = inputs.index
+        return dirty
+
+    def stats(self):
+        with self._lock:
+            return {
+                "organizations": len(self._organizations),
+                "products": sum(len(state.demand) for state in self._organizations.values() if state.demand is not None),
+                "stats_recomputed_products": self.stats_recomputed_products,
+                "rows_recomputed": self.rows_recomputed,
+            }
+
+
+def report_records(report):
+    """JSON-ready rows; undefined statistics (e.g. a single day of sales) become null."""
+    report = report.astype(object).where(report.notna(), None)
+    return report.to_dict(orient='records')
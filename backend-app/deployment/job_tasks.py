@@ -0,0 +1,103 @@
+"""
+Job functions run by the JobManager (see deployment/jobs.py).
+
+Each takes the JobContext first and the organization id and its validated
+parameters as keywords, reports progress through the context and returns a
+JSON-serializable result. The parameter models below bound what a client may
+ask for: unknown fields are rejected, the forecast horizon is capped at
+MAX_HORIZON and the worker count at the machine's CPU count.
+woocommerce_sync and retrain_forecasts are module-level so they can run in
+the job process pool; reorder_report works on the API's in-memory inventory
+state and always runs in a thread.
+"""
+import os
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from data_ingestion.woocommerce_sync import WooCommerceSync
+from deployment.forecast_service import MAX_HORIZON
+from deployment.inventory_service import report_records
+from models.batch_forecast import run_batch
+from models.forecast_router import load_routes, run_routed, ROUTES_FILE
+from models.hierarchy import load_categories, reconcile_forecasts, RECONCILED_FORECASTS, RECONCILE_METHOD
+from models.model_registry import REGISTRY_DIR
+from storage.parquet_store import sales_store, WOOCOMMERCE_FEATURES
+
+BATCH_FORECASTS = "batch_forecasts"
+MAX_WORKERS = os.cpu_count() or 1
+MAX_LEAD_TIME_DAYS = 365
+
+
+class JobParams(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+
+class SyncParams(JobParams):
+    full: bool = False
+
+
+class RetrainParams(JobParams):
+    horizon: int = Field(14, ge=1, le=MAX_HORIZON)
+    workers: Optional[int] = Field(None, ge=1, le=MAX_WORKERS)
+
+
+class ReorderParams(JobParams):
+    lead_time_days: float = Field(14, gt=0, le=MAX_LEAD_TIME_DAYS)
+    service_level: float = Field(0.95, gt=0, lt=1)
+    products: Optional[List[str]] = None
+    only_reorder: bool = False
+
+
+async def woocommerce_sync(context, organization_id, params):
+    context.progress(0.0, "Fetching changed orders and products")
+    # The fetched records are merged as soon as they arrive, so there is no later checkpoint
+    return await WooCommerceSync().sync(organization_id, full=params.full)
+
+
+def retrain_forecasts(context, organization_id, params):
+    """Refit the forecasts of every product (registry warm starts apply) and store them.
+
+    With a routes file (models/forecast_router.py) only the products routed
+    to Prophet are fitted with it; the rest use the vectorized baselines.
+    The product forecasts are then reconciled with the category and
+    organization totals (models/hierarchy.py) for the dashboard. The routes
+    file and the reconciliation method are server settings (FORECAST_ROUTES,
+    RECONCILE_METHOD), never job parameters.
+    """
+    context.progress(0.0, "Loading sales")
+    sales = sales_store.read(WOOCOMMERCE_FEATURES, columns=['date', 'product', 'sales'],
+                             organization_id=organization_id)
+    progress = lambda done, total: context.progress(done / total, f"{done}/{total} products fitted")  # noqa: E731
+    product_routes, default_model = load_routes(ROUTES_FILE)
+    if product_routes is None:
+        forecasts, report = run_batch(sales, workers=params.workers, horizon=params.horizon,
+                                      registry_dir=REGISTRY_DIR, organization_id=organization_id, progress=progress)
+    else:
+        forecasts, report = run_routed(sales, product_routes, default_model, horizon=params.horizon,
+                                       workers=params.workers, registry_dir=REGISTRY_DIR,
+                                       organization_id=organization_id, progress=progress)
+    sales_store.write(BATCH_FORECASTS, forecasts, organization_id, date_col='ds')
+
+    context.progress(1.0, "Reconciling category and organization totals")
+    categories = load_categories(organization_id, sales_store, sales=sales)
+    reconciled, reconcile_info = reconcile_forecasts(sales, forecasts, categories, RECONCILE_METHOD)
+    sales_store.write(RECONCILED_FORECASTS, reconciled, organization_id, date_col='ds')
+    failed = report[report['status'] != 'ok']
+    return {
+        "products": len(report),
+        "failed": failed['product'].astype(str).tolist(),
+        "forecast_rows": len(forecasts),
+        "fit_modes": {str(mode): int(count) for mode, count in report['fit_mode'].value_counts().items()},
+        "reconciliation": reconcile_info,
+    }
+
+
+def reorder_report(inventory_service, context, organization_id, params):
+    """Reorder report from the organization's last posted stock levels (bind the service with partial())."""
+    context.progress(0.0, "Evaluating reorder points")
+    report, unknown = inventory_service.evaluate(organization_id, params.products, None, params.lead_time_days,
+                                                 params.service_level)
+    if params.only_reorder:
+        report = report[report['recommended_order_qty'] > 0]
+    return {"items": report_records(report), "unknown_products": unknown}
@@ -0,0 +1,296 @@
+"""
+In-process background jobs for the API.
+
+Long-running work (WooCommerce sync, forecast retraining, reorder reports) is
+submitted to the JobManager instead of running inside a request handler. The
+handler returns a job id at once; clients poll the job for its status and
+progress and may cancel it.
+
+- At most JOB_MAX_WORKERS jobs run at a time, and at most
+  JOB_ORGANIZATION_CONCURRENCY per organization; further jobs wait in a FIFO
+  queue (up to JOB_MAX_QUEUED_PER_ORGANIZATION per organization). An
+  organization at its limit does not hold up the jobs of other organizations.
+- Job functions run in a worker thread, or with JOB_PROCESS_WORKERS > 0 and a
+  task registered with `process=True` in a process pool. They receive a
+  JobContext to report progress and to check for cancellation; for process
+  jobs its state lives in a multiprocessing manager, so progress and
+  cancellation work the same way.
+- Cancelling a queued job removes it from the queue. A running job is asked
+  to stop and ends as "cancelled" at its next checkpoint.
+- Submitting a job identical to one that is still queued or running (same
+  organization, kind and parameters) returns the existing job.
+
+Finished jobs are kept for polling until JOB_HISTORY newer ones have finished.
+Every task is registered with a pydantic model of its parameters (types and
+bounds); submit() validates the client's parameters against it and the task
+is called as `function(context, organization_id=..., params=<model>)`.
+"""
+import asyncio
+import inspect
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", "0"))
+JOB_ORGANIZATION_CONCURRENCY = int(os.getenv("JOB_ORGANIZATION_CONCURRENCY", "1"))
+JOB_MAX_QUEUED_PER_ORGANIZATION = int(os.getenv("JOB_MAX_QUEUED_PER_ORGANIZATION", "20"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class UnknownJobKind(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to job functions: progress reporting and cooperative cancellation.
+
+    `state` is a plain dict for thread jobs and a manager dict proxy for
+    process jobs; both are picklable, so the context can cross into a worker.
+    """
+
+    def __init__(self, job_id, state):
+        self.job_id = job_id
+        self._state = state
+
+    def progress(self, fraction, message=None):
+        self.check_cancelled()
+        self._state["progress"] = max(0.0, min(1.0, float(fraction)))
+        if message is not None:
+            self._state["message"] = message
+
+    def cancelled(self):
+        return bool(self._state.get("cancel"))
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+
+def _run(function, context, organization_id, params):
+    """Call a job function (plain or async) in the current worker thread or process."""
+    result = function(context, organization_id=organization_id, params=params)
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+class Job:
+    def __init__(self, kind, organization_id, params, state):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.organization_id = organization_id
+        self.params = params
+        self.state = state
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "organization_id": self.organization_id,
+            "params": self.params.model_dump(),
+            "status": self.status,
+            "progress": 1.0 if self.status == SUCCEEDED else self.state.get("progress", 0.0),
+            "message": self.state.get("message"),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers=JOB_MAX_WORKERS, process_workers=JOB_PROCESS_WORKERS,
+                 organization_concurrency=JOB_ORGANIZATION_CONCURRENCY,
+                 max_queued_per_organization=JOB_MAX_QUEUED_PER_ORGANIZATION, history=JOB_HISTORY):
+        self.max_workers = max_workers
+        self.process_workers = process_workers
+        self.organization_concurrency = organization_concurrency
+        self.max_queued_per_organization = max_queued_per_organization
+        self.history = history
+        self._tasks = {}                 # kind -> (function, params model, run in process pool)
+        self._jobs = OrderedDict()       # id -> Job, in submission order
+        self._queue = deque()
+        self._running = {}               # organization_id -> running job count
+        self._finished = deque()
+        self._lock = threading.RLock()
+        self._threads = None
+        self._processes = None
+        self._manager = None
+
+    def register(self, kind, function, params, process=False):
+        """Make `function(context, organization_id=..., params=...)` available as job kind `kind`.
+
+        `params` is the pydantic model the job's parameters are validated
+        with. Process tasks (and their params models) must be importable
+        module-level objects; they run in the process pool when
+        JOB_PROCESS_WORKERS > 0 and in a thread otherwise.
+        """
+        self._tasks[kind] = (function, params, process)
+
+    def kinds(self):
+        return sorted(self._tasks)
+
+    def _uses_processes(self, kind):
+        return self.process_workers > 0 and self._tasks[kind][2]
+
+    def _new_state(self, kind):
+        if not self._uses_processes(kind):
+            return {}
+        if self._manager is None:
+            import multiprocessing
+
+            self._manager = multiprocessing.Manager()
+        return self._manager.dict()
+
+    def submit(self, kind, organization_id, params=None):
+        """Queue a job and return it (or the identical job that is still active)."""
+        if kind not in self._tasks:
+            raise UnknownJobKind(f"Unknown job kind '{kind}' (available: {', '.join(self.kinds())})")
+        # Raises pydantic's ValidationError (a ValueError) for unknown, mistyped or out-of-range parameters
+        params = self._tasks[kind][1].model_validate(params or {})
+        with self._lock:
+            queued = 0
+            for job in self._jobs.values():
+                if job.organization_id != organization_id or job.status in FINISHED:
+                    continue
+                if job.kind == kind and job.params == params and job.status != CANCELLING:
+                    return job
+                queued += job.status == QUEUED
+            if queued >= self.max_queued_per_organization:
+                raise JobQueueFull(f"Organization {organization_id} already has {queued} queued jobs")
+            job = Job(kind, organization_id, params, self._new_state(kind))
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._dispatch()
+        return job
+
+    def _dispatch(self):
+        """Start queued jobs while workers and per-organization slots are free (FIFO otherwise)."""
+        # Rescan after every start: a job that finishes at once re-enters _dispatch from its callback
+        while sum(self._running.values()) < self.max_workers:
+            job = next((job for job in self._queue
+                        if self._running.get(job.organization_id, 0) < self.organization_concurrency), None)
+            if job is None:
+                return
+            self._queue.remove(job)
+            self._running[job.organization_id] = self._running.get(job.organization_id, 0) + 1
+            self._start(job)
+
+    def _executor(self, kind):
+        if self._uses_processes(kind):
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        return self._threads
+
+    def _start(self, job):
+        job.status = RUNNING
+        job.started_at = datetime.now().isoformat()
+        function = self._tasks[job.kind][0]
+        context = JobContext(job.id, job.state)
+        job.future = self._executor(job.kind).submit(_run, function, context, job.organization_id, job.params)
+        job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+    def _finish(self, job, future):
+        with self._lock:
+            try:
+                job.result = future.result()
+                job.status = SUCCEEDED
+            except JobCancelled:
+                job.status = CANCELLED
+            except BaseException as e:
+                job.status = CANCELLED if job.state.get("cancel") else FAILED
+                job.error = f"{type(e).__name__}: {e}"
+            job.finished_at = datetime.now().isoformat()
+            self._running[job.organization_id] -= 1
+            self._retire(job)
+            self._dispatch()
+
+    def _retire(self, job):
+        self._finished.append(job.id)
+        while len(self._finished) > self.history:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, organization_id, status=None):
+        with self._lock:
+            return [job for job in reversed(self._jobs.values())
+                    if job.organization_id == organization_id and (status is None or job.status == status)]
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running one to stop; returns the job (None if unknown)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.state["cancel"] = True
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                job.status = CANCELLED
+                job.finished_at = datetime.now().isoformat()
+                self._retire(job)
+            else:
+                job.status = CANCELLING
+            return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "jobs": counts,
+                "queued": len(self._queue),
+                "running": sum(self._running.values()),
+                "max_workers": self.max_workers,
+                "process_workers": self.process_workers,
+                "organization_concurrency": self.organization_concurrency,
+            }
+
+    def shutdown(self, wait=True):
+        """Cancel queued jobs and stop the pools (running jobs are asked to stop)."""
+        with self._lock:
+            for job in list(self._queue) + [job for job in self._jobs.values() if job.status == RUNNING]:
+                self.cancel(job.id)
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=wait)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+
+# Shared instance used by the API process (tasks are registered in main.py)
+job_manager = JobManager()
@@ -0,0 +1,135 @@
+"""
+Pagination, projection and filtering for the listing endpoints.
+
+Filters are evaluated against the loaded DataFrame before serialization, so
+only the rows of the requested page are ever converted to JSON. Cursors are
+opaque tokens encoding the row offset of the next page within the filtered
+result; the total number of matching rows is returned in the X-Total-Count
+header and the next cursor (if any) in X-Next-Cursor.
+"""
+import base64
+import json
+from typing import Optional
+
+import pandas as pd
+from fastapi import HTTPException, Query
+
+MAX_PAGE_SIZE = 10000
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(offset):
+    raw = json.dumps({"o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["o"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+class ListingQuery:
+    """Query parameters shared by the forecast, product and order listings."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to return every row"),
+        cursor: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor by the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated list of fields to include"),
+        start_date: Optional[str] = Query(None, description="Only rows dated on or after this ISO date"),
+        end_date: Optional[str] = Query(None, description="Only rows dated on or before this ISO date"),
+        product_id: Optional[int] = Query(None, description="Only rows for this product"),
+        status: Optional[str] = Query(None, description="Only rows with this status (case-insensitive)"),
+    ):
+        self.limit = limit
+        self.offset = decode_cursor(cursor) if cursor else 0
+        self.fields = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+        self.start_date = _parse_date(start_date, "start_date")
+        self.end_date = _parse_date(end_date, "end_date")
+        self.product_id = product_id
+        self.status = status
+
+    def projection(self, available):
+        """Validate `fields` against the endpoint's payload fields."""
+        if self.fields is None:
+            return None
+        unknown = [name for name in self.fields if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return set(self.fields)
+
+    def filter(self, df, date_column=None, product_column=None, product_default=0,
+               status_column=None, status_default=None):
+        """Apply the date-range, product and status filters to `df`.
+
+        `date_column` may be a tuple of candidate names; the first one present
+        in the frame is used. A product or status filter on a column the file
+        does not have is evaluated against the default value the endpoint
+        serializes for it, so the filtered rows always agree with the payload.
+        """
+        mask = pd.Series(True, index=df.index)
+
+        if self.start_date is not None or self.end_date is not None:
+            candidates = (date_column,) if isinstance(date_column, str) else (date_column or ())
+            date_column = next((name for name in candidates if name in df.columns), None)
+            if date_column is None:
+                return df.iloc[0:0]
+            dates = pd.to_datetime(df[date_column], errors="coerce", format="ISO8601")
+            if self.start_date is not None:
+                mask &= dates >= self.start_date
+            if self.end_date is not None:
+                # a bare end date includes the whole day
+                end = self.end_date
+                if end == end.normalize():
+                    end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+                mask &= dates <= end
+
+        if self.product_id is not None and product_column is not None:
+            if product_column in df.columns:
+                mask &= pd.to_numeric(df[product_column], errors="coerce") == self.product_id
+            elif self.product_id != product_default:
+                return df.iloc[0:0]
+
+        if self.status is not None and status_column is not None:
+            wanted = self.status.lower()
+            if status_column in df.columns:
+                mask &= df[status_column].astype(str).str.lower() == wanted
+            elif wanted != str(status_default).lower():
+                return df.iloc[0:0]
+
+        if bool(mask.all()):
+            return df
+        return df[mask]
+
+    def page(self, df):
+        """Slice the requested page; returns (page, total, next_cursor)."""
+        total = len(df)
+        if self.limit is None:
+            return df.iloc[self.offset:], total, None
+        end = self.offset + self.limit
+        next_cursor = encode_cursor(end) if end < total else None
+        return df.iloc[self.offset:end], total, next_cursor
+
+
+def page_headers(total, next_cursor):
+    headers = {TOTAL_COUNT_HEADER: str(total)}
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return headers
+
+
+def _parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
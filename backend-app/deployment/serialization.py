@@ -0,0 +1,185 @@
+"""
+Columnar serialization of the listing endpoints.
+
+The sales-forecast, WooCommerce product and WooCommerce order endpoints used to
+build their payloads with DataFrame.iterrows() and per-cell casts. The helpers
+below perform the same coercions on whole columns and write JSON from the
+resulting column lists, producing the same bytes as FastAPI's default
+JSONResponse (compact separators, UTF-8, no ASCII escaping).
+
+orjson is used when installed; otherwise the standard library encoder is used
+with the JSONResponse settings.
+"""
+import functools
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _plain_floats(values):
+    """True if every float renders the same in orjson and in Python's repr().
+
+    The two encoders only disagree on exponent notation (1e+16 vs 1e16), which
+    Python uses below 1e-4 and from 1e16 upwards; non-finite values must go
+    through the standard encoder so they raise as before.
+    """
+    array = np.abs(np.asarray(values, dtype=np.float64))
+    return bool(np.all(((array >= 1e-4) & (array < 1e16)) | (array == 0)))
+
+
+def _std_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        return _std_dumps(obj)  # e.g. integers beyond 64 bits
+
+
+def encoder_for(columns):
+    """Pick the encoder for data built from the {field: values} mapping `columns`.
+
+    orjson is only used once the float columns are known to format like
+    json.dumps; without `columns` the standard encoder is used.
+    """
+    if orjson is None or columns is None:
+        return _std_dumps
+    float_values = [values for values in columns.values() if values and isinstance(values[0], float)]
+    if all(_plain_floats(values) for values in float_values):
+        return _orjson_dumps
+    return _std_dumps
+
+
+def dumps(obj, columns=None):
+    """Encode `obj` as compact UTF-8 JSON bytes."""
+    return encoder_for(columns)(obj)
+
+
+def json_response(payload, columns=None, headers=None):
+    return Response(content=dumps(payload, columns), media_type="application/json", headers=headers)
+
+
+def row_dtype(df):
+    """dtype of the Series iterrows() would yield for `df` (object for mixed frames)."""
+    if df.empty:
+        return np.dtype(object)
+    return df.iloc[0].dtype
+
+
+def _source(df, name, dtype):
+    column = df[name]
+    if dtype != object and column.dtype != dtype:
+        # iterrows() upcasts every cell of an all-numeric frame to a common dtype
+        column = column.astype(dtype)
+    return column
+
+
+def int_column(df, name, default, dtype=None):
+    """Equivalent of int(row.get(name, default)) for every row."""
+    if name not in df.columns:
+        return [int(default)] * len(df)
+    column = _source(df, name, row_dtype(df) if dtype is None else dtype)
+    if pd.api.types.is_integer_dtype(column.dtype) or pd.api.types.is_bool_dtype(column.dtype):
+        return column.astype(np.int64).tolist()
+    if pd.api.types.is_float_dtype(column.dtype):
+        values = column.to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            raise ValueError("cannot convert float NaN to integer")
+        if np.isinf(values).any():
+            raise OverflowError("cannot convert float infinity to integer")
+        if len(values) and np.abs(values).max() >= 2 ** 63:
+            return [int(value) for value in values.tolist()]
+        return np.trunc(values).astype(np.int64).tolist()
+    return [int(value) for value in column.tolist()]
+
+
+def float_column(df, name, default, dtype=None):
+    """Equivalent of float(row.get(name, default)) for every row."""
+    if name not in df.columns:
+        return [float(default)] * len(df)
+    column = _source(df, name, row_dtype(df) if dtype is None else dtype)
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        return column.to_numpy(dtype=np.float64).tolist()
+    return [float(value) for value in column.tolist()]
+
+
+def str_column(df, name, default, dtype=None):
+    """Equivalent of str(row.get(name, default)) for every row."""
+    if name not in df.columns:
+        return [str(default)] * len(df)
+    column = _source(df, name, row_dtype(df) if dtype is None else dtype)
+    return [str(value) for value in column.tolist()]
+
+
+def constant_column(df, value):
+    return [value] * len(df)
+
+
+def records(columns):
+    """Turn an ordered {field: values} mapping into a list of row dicts."""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+# Endpoint column builders. Each mirrors the field mapping the endpoint used
+# with iterrows(), so the serialized records are unchanged. `fields` restricts
+# the output (in payload order) and skips the work for unrequested columns.
+
+FORECAST_FIELDS = ("id", "product_id", "forecasted_sales", "forecast_date", "organization_id")
+PRODUCT_FIELDS = ("id", "name", "price", "status", "stock_quantity")
+ORDER_FIELDS = ("id", "status", "total", "date_created", "customer_id")
+
+
+def _build(builders, fields):
+    if fields is None:
+        return {name: build() for name, build in builders.items()}
+    return {name: build() for name, build in builders.items() if name in fields}
+
+
+def forecast_columns(df, organization_id, now=None, fields=None):
+    now = now or datetime.now().isoformat()
+    product_ids = functools.cache(lambda: int_column(df, 'product_id', 0))
+    return _build({
+        "id": product_ids,
+        "product_id": product_ids,
+        "forecasted_sales": lambda: float_column(df, 'quantity', 0),
+        "forecast_date": lambda: constant_column(df, now),
+        "organization_id": lambda: constant_column(df, organization_id),
+    }, fields)
+
+
+def product_columns(df, fields=None):
+    return _build({
+        "id": lambda: int_column(df, 'product_id', 0),
+        "name": lambda: str_column(df, 'product_name', 'Unknown'),
+        "price": lambda: str_column(df, 'price', '0'),
+        "status": lambda: constant_column(df, 'publish'),
+        "stock_quantity": lambda: int_column(df, 'quantity', 0),
+    }, fields)
+
+
+def order_columns(df, now=None, fields=None):
+    now = now or datetime.now().isoformat()
+
+    def customer_ids():
+        if 'customer_id' in df.columns:
+            return int_column(df, 'customer_id', 0)
+        return constant_column(df, None)
+
+    return _build({
+        "id": lambda: int_column(df, 'order_id', 0),
+        "status": lambda: str_column(df, 'status', 'completed'),
+        "total": lambda: str_column(df, 'total', '0'),
+        "date_created": lambda: str_column(df, 'date', now),
+        "customer_id": customer_ids,
+    }, fields)
@@ -0,0 +1,90 @@
+"""
+Cache of verified access tokens.
+
+Every authenticated request used to verify the JWT signature and look the
+user up again. The TokenCache maps a token that has been verified once to its
+user, so repeated requests with the same token (dashboard polling) skip both.
+
+- Entries expire after TOKEN_CACHE_TTL_SECONDS (default 60) and never outlive
+  the token's own `exp` claim.
+- At most TOKEN_CACHE_MAX_ENTRIES tokens are kept; the least recently used
+  one is evicted first.
+- invalidate() drops one token (logout). Revocations recorded in the
+  database reach the caches of other workers when their entry expires, i.e.
+  within the TTL.
+
+Cached user dicts are shared between requests and must not be modified.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+
+class TokenCache:
+    def __init__(self, max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL_SECONDS, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # token -> (valid until, user)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token):
+        """The cached user of `token`, or None if it has to be verified."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[token]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token, user, expires_at=None):
+        """Cache a verified token; `expires_at` is its `exp` claim (seconds since the epoch)."""
+        valid_until = self._clock() + self.ttl
+        if expires_at is not None:
+            valid_until = min(valid_until, float(expires_at))
+        with self._lock:
+            self._entries[token] = (valid_until, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token):
+        with self._lock:
+            if self._entries.pop(token, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+
+# Shared instance used by the API process
+token_cache = TokenCache()
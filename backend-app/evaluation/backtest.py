@@ -0,0 +1,352 @@
+"""
+Rolling-origin backtesting of the forecasting models
+
+Measures how accurate each model is, and how much it costs to compute, on
+every product of the sales history. The store only has rows for days with
+sales, so each product's history is first filled to a daily grid from its
+first sale (days without a row count as 0): folds, test points and the MASE
+lag are then measured in days, not rows. For each product the history is cut at
+`--folds` origins, `--step` days apart and ending `--horizon` days before the
+product's last date; the model is fitted on the data up to the origin and
+scored on the following `--horizon` days.
+
+Products are spread over a process pool with the cost-balanced chunking of
+models/batch_forecast.py; each chunk runs all folds of all requested models
+for its products. The forecasts of every fold are cached on disk under
+BACKTEST_CACHE_DIR, keyed by model, parameters, a fingerprint of the training
+slice and the test dates, so re-running a backtest after new data arrived only
+fits the folds whose training data changed.
+
+MAPE, sMAPE, MASE and bias (see metrics.py) are computed for all products and
+folds at once from the collected test points.
+
+Inputs:
+- The woocommerce_features dataset of the Parquet store (only 'date',
+  'product' and 'sales' are read), or with --input a CSV with those columns.
+
+Outputs:
+- backtest_report.csv: one row per model and product with folds, test
+  points, mean MAPE / sMAPE / MASE / bias over its folds, total and per-fold
+  fit seconds, cached and failed folds.
+- backtest_summary.csv: the same figures per model, to choose a model by
+  accuracy and compute cost.
+
+Usage (from backend-app/):
+    python -m evaluation.backtest --models seasonal_naive croston prophet --horizon 14 --folds 3 --workers 8
+    python -m evaluation.backtest --models naive seasonal_naive --verify
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from evaluation.metrics import DEFAULT_SEASON, fold_accuracy, naive_scales
+from models.baselines import BASELINES, history_forecaster
+from models.batch_forecast import FIT_OVERHEAD_ROWS, PROPHET_PARAMS, _quiet_prophet, plan_chunks, product_histories
+from models.model_registry import data_fingerprint, params_key
+from storage.parquet_store import ParquetStore, load_dataset, WOOCOMMERCE_FEATURES, STORE_DIR
+
+CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR", "backtest_cache")
+MIN_TRAIN_ROWS = 28
+
+FOLD_COLUMNS = ['model', 'product', 'fold', 'cutoff', 'train_rows', 'test_rows', 'scale', 'fit_seconds',
+                'cached', 'status', 'error']
+REPORT_COLUMNS = ['model', 'product', 'folds', 'points', 'mape', 'smape', 'mase', 'bias', 'fit_seconds',
+                  'seconds_per_fold', 'cached_folds', 'failed_folds']
+
+
+# Forecasters: (training history with ds, y sorted by date, test dates, params) -> yhat per date
+
+def naive_forecast(history, dates, params=None):
+    return np.full(len(dates), history['y'].iloc[-1], dtype=np.float64)
+
+
+def prophet_forecast(history, dates, params=None):
+    from prophet import Prophet
+
+    model = Prophet(**(params or PROPHET_PARAMS))
+    model.fit(history)
+    return model.predict(pd.DataFrame({'ds': pd.DatetimeIndex(dates)}))['yhat'].to_numpy(dtype=np.float64)
+
+
+# name -> (forecaster, default params, fixed per-fit overhead in "history rows" for chunk planning);
+# the baselines of models/baselines.py run on a one-product matrix
+FORECASTERS = {
+    'naive': (naive_forecast, {}, 0),
+    **{name: (history_forecaster(name), {}, 0) for name in BASELINES},
+    'prophet': (prophet_forecast, PROPHET_PARAMS, FIT_OVERHEAD_ROWS),
+}
+
+
+class FoldCache:
+    """On-disk cache of fold forecasts (one .npy file per model, parameters, training slice and test dates)."""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def path(self, model, params, train, dates):
+        digest = hashlib.sha256()
+        digest.update(data_fingerprint(train).encode('utf-8'))
+        digest.update(pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+        return os.path.join(self.root, model, params_key(params), f"{digest.hexdigest()}.npy")
+
+    def get(self, path):
+        try:
+            return np.load(path)
+        except (FileNotFoundError, ValueError, EOFError):
+            return None
+
+    def put(self, path, yhat):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.asarray(yhat, dtype=np.float64))
+        os.replace(tmp, path)
+
+
+def daily_grid(history):
+    """A ds/y history on every day from its first row to its last; days without a row are 0, repeated days summed."""
+    if history.empty:
+        return history
+    y = history.groupby(history['ds'].dt.normalize(), sort=True)['y'].sum()
+    days = pd.date_range(y.index[0], y.index[-1], freq='D')
+    return pd.DataFrame({'ds': days, 'y': y.reindex(days, fill_value=0).to_numpy(dtype=np.float64)})
+
+
+def daily_histories(df, product_col='product', date_col='date', value_col='sales'):
+    """product_histories() of `df`, each filled to a daily grid."""
+    return {product: daily_grid(history)
+            for product, history in product_histories(df, product_col, date_col, value_col).items()}
+
+
+def fold_origins(ds, horizon, folds, step=None, min_train=MIN_TRAIN_ROWS):
+    """[(fold, cutoff, train_rows, end_row)] for a datetime64 array on a daily grid; folds are numbered oldest first.
+
+    Origins without `min_train` training days or without test points are skipped.
+    """
+    if len(ds) == 0:
+        return []
+    step = pd.Timedelta(days=step or horizon)
+    horizon = pd.Timedelta(days=horizon)
+    last = pd.Timestamp(ds[-1])
+    cutoffs = [last - horizon - i * step for i in reversed(range(folds))]
+    origins = []
+    for fold, cutoff in enumerate(cutoffs):
+        train_rows = int(np.searchsorted(ds, np.datetime64(cutoff), side='right'))
+        end_row = int(np.searchsorted(ds, np.datetime64(cutoff + horizon), side='right'))
+        if train_rows >= min_train and end_row > train_rows:
+            origins.append((fold, cutoff, train_rows, end_row))
+    return origins
+
+
+def backtest_chunk(tasks, models, horizon, folds, step=None, min_train=MIN_TRAIN_ROWS, season=DEFAULT_SEASON,
+                   params=None, cache_dir=None):
+    """Run every fold of every model for the (product, history) pairs of a chunk.
+
+    Histories are filled to a daily grid (daily_grid()) first. Returns
+    (points, folds) DataFrames; a failing fold is recorded in `folds` and
+    contributes no points.
+    """
+    if 'prophet' in models:
+        try:
+            _quiet_prophet()
+        except ImportError:
+            pass  # every Prophet fold is reported as failed
+    cache = FoldCache(cache_dir) if cache_dir else None
+    point_parts = {name: [] for name in ('model', 'product', 'fold', 'ds', 'y', 'yhat')}
+    fold_rows = []
+    for product, history in tasks:
+        history = daily_grid(history)
+        ds = history['ds'].to_numpy(dtype='datetime64[ns]')
+        y = history['y'].to_numpy(dtype=np.float64)
+        origins = fold_origins(ds, horizon, folds, step, min_train)
+        scales = naive_scales(y, [train_rows for _, _, train_rows, _ in origins], season)
+        for model in models:
+            forecaster, defaults, _ = FORECASTERS[model]
+            model_params = {**defaults, **(params or {}).get(model, {})}
+            for (fold, cutoff, train_rows, end_row), scale in zip(origins, scales):
+                train = history.iloc[:train_rows]
+                dates = ds[train_rows:end_row]
+                start = time.perf_counter()
+                cached, status, error, yhat = False, 'ok', None, None
+                try:
+                    path = cache.path(model, model_params, train, dates) if cache else None
+                    yhat = cache.get(path) if cache else None
+                    if yhat is not None and len(yhat) == len(dates):
+                        cached = True
+                    else:
+                        yhat = np.asarray(forecaster(train, dates, model_params), dtype=np.float64)
+                        if cache:
+                            cache.put(path, yhat)
+                except Exception as e:
+                    status, error, yhat = 'failed', f"{type(e).__name__}: {e}", None
+                fold_rows.append({
+                    'model': model, 'product': product, 'fold': fold, 'cutoff': cutoff,
+                    'train_rows': train_rows, 'test_rows': end_row - train_rows, 'scale': scale,
+                    'fit_seconds': time.perf_counter() - start, 'cached': cached, 'status': status, 'error': error,
+                })
+                if yhat is not None:
+                    n = len(dates)
+                    point_parts['model'].append(np.repeat(model, n))
+                    point_parts['product'].append(np.repeat(np.asarray([product], dtype=object), n))
+                    point_parts['fold'].append(np.full(n, fold))
+                    point_parts['ds'].append(dates)
+                    point_parts['y'].append(y[train_rows:end_row])
+                    point_parts['yhat'].append(yhat)
+    if point_parts['y']:
+        points = pd.DataFrame({name: np.concatenate(parts) for name, parts in point_parts.items()})
+    else:
+        points = pd.DataFrame(columns=list(point_parts))
+    return points, pd.DataFrame(fold_rows, columns=FOLD_COLUMNS)
+
+
+def accuracy_tables(points, folds):
+    """(per-fold metrics, per model/product report, per model summary) from backtest_chunk() output."""
+    keys = ['model', 'product', 'fold']
+    fold_metrics = fold_accuracy(points, folds, keys) if len(points) else pd.DataFrame(
+        columns=keys + ['points', 'mae', 'mape', 'smape', 'bias', 'mase'])
+    fold_metrics = folds.merge(fold_metrics, on=keys, how='left')
+
+    grouped = fold_metrics.groupby(['model', 'product'], sort=True)
+    report = pd.DataFrame({
+        'folds': grouped['status'].apply(lambda status: int((status == 'ok').sum())),
+        'points': grouped['points'].sum(min_count=1).fillna(0).astype(int),
+        'mape': grouped['mape'].mean(),
+        'smape': grouped['smape'].mean(),
+        'mase': grouped['mase'].mean(),
+        'bias': grouped['bias'].mean(),
+        'fit_seconds': grouped['fit_seconds'].sum(),
+        'seconds_per_fold': grouped['fit_seconds'].mean(),
+        'cached_folds': grouped['cached'].sum().astype(int),
+        'failed_folds': grouped['status'].apply(lambda status: int((status != 'ok').sum())),
+    }).reset_index()[REPORT_COLUMNS]
+
+    by_model = report.groupby('model', sort=True)
+    summary = pd.DataFrame({
+        'products': by_model['product'].size(),
+        'folds': by_model['folds'].sum(),
+        'points': by_model['points'].sum(),
+        'mape': by_model['mape'].mean(),
+        'smape': by_model['smape'].mean(),
+        'mase': by_model['mase'].mean(),
+        'bias': by_model['bias'].mean(),
+        'fit_seconds': by_model['fit_seconds'].sum(),
+        'seconds_per_fold': by_model['fit_seconds'].sum() / by_model['folds'].sum().clip(lower=1),
+        'cached_folds': by_model['cached_folds'].sum(),
+        'failed_folds': by_model['failed_folds'].sum(),
+    }).reset_index()
+    return fold_metrics, report, summary
+
+
+def run_backtest(df, models=('naive', 'seasonal_naive'), horizon=14, folds=3, step=None, min_train=MIN_TRAIN_ROWS,
+                 season=DEFAULT_SEASON, params=None, workers=None, cache_dir=CACHE_DIR, chunks_per_worker=4,
+                 product_col='product', date_col='date', value_col='sales'):
+    """Backtest `models` on every product of `df`; returns (points, fold_metrics, report, summary)."""
+    unknown = [model for model in models if model not in FORECASTERS]
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)} (available: {', '.join(FORECASTERS)})")
+    workers = workers or os.cpu_count() or 1
+    histories = product_histories(df, product_col, date_col, value_col)
+    overhead = sum(FORECASTERS[model][2] for model in models)
+    # Folds are fitted on the daily grid: the cost grows with the days a product spans
+    costs = {product: folds * (overhead + len(models) * ((history['ds'].iloc[-1] - history['ds'].iloc[0]).days + 1))
+             for product, history in histories.items()}
+    chunks = plan_chunks(costs, workers * chunks_per_worker)
+    options = (models, horizon, folds, step, min_train, season, params, cache_dir)
+
+    results = []
+    if workers == 1:
+        for chunk in chunks:
+            results.append(backtest_chunk([(p, histories[p]) for p in chunk], *options))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(backtest_chunk, [(p, histories[p]) for p in chunk], *options) for chunk in chunks]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    point_frames = [points for points, _ in results if len(points)]
+    points = (pd.concat(point_frames, ignore_index=True) if point_frames
+              else pd.DataFrame(columns=['model', 'product', 'fold', 'ds', 'y', 'yhat']))
+    fold_frames = [folds for _, folds in results if len(folds)]
+    fold_rows = pd.concat(fold_frames, ignore_index=True) if fold_frames else pd.DataFrame(columns=FOLD_COLUMNS)
+    return (points, *accuracy_tables(points, fold_rows))
+
+
+def verify(points, fold_metrics, season=DEFAULT_SEASON, histories=None):
+    """Recompute the fold metrics point by point; returns a list of mismatches (empty when all agree).
+
+    `histories` (for the MASE scale) are the daily-grid histories of daily_histories().
+    """
+    problems = []
+    for (model, product, fold), group in points.groupby(['model', 'product', 'fold']):
+        y = group['y'].tolist()
+        yhat = group['yhat'].tolist()
+        errors = [f - a for a, f in zip(y, yhat)]
+        expected = {
+            'mae': sum(abs(e) for e in errors) / len(errors),
+            'bias': sum(errors) / len(errors),
+            'smape': 100 * sum(0.0 if abs(a) + abs(f) == 0 else 2 * abs(f - a) / (abs(a) + abs(f))
+                               for a, f in zip(y, yhat)) / len(y),
+        }
+        nonzero = [abs(f - a) / abs(a) for a, f in zip(y, yhat) if a != 0]
+        expected['mape'] = 100 * sum(nonzero) / len(nonzero) if nonzero else np.nan
+        row = fold_metrics[(fold_metrics['model'] == model) & (fold_metrics['product'] == product)
+                           & (fold_metrics['fold'] == fold)].iloc[0]
+        if histories is not None:
+            history = histories[product]['y'].tolist()[:int(row['train_rows'])]
+            diffs = [abs(history[i] - history[i - season]) for i in range(season, len(history))]
+            scale = sum(diffs) / len(diffs) if diffs else np.nan
+            expected['mase'] = expected['mae'] / scale if scale and scale == scale else np.nan
+        for name, value in expected.items():
+            if not np.isclose(row[name], value, equal_nan=True):
+                problems.append(f"{model} / {product} / fold {fold}: {name} {row[name]} != {value}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecasting models per product")
+    parser.add_argument("--input", help="read the sales from this CSV instead of the store")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--models", nargs="+", default=["naive", "seasonal_naive"], choices=sorted(FORECASTERS))
+    parser.add_argument("--horizon", type=int, default=14, help="days forecast from each origin")
+    parser.add_argument("--folds", type=int, default=3, help="origins per product")
+    parser.add_argument("--step", type=int, help="days between origins (default: the horizon)")
+    parser.add_argument("--min-train", type=int, default=MIN_TRAIN_ROWS, help="minimum training days of a fold")
+    parser.add_argument("--season", type=int, default=DEFAULT_SEASON, help="seasonal lag of the MASE scale")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="fold forecast cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="refit every fold")
+    parser.add_argument("--output", default="backtest_report.csv")
+    parser.add_argument("--summary", default="backtest_summary.csv")
+    parser.add_argument("--verify", action="store_true", help="check the metrics against a per-fold loop")
+    args = parser.parse_args()
+
+    sales = load_dataset(WOOCOMMERCE_FEATURES, args.input, args.organization_id, ParquetStore(args.store),
+                         columns=['date', 'product', 'sales'], encoding=args.encoding)
+    started = time.perf_counter()
+    points, fold_metrics, report, summary = run_backtest(
+        sales, args.models, args.horizon, args.folds, args.step, args.min_train, args.season,
+        workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir)
+    report.to_csv(args.output, index=False)
+    summary.to_csv(args.summary, index=False)
+
+    print(f"Backtested {report['product'].nunique()} products x {len(args.models)} models "
+          f"({len(fold_metrics)} folds, {len(points)} test points) in {time.perf_counter() - started:.1f}s")
+    print(summary.to_string(index=False))
+    failed = fold_metrics[fold_metrics['status'] != 'ok']
+    for _, row in failed.drop_duplicates(['model', 'product']).iterrows():
+        print(f"  {row['model']} / {row['product']}: {row['error']}")
+    if args.verify:
+        problems = verify(points, fold_metrics, args.season, daily_histories(sales))
+        for problem in problems[:20]:
+            print(f"  MISMATCH {problem}")
+        print("Metrics match the per-fold recomputation" if not problems
+              else f"{len(problems)} metric mismatches")
+    print(f"Report saved to {args.output}, summary saved to {args.summary}")
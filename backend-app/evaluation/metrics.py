@@ -0,0 +1,75 @@
+"""
+Forecast accuracy metrics computed over many series at once.
+
+The inputs are long arrays of test points (one row per product, fold and
+date) with a group label per row; every metric is computed for all groups in
+one pass with NumPy / pandas group reductions instead of a Python loop per
+product and fold.
+
+- MAPE:  mean |yhat - y| / |y| in percent, over points with y != 0
+- sMAPE: mean 2 |yhat - y| / (|y| + |yhat|) in percent (0 where both are 0)
+- MASE:  MAE divided by the in-sample MAE of the seasonal naive forecast
+         (lag `season` days, so the series must be on a daily grid with
+         zero-sales days filled in) on the fold's training data; NaN when
+         that is 0
+- bias:  mean yhat - y (positive = over-forecast)
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEASON = 7
+
+
+def point_errors(y, yhat):
+    """Per-point error terms: DataFrame with error, abs_error, ape and sape (NaN where undefined)."""
+    y = np.asarray(y, dtype=np.float64)
+    yhat = np.asarray(yhat, dtype=np.float64)
+    error = yhat - y
+    abs_error = np.abs(error)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(y != 0, abs_error / np.abs(y), np.nan)
+        denominator = np.abs(y) + np.abs(yhat)
+        sape = np.where(denominator > 0, 2 * abs_error / denominator, 0.0)
+    return pd.DataFrame({'error': error, 'abs_error': abs_error, 'ape': ape, 'sape': sape})
+
+
+def naive_scales(y, train_rows, season=DEFAULT_SEASON):
+    """In-sample MAE of the lag-`season` naive forecast on y[:n] for every n in `train_rows`.
+
+    `y` is one value per day (see backtest.daily_grid()), so the lag is
+    `season` days. One cumulative sum over the series serves all folds; NaN
+    where fewer than season + 1 training days exist.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    train_rows = np.asarray(train_rows, dtype=np.int64)
+    if len(y) <= season:
+        return np.full(len(train_rows), np.nan)
+    cumulative = np.concatenate([[0.0], np.cumsum(np.abs(y[season:] - y[:-season]))])
+    pairs = train_rows - season
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scales = cumulative[np.clip(pairs, 0, len(cumulative) - 1)] / pairs
+    return np.where(pairs > 0, scales, np.nan)
+
+
+def fold_accuracy(points, folds, keys=('model', 'product', 'fold')):
+    """Metrics per (model, product, fold).
+
+    `points` has the `keys` columns plus y and yhat; `folds` has the `keys`
+    columns plus `scale` (see naive_scales()).
+    """
+    keys = list(keys)
+    terms = point_errors(points['y'], points['yhat'])
+    for key in keys:
+        terms[key] = points[key].to_numpy()
+    grouped = terms.groupby(keys, sort=False)
+    result = pd.DataFrame({
+        'points': grouped['error'].size(),
+        'mae': grouped['abs_error'].mean(),
+        'mape': grouped['ape'].mean() * 100,
+        'smape': grouped['sape'].mean() * 100,
+        'bias': grouped['error'].mean(),
+    }).reset_index()
+    result = result.merge(folds[keys + ['scale']], on=keys, how='left')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['mase'] = np.where(result['scale'] > 0, result['mae'] / result['scale'], np.nan)
+    return result.drop(columns='scale')
@@ -0,0 +1,239 @@
+"""
+Incremental feature engineering for daily sales files that grow by appending.
+
+A full run reads the whole input and rewrites the feature file. An
+incremental run only parses the lines appended to the input since the last
+run, computes their features and appends them to the feature file. It relies
+on a state file next to the output (`<output>.state.json`) that holds:
+
+- how far the input was processed (byte offset plus a digest of the bytes
+  just before it, to detect files that were rewritten rather than appended to)
+- the size of the output written so far (its store version with a ParquetStore)
+- for every product, the last max(window - 1, lag) sales values and their
+  dates: exactly what the rolling windows and lags of the next rows need
+
+The incremental run falls back to a full rebuild whenever it cannot be
+exact: no or stale state, an input that was not just appended to, an output
+changed by someone else, other windows/lags, or new rows dated on or before a
+product's last processed day.
+
+Appended rows are written in (product, date) order after the existing rows,
+so the feature file equals a full rebuild up to row order; verify() checks
+exactly that.
+
+With a ParquetStore the features go to a store dataset instead of a CSV file
+(rebuilds replace the organization's data, increments are added as new part
+files) and the state lives in the dataset directory, validated against the
+organization's store version instead of the output size.
+"""
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering.window_features import build_features
+from storage.parquet_store import ORGANIZATION_COLUMN, DEFAULT_ORGANIZATION_ID
+
+# Bytes before the last processed offset that must be unchanged for a change
+# of the input to be treated as an append.
+TAIL_CHECK_BYTES = 4096
+
+
+def _digest(data):
+    return hashlib.sha1(data[-TAIL_CHECK_BYTES:]).hexdigest()
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class IncrementalFeatureBuilder:
+    def __init__(self, input_path, output_path, windows, lags, encoding='utf-8', state_path=None,
+                 date_col='date', group_col='product', value_col='sales',
+                 store=None, dataset=None, organization_id=DEFAULT_ORGANIZATION_ID):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.windows = tuple(windows)
+        self.lags = tuple(lags)
+        self.encoding = encoding
+        self.store = store
+        self.dataset = dataset
+        self.organization_id = organization_id
+        if state_path is None and store is not None:
+            state_path = os.path.join(store.path(dataset), f'_{ORGANIZATION_COLUMN}={organization_id}.state.json')
+        self.state_path = state_path or f'{output_path}.state.json'
+        self.date_col = date_col
+        self.group_col = group_col
+        self.value_col = value_col
+        # Values of a product's history that the next row's features depend on
+        self.history = max([w - 1 for w in self.windows] + list(self.lags) + [0])
+
+    def _build(self, df):
+        return build_features(df, self.windows, self.lags, self.date_col, self.group_col, self.value_col)
+
+    def _read(self, data, names=None):
+        return pd.read_csv(io.BytesIO(data), parse_dates=[self.date_col], encoding=self.encoding,
+                           header=None if names else 'infer', names=names)
+
+    def _write(self, features, append=False):
+        if self.store is None:
+            features.to_csv(self.output_path, mode='a' if append else 'w', header=not append, index=False)
+        elif append:
+            self.store.append(self.dataset, features, self.organization_id, self.date_col)
+        else:
+            self.store.write(self.dataset, features, self.organization_id, self.date_col)
+
+    def _output_version(self):
+        """What identifies the output this builder wrote last (None if there is no output)."""
+        if self.store is None:
+            return os.path.getsize(self.output_path) if os.path.exists(self.output_path) else None
+        try:
+            return list(self.store.version(self.dataset, self.organization_id))
+        except FileNotFoundError:
+            return None
+
+    def rebuild(self):
+        """Full run: recompute every row and reset the state. Returns the number of rows written."""
+        with open(self.input_path, 'rb') as f:
+            data = f.read()
+        raw = self._read(data)
+        columns = list(raw.columns)
+        features = self._build(raw)
+        self._write(features)
+        self._save_state(data, columns, self._tails(features))
+        return len(features)
+
+    def update(self):
+        """Incremental run; returns (mode, rows written) with mode "noop", "append" or "rebuild"."""
+        state = self._load_state()
+        if state is None:
+            return "rebuild", self.rebuild()
+        with open(self.input_path, 'rb') as f:
+            f.seek(max(0, state['offset'] - TAIL_CHECK_BYTES))
+            tail = f.read(state['offset'] - max(0, state['offset'] - TAIL_CHECK_BYTES))
+            if _digest(tail) != state['tail_digest'] or not tail.endswith(b"\n"):
+                return "rebuild", self.rebuild()
+            appended = f.read()
+        # Leave a partially written last line for the next run
+        complete = appended[:appended.rfind(b"\n") + 1]
+        if not complete.strip():
+            return "noop", 0
+
+        new_rows = self._read(complete, names=state['columns'])
+        products = state['products']
+        keys = new_rows[self.group_col].astype(str)
+        last_dates = pd.to_datetime(keys.map({key: tail['last_date'] for key, tail in products.items()}))
+        if (new_rows[self.date_col] <= last_dates).any():
+            # Late rows for days already processed change features of rows already written
+            return "rebuild", self.rebuild()
+
+        # Prepend each product's stored history so windows and lags continue across the boundary
+        present = new_rows[self.group_col].notna()
+        group_values = dict(zip(keys[present], new_rows.loc[present, self.group_col]))
+        history = [key for key in group_values if key in products]
+        prefix = pd.DataFrame({
+            self.group_col: [group_values[key] for key in history for _ in products[key]['values']],
+            self.date_col: pd.to_datetime([d for key in history for d in products[key]['dates']]),
+            self.value_col: [v for key in history for v in products[key]['values']],
+        })
+        combined = new_rows.assign(_new=True)
+        if len(prefix):
+            combined = pd.concat([prefix, combined], ignore_index=True)[list(combined.columns)]
+            combined['_new'] = combined['_new'].notna()
+        features = self._build(combined)
+        written = features[features.pop('_new')].copy()
+        # Keep the input columns exactly as parsed (the history rows can change e.g. int to float)
+        parsed = new_rows.set_axis(combined.index[len(prefix):])
+        for column in new_rows.columns:
+            written[column] = parsed[column]
+        self._write(written, append=True)
+
+        products.update(self._tails(features))
+        self._save_state((tail + complete), state['columns'], products, offset=state['offset'] + len(complete))
+        return "append", len(written)
+
+    def _tails(self, features):
+        """{product: {"dates", "values", "last_date"}} for the last `history` rows of every product."""
+        valid = features[features[self.group_col].notna()]
+        keys = valid[self.group_col].astype(str)
+        tails = valid.groupby(keys, sort=False).tail(max(self.history, 1))
+        codes, uniques = pd.factorize(tails[self.group_col].astype(str))
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        dates = tails[self.date_col].dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()[order]
+        values = [_json_value(v) for v in tails[self.value_col].to_numpy()[order]]
+        result = {}
+        for key, lo, hi in zip(uniques, np.r_[0, bounds], np.r_[bounds, len(order)]):
+            start = max(lo, hi - self.history)
+            result[key] = {
+                "dates": dates[start:hi].tolist(),
+                "values": values[start:hi],
+                "last_date": dates[hi - 1],
+            }
+        return result
+
+    def _load_state(self):
+        output_version = self._output_version()
+        if not os.path.exists(self.state_path) or output_version is None:
+            return None
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if (state.get('input') != os.path.abspath(self.input_path)
+                or state.get('windows') != list(self.windows) or state.get('lags') != list(self.lags)
+                or state.get('encoding') != self.encoding
+                or state.get('output_version') != output_version):
+            return None
+        return state
+
+    def _save_state(self, data, columns, products, offset=None):
+        state = {
+            'input': os.path.abspath(self.input_path),
+            'encoding': self.encoding,
+            'windows': list(self.windows),
+            'lags': list(self.lags),
+            'offset': len(data) if offset is None else offset,
+            'tail_digest': _digest(data),
+            'columns': columns,
+            'output_version': self._output_version(),
+            'products': products,
+        }
+        tmp = f'{self.state_path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state))
+        os.replace(tmp, self.state_path)
+
+    def verify(self):
+        """Compare the feature file with a from-scratch rebuild (ignoring row order)."""
+        with open(self.input_path, 'rb') as f:
+            expected = self._build(self._read(f.read()))
+        expected = pd.read_csv(io.StringIO(expected.to_csv(index=False)), dtype=str, keep_default_na=False)
+        if self.store is None:
+            actual = pd.read_csv(self.output_path, dtype=str, keep_default_na=False)
+        else:
+            stored = self.store.read(self.dataset, organization_id=self.organization_id)
+            actual = pd.read_csv(io.StringIO(stored.to_csv(index=False)), dtype=str, keep_default_na=False)
+        return compare_features(actual, expected, [self.group_col, self.date_col])
+
+
+def compare_features(actual, expected, keys, rtol=1e-12):
+    """Differences between two feature tables read as text (empty "differences" when they agree)."""
+    if list(actual.columns) != list(expected.columns):
+        return {"consistent": False, "differences": {"columns": (list(actual.columns), list(expected.columns))}}
+    if len(actual) != len(expected):
+        return {"consistent": False, "differences": {"rows": (len(actual), len(expected))}}
+    actual = actual.sort_values(keys, kind='stable').reset_index(drop=True)
+    expected = expected.sort_values(keys, kind='stable').reset_index(drop=True)
+    differences = {}
+    for column in actual.columns:
+        mismatch = actual[column] != expected[column]
+        if mismatch.any():
+            # Float features may differ in the last digit when summation order differs
+            left = pd.to_numeric(actual.loc[mismatch, column], errors='coerce')
+            right = pd.to_numeric(expected.loc[mismatch, column], errors='coerce')
+            close = np.isclose(left, right, rtol=rtol, atol=0, equal_nan=False)
+            if not close.all():
+                differences[column] = int((~close).sum())
+    return {"consistent": not differences, "differences": differences}
@@ -0,0 +1,132 @@
+"""
+Rolling-window and lag features computed per product with NumPy kernels.
+
+The feature scripts used to compute these with
+    df.groupby('product')['sales'].transform(lambda x: x.rolling(w, min_periods=1).mean())
+which runs a Python lambda (and builds a Rolling object) for every product.
+The kernels here work on the whole column at once: rows are arranged into
+contiguous product segments and every row knows the offset of its segment's
+first row, so a rolling mean of integer sales is a difference of cumulative
+sums and a lag is a masked shift.
+
+Results are bit-identical to the groupby versions (original row order, NaN
+for rows without a product, float64 output). Integer sales are summed in
+exact int64 arithmetic. Float sales go through pandas' own rolling kernel in
+one pass over the whole column, with window bounds that stop at the segment
+start: it resets its running sum at every segment, exactly as it does per
+group for groupby().rolling(), so the summation order and rounding are the
+same.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+ROLLING_WINDOWS = (7, 30)
+LAGS = (1, 7)
+
+
+def add_time_features(df, date_col='date'):
+    """Calendar columns derived from `date_col` (day_of_week: Monday=0, Sunday=6)."""
+    dates = df[date_col].dt
+    df['day_of_week'] = dates.dayofweek
+    df['month'] = dates.month
+    df['quarter'] = dates.quarter
+    df['year'] = dates.year
+    df['day_of_year'] = dates.dayofyear
+    return df
+
+
+class Segments:
+    """Product segments of a column, in the order groupby would see them.
+
+    `order` is None when every product's rows are already contiguous (e.g.
+    after sort_values(['product', 'date'])); otherwise it is the stable
+    permutation that makes them so, and results are scattered back.
+    """
+
+    def __init__(self, keys):
+        codes, _ = pd.factorize(np.asarray(keys), use_na_sentinel=True)
+        n = len(codes)
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        if len(boundaries) + 1 != len(np.unique(codes)) and n:
+            self.order = np.argsort(codes, kind='stable')
+            codes = codes[self.order]
+            boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        else:
+            self.order = None
+        is_start = np.zeros(n, dtype=bool)
+        is_start[:1] = True
+        is_start[boundaries] = True
+        index = np.arange(n)
+        self.start = np.maximum.accumulate(np.where(is_start, index, 0)) if n else index
+        self.position = index - self.start  # row number within its segment
+        self.missing = codes < 0            # rows without a product key
+
+    def arrange(self, values):
+        values = np.asarray(values)
+        return values if self.order is None else values[self.order]
+
+    def restore(self, result):
+        result[self.missing] = np.nan
+        if self.order is None:
+            return result
+        restored = np.empty_like(result)
+        restored[self.order] = result
+        return restored
+
+
+class _SegmentWindows(BaseIndexer):
+    """Rolling window bounds [lo, i + 1) of every row, clipped at the start of its segment."""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.lo, self.hi
+
+
+def rolling_mean(values, segments, window, min_periods=1):
+    """Trailing `window`-row mean within each segment, NaN below `min_periods` observations."""
+    values = segments.arrange(values)
+    n = len(values)
+    index = np.arange(n)
+    lo = np.maximum(segments.start, index - window + 1).astype(np.int64)
+    if np.issubdtype(values.dtype, np.integer) or values.dtype == np.bool_:
+        csum = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(values, dtype=np.int64, out=csum[1:])
+        counts = index + 1 - lo
+        sums = csum[index + 1] - csum[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = sums / counts
+        result[counts < max(min_periods, 1)] = np.nan
+    else:
+        windows = _SegmentWindows(lo=lo, hi=(index + 1).astype(np.int64))
+        result = (pd.Series(values, dtype=np.float64).rolling(windows, min_periods=max(min_periods, 1)).mean()
+                  .to_numpy(dtype=np.float64, copy=True))
+    return segments.restore(result)
+
+
+def lag(values, segments, periods=1):
+    """Value `periods` rows earlier in the same segment (NaN before the segment's start)."""
+    values = segments.arrange(values).astype(np.float64)
+    result = np.full(len(values), np.nan)
+    if periods < len(values):
+        result[periods:] = values[:len(values) - periods]
+    result[segments.position < periods] = np.nan
+    return segments.restore(result)
+
+
+def add_window_features(df, value_col='sales', group_col='product', windows=ROLLING_WINDOWS, lags=LAGS,
+                        min_periods=1):
+    """Add `<value>_rolling_<w>` and `<value>_lag_<k>` columns, computed per `group_col`."""
+    segments = Segments(df[group_col])
+    values = df[value_col].to_numpy()
+    for window in windows:
+        df[f'{value_col}_rolling_{window}'] = rolling_mean(values, segments, window, min_periods)
+    for periods in lags:
+        df[f'{value_col}_lag_{periods}'] = lag(values, segments, periods)
+    return df
+
+
+def build_features(df, windows=ROLLING_WINDOWS, lags=LAGS, date_col='date', group_col='product', value_col='sales'):
+    """Calendar, rolling and lag features, with rows sorted by product and date."""
+    df = add_time_features(df, date_col)
+    df = df.sort_values([group_col, date_col])
+    return add_window_features(df, value_col, group_col, windows, lags)
@@ -1,24 +1,55 @@
-import pandas as pd
+import argparse
 
-# Load cleaned sales data
-df = pd.read_csv('cleaned_sales.csv', parse_dates=['date'])
+from feature_engineering import window_features
+from feature_engineering.incremental_features import IncrementalFeatureBuilder
+from storage.parquet_store import (
+    ParquetStore, CLEANED_SALES, WOOCOMMERCE_FEATURES, DEFAULT_ORGANIZATION_ID, STORE_DIR,
+)
 
-# Time-based features
-df['day_of_week'] = df['date'].dt.dayofweek
-# Monday=0, Sunday=6
-df['month'] = df['date'].dt.month
-df['quarter'] = df['date'].dt.quarter
-df['year'] = df['date'].dt.year
+# Rolling average sales (7 days, min_periods=1) and lag features (previous day's sales)
+ROLLING_WINDOWS = (7,)
+LAGS = (1,)
 
-df['day_of_year'] = df['date'].dt.dayofyear
 
-df = df.sort_values(['product', 'date'])
+def build_features(df):
+    """Time-based, rolling and lag features for cleaned WooCommerce sales."""
+    return window_features.build_features(df, ROLLING_WINDOWS, LAGS)
 
-# Rolling average sales (7 days, min_periods=1)
-df['sales_rolling_7'] = df.groupby('product')['sales'].transform(lambda x: x.rolling(7, min_periods=1).mean())
 
-# Lag features (previous day's sales)
-df['sales_lag_1'] = df.groupby('product')['sales'].shift(1)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add time, rolling and lag features to cleaned WooCommerce sales")
+    parser.add_argument("--input", help="read the cleaned sales from this CSV instead of the store "
+                                        "(required for --incremental)")
+    parser.add_argument("--output", help="also export the features as CSV (e.g. woocommerce_sales_with_features.csv)")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--organization-id", type=int, default=DEFAULT_ORGANIZATION_ID)
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process rows appended to the input since the last run")
+    parser.add_argument("--verify", action="store_true", help="compare the output with a full rebuild")
+    args = parser.parse_args()
+    store = ParquetStore(args.store)
 
-df.to_csv('woocommerce_sales_with_features.csv', index=False)
-print('Feature-engineered data saved to woocommerce_sales_with_features.csv') 
\ No newline at end of file
+    if args.input is None:
+        # The store's cleaned_sales is rewritten as a whole by the ingestion, so always rebuild from it
+        if args.incremental or args.verify:
+            parser.error("--incremental and --verify need a CSV --input")
+        sales = store.read(CLEANED_SALES, columns=['date', 'product', 'sales'], organization_id=args.organization_id)
+        store.write(WOOCOMMERCE_FEATURES, build_features(sales), args.organization_id)
+    else:
+        builder = IncrementalFeatureBuilder(args.input, None, ROLLING_WINDOWS, LAGS, encoding=args.encoding,
+                                           store=store, dataset=WOOCOMMERCE_FEATURES,
+                                           organization_id=args.organization_id)
+        if args.verify:
+            result = builder.verify()
+            print("Output matches a full rebuild" if result["consistent"] else f"Mismatch: {result['differences']}")
+            raise SystemExit(0 if result["consistent"] else 1)
+        if args.incremental:
+            mode, rows = builder.update()
+            print(f'{mode}: {rows} rows written')
+        else:
+            builder.rebuild()
+    print(f'Feature-engineered data saved to {store.path(WOOCOMMERCE_FEATURES, args.organization_id)}')
+    if args.output:
+        store.export_csv(WOOCOMMERCE_FEATURES, args.output, organization_id=args.organization_id)
+        print(f'Exported as CSV to {args.output}')
@@ -1,19 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import functools
 import jwt
 import os
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 import pandas as pd
 import json
+import asyncio
+
+from deployment.dataset_cache import dataset_cache, DatasetCache
+from deployment.serialization import (
+    json_response, records, forecast_columns, product_columns, order_columns,
+    FORECAST_FIELDS, PRODUCT_FIELDS, ORDER_FIELDS,
+)
+from deployment.query import ListingQuery, page_headers, TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER
+from deployment.export_stream import streaming_export, store_export
+from deployment.bulk_writes import bulk_write, json_batches, ndjson_batches, is_ndjson
+from deployment.dashboard_aggregates import dashboard_aggregates
+from deployment.forecast_service import forecast_service, ModelNotFound, MAX_HORIZON
+from deployment.inventory_service import InventoryService, report_records
+from deployment.event_loop import run_blocking, data_executor, executor_stats, loop_lag
+from deployment.token_cache import token_cache
+from deployment.jobs import job_manager, JobQueueFull, UnknownJobKind
+from deployment import job_tasks
+from models.hierarchy import forecast_totals, RECONCILED_FORECASTS
+from data_ingestion.woocommerce_sync import connection_settings, WooCommerceNotConfigured, WOOCOMMERCE_ORDERS
+from storage.parquet_store import sales_store, SALES_FEATURES, WOOCOMMERCE_FEATURES, DEFAULT_ORGANIZATION_ID
+from storage.database import create_db_engine, init_database
+from storage.repositories import (
+    UserRepository, OrganizationRepository, ForecastRepository, RevokedTokenRepository, DuplicateRecord,
+    MissingRecord,
+)
 
 # Import your existing ML models (optional - handle missing files gracefully)
 try:
     from models.prophet_woocommerce import ProphetWooCommerceModel
     from models.safety_stock_and_reorder import SafetyStockAndReorderModel
-    from data_ingestion.process_woocommerce_export import WooCommerceDataProcessor
     ML_MODELS_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Some ML models could not be imported: {e}")
@@ -22,7 +49,19 @@ except Exception as e:
     print(f"Warning: Error importing ML models: {e}")
     ML_MODELS_AVAILABLE = False
 
-app = FastAPI(title="WooCommerce Forecasting API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_blocking(init_database, engine)
+    # Warm the forecast model cache in the background so startup is not delayed
+    preload = asyncio.get_running_loop().run_in_executor(data_executor, forecast_service.preload)
+    loop_lag.start()
+    yield
+    await preload
+    await loop_lag.stop()
+    job_manager.shutdown(wait=False)
+    data_executor.shutdown(wait=False)
+
+app = FastAPI(title="WooCommerce Forecasting API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -31,8 +70,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER],
 )
 
+# Records the paths in flight so event-loop stalls can be attributed
+@app.middleware("http")
+async def track_in_flight(request, call_next):
+    with loop_lag.track(request.url.path):
+        return await call_next(request)
+
 # Security
 security = HTTPBearer()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -58,21 +104,38 @@ class Organization(BaseModel):
     id: int
     name: str
     stripe_customer_id: Optional[str] = None
-    created_at: str
-    updated_at: str
 
 class DashboardData(BaseModel):
     totalProducts: int
     totalForecastedSales: float
     organizationId: int
+    forecastSource: Optional[str] = None
+    forecastByCategory: Optional[Dict[str, float]] = None
+    forecastStart: Optional[str] = None
+    forecastEnd: Optional[str] = None
 
 class SalesForecast(BaseModel):
     id: int
     product_id: int
-    forecasted_sales: float
+    forecasted_sales: int
     forecast_date: str
     organization_id: int
 
+# Write models of SalesForecast (the id is assigned by the database)
+class SalesForecastInput(BaseModel):
+    product_id: int
+    forecasted_sales: int
+    forecast_date: datetime
+    organization_id: Optional[int] = None
+
+class SalesForecastCreate(SalesForecastInput):
+    forecast_date: Optional[datetime] = None
+
+class SalesForecastUpdate(BaseModel):
+    product_id: Optional[int] = None
+    forecasted_sales: Optional[int] = None
+    forecast_date: Optional[datetime] = None
+
 class WooCommerceProduct(BaseModel):
     id: int
     name: str
@@ -80,6 +143,22 @@ class WooCommerceProduct(BaseModel):
     status: str
     stock_quantity: Optional[int] = None
 
+class ReorderItem(BaseModel):
+    product: str
+    current_stock: float
+    lead_time_days: Optional[float] = None
+    service_level: Optional[float] = None
+
+class ReorderRequest(BaseModel):
+    items: List[ReorderItem]
+    lead_time_days: float = 14
+    service_level: float = 0.95
+
+class JobRequest(BaseModel):
+    kind: str
+    # Validated against the parameter model of `kind` (deployment/job_tasks.py) on submit
+    params: Dict[str, Any] = {}
+
 class WooCommerceOrder(BaseModel):
     id: int
     status: str
@@ -87,45 +166,79 @@ class WooCommerceOrder(BaseModel):
     date_created: str
     customer_id: Optional[int] = None
 
-# Mock database (replace with real database)
-users_db = {
-    1: {"id": 1, "email": "admin@example.com", "password": "admin123", "name": "Admin User", "organization_id": 1}
-}
-
-organizations_db = {
-    1: {"id": 1, "name": "Demo Organization", "stripe_customer_id": None, "created_at": "2024-01-01", "updated_at": "2024-01-01"}
-}
+# Users, organizations and forecasts live in DATABASE_URL (pooled connections shared by all requests)
+engine = create_db_engine()
+user_repository = UserRepository(engine)
+organization_repository = OrganizationRepository(engine)
+forecast_repository = ForecastRepository(engine)
+revoked_token_repository = RevokedTokenRepository(engine)
 
 # Authentication functions
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=30)
-    to_encode.update({"exp": expire})
+    expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+    # jti identifies the token for revocation
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return int(user_id)
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
-
-def get_current_user(user_id: int = Depends(verify_token)):
-    if user_id not in users_db:
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+# Tokens verified once are served from token_cache until its TTL or their expiry
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    payload = decode_token(token)
+    if payload.get("jti") and revoked_token_repository.is_revoked(payload["jti"]):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    user = user_repository.get(int(payload["sub"]))
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return users_db[user_id]
-
-# Helper function to safely load CSV files
+    token_cache.put(token, user, payload.get("exp"))
+    return user
+
+def own_organization(current_user: dict, organization_id: Optional[int] = None) -> int:
+    # Forecasts are written and jobs run only within the caller's organization
+    if organization_id not in (None, current_user["organization_id"]):
+        raise HTTPException(status_code=403, detail="Not a member of this organization")
+    return current_user["organization_id"]
+
+# Source files and filter columns of the listing endpoints
+FORECASTS_CSV = "woocommerce_sales_with_features.csv"
+WOOCOMMERCE_ORDERS_CSV = "woocommerce_orders_export.csv"
+FORECAST_FILTERS = {"date_column": 'date', "product_column": 'product_id'}
+PRODUCT_FILTERS = {"date_column": ('date', 'date_created'), "product_column": 'product_id'}
+ORDER_FILTERS = {"date_column": ('date', 'date_created'), "product_column": 'product_id',
+                 "status_column": 'status', "status_default": 'completed'}
+
+# Reads of the Parquet store, validated against the dataset's version file
+store_cache = DatasetCache(loader=sales_store.read, signature=sales_store.version)
+
+inventory_service = InventoryService(functools.partial(store_cache.get, SALES_FEATURES))
+
+# Background jobs (polled through /api/jobs)
+job_manager.register("woocommerce_sync", job_tasks.woocommerce_sync, job_tasks.SyncParams, process=True)
+job_manager.register("retrain_forecasts", job_tasks.retrain_forecasts, job_tasks.RetrainParams, process=True)
+job_manager.register("reorder_report", functools.partial(job_tasks.reorder_report, inventory_service),
+                     job_tasks.ReorderParams)
+
+# Helper function to safely load CSV files (served from the shared dataset cache;
+# the returned DataFrame is shared between requests and must not be modified)
 def safe_load_csv(filename: str, default_data=None):
     try:
         if os.path.exists(filename):
-            return pd.read_csv(filename)
+            return dataset_cache.get(filename)
         else:
             print(f"Warning: File {filename} not found, using default data")
             return default_data or pd.DataFrame()
@@ -133,79 +246,119 @@ def safe_load_csv(filename: str, default_data=None):
         print(f"Warning: Error loading {filename}: {e}")
         return default_data or pd.DataFrame()
 
+# One organization's rows of a Parquet store dataset (the CSV export if the dataset
+# has never been written); shared between requests like safe_load_csv
+def load_organization_data(organization_id: int, dataset: str, csv_fallback: str):
+    if not sales_store.exists(dataset):
+        return safe_load_csv(csv_fallback)
+    try:
+        return store_cache.get(dataset, organization_id=organization_id)
+    except Exception as e:
+        print(f"Warning: Error loading {dataset} from the store: {e}")
+        return pd.DataFrame()
+
+# Load, filter, page and convert one listing page; blocking, so handlers run it
+# with run_blocking(). Returns None when there is no data for the organization.
+def listing_page(organization_id: int, dataset: str, csv_fallback: str, query: ListingQuery,
+                 filters: dict, build_columns):
+    data = load_organization_data(organization_id, dataset, csv_fallback)
+    if data.empty:
+        return None
+    page, total, next_cursor = query.page(query.filter(data, **filters))
+    columns = build_columns(page)
+    return columns, records(columns), total, next_cursor
+
 # Authentication endpoints
 @app.post("/api/auth/login")
 async def login(user_data: UserLogin):
-    # Mock authentication - replace with real authentication
-    for user in users_db.values():
-        if user["email"] == user_data.email and user["password"] == user_data.password:
-            access_token = create_access_token(data={"sub": str(user["id"])})
-            return {
-                "success": True,
-                "data": {
-                    "access_token": access_token,
-                    "token_type": "bearer",
-                    "user": {
-                        "id": user["id"],
-                        "email": user["email"],
-                        "name": user["name"],
-                        "organization_id": user["organization_id"]
-                    }
-                }
-            }
-    
-    raise HTTPException(status_code=401, detail="Invalid credentials")
+    user = await run_blocking(user_repository.authenticate, user_data.email, user_data.password)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    access_token = create_access_token(data={"sub": str(user["id"])})
+    return {
+        "success": True,
+        "data": {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "user": user
+        }
+    }
 
 @app.post("/api/auth/register")
 async def register(user_data: UserRegister):
-    # Mock registration - replace with real registration
-    user_id = len(users_db) + 1
-    users_db[user_id] = {
-        "id": user_id,
-        "email": user_data.email,
-        "password": user_data.password,
-        "name": user_data.name,
-        "organization_id": 1
-    }
+    # New users join the default organization
+    try:
+        user = await run_blocking(user_repository.create, user_data.email, user_data.password, user_data.name,
+                                  DEFAULT_ORGANIZATION_ID)
+    except DuplicateRecord as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    access_token = create_access_token(data={"sub": str(user_id)})
+    access_token = create_access_token(data={"sub": str(user["id"])})
     return {
         "success": True,
         "data": {
             "access_token": access_token,
             "token_type": "bearer",
-            "user": {
-                "id": user_id,
-                "email": user_data.email,
-                "name": user_data.name,
-                "organization_id": 1
-            }
+            "user": user
         }
     }
 
+@app.post("/api/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security),
+                 current_user: dict = Depends(get_current_user)):
+    # Revokes the presented token; other workers drop it from their caches within TOKEN_CACHE_TTL_SECONDS
+    payload = decode_token(credentials.credentials)
+    if payload.get("jti"):
+        await run_blocking(revoked_token_repository.revoke, payload["jti"], current_user["id"],
+                           datetime.fromtimestamp(payload["exp"], tz=timezone.utc))
+    token_cache.invalidate(credentials.credentials)
+    return {
+        "success": True,
+        "data": None
+    }
+
+# Organization and category totals of the reconciled forecasts written by the
+# retrain_forecasts job (models/hierarchy.py), or None before its first run
+def reconciled_totals(organization_id: int):
+    if not sales_store.exists(RECONCILED_FORECASTS, organization_id):
+        return None
+    reconciled = store_cache.get(RECONCILED_FORECASTS, organization_id=organization_id)
+    return forecast_totals(reconciled) if not reconciled.empty else None
+
 # Dashboard endpoints
 @app.get("/api/dashboard/{organization_id}")
 async def get_dashboard_data(organization_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        # Load your existing data safely
-        sales_data = safe_load_csv("sales_with_features.csv")
+        # Dashboard metrics come from the incrementally maintained aggregates
+        summary = await run_blocking(dashboard_aggregates.summary, organization_id)
         
-        # Calculate dashboard metrics
-        if not sales_data.empty and 'product_id' in sales_data.columns:
-            total_products = len(sales_data['product_id'].unique())
-            total_forecasted_sales = sales_data['quantity'].sum() if 'quantity' in sales_data.columns else 0
+        if summary is not None:
+            total_products = summary["totalProducts"]
+            total_forecasted_sales = summary["totalForecastedSales"]
         else:
-            # Use mock data if CSV is not available
+            # Use mock data if the organization has no sales data
             total_products = 25
             total_forecasted_sales = 15000.0
         
+        data = {
+            "totalProducts": total_products,
+            "totalForecastedSales": float(total_forecasted_sales),
+            "organizationId": organization_id,
+            "forecastSource": "sales" if summary is not None else "mock",
+        }
+        # Once forecasts have been reconciled, the total is the organization-level forecast
+        totals = await run_blocking(reconciled_totals, organization_id)
+        if totals is not None:
+            data.update({
+                "totalForecastedSales": totals["total"],
+                "forecastSource": "reconciled",
+                "forecastByCategory": totals["categories"],
+                "forecastStart": totals["start"],
+                "forecastEnd": totals["end"],
+            })
         return {
             "success": True,
-            "data": {
-                "totalProducts": total_products,
-                "totalForecastedSales": float(total_forecasted_sales),
-                "organizationId": organization_id
-            }
+            "data": data
         }
     except Exception as e:
         return {
@@ -217,122 +370,303 @@ async def get_dashboard_data(organization_id: int, current_user: dict = Depends(
 async def get_dashboard_summary(organization_id: int, current_user: dict = Depends(get_current_user)):
     return await get_dashboard_data(organization_id, current_user)
 
+@app.get("/api/dashboard/{organization_id}/rollups")
+async def get_dashboard_rollups(organization_id: int,
+                                start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                                end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                                top: int = Query(20, ge=1, le=1000),
+                                current_user: dict = Depends(get_current_user)):
+    # Sales per day and the best-selling products, from the incrementally maintained aggregates
+    if not sales_store.exists(SALES_FEATURES, organization_id):
+        raise HTTPException(status_code=404, detail="Sales data not found")
+    return {
+        "success": True,
+        "data": await run_blocking(dashboard_aggregates.rollups, organization_id, start_date, end_date, top)
+    }
+
+@app.post("/api/dashboard/{organization_id}/recompute")
+async def recompute_dashboard_aggregates(organization_id: int, current_user: dict = Depends(get_current_user)):
+    # Rebuild the aggregates from scratch and report any drift from the incremental state
+    if not sales_store.exists(SALES_FEATURES, organization_id):
+        raise HTTPException(status_code=404, detail="Sales data not found")
+    return {
+        "success": True,
+        "data": await run_blocking(dashboard_aggregates.verify, organization_id)
+    }
+
+# System endpoints
+@app.get("/api/system/cache")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "success": True,
+        "data": {
+            **dataset_cache.stats(),
+            "store": store_cache.stats(),
+            "tokens": token_cache.stats(),
+            "forecasts": forecast_service.stats()
+        }
+    }
+
+# Job endpoints
+def submit_job(kind: str, organization_id: int, params: Optional[dict] = None):
+    try:
+        return job_manager.submit(kind, organization_id, params)
+    except UnknownJobKind as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters for {kind}: {e}")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def organization_job(organization_id: int, job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job.organization_id != organization_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/jobs/{organization_id}", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(organization_id: int, request: JobRequest, current_user: dict = Depends(get_current_user)):
+    own_organization(current_user, organization_id)
+    job = submit_job(request.kind, organization_id, request.params)
+    return {
+        "success": True,
+        "data": job.to_dict()
+    }
+
+@app.get("/api/jobs/{organization_id}")
+async def list_jobs(organization_id: int, job_status: Optional[str] = Query(None, alias="status"),
+                    current_user: dict = Depends(get_current_user)):
+    own_organization(current_user, organization_id)
+    return {
+        "success": True,
+        "data": [job.to_dict() for job in job_manager.list(organization_id, job_status)]
+    }
+
+@app.get("/api/jobs/{organization_id}/{job_id}")
+async def get_job(organization_id: int, job_id: str, current_user: dict = Depends(get_current_user)):
+    own_organization(current_user, organization_id)
+    return {
+        "success": True,
+        "data": organization_job(organization_id, job_id).to_dict()
+    }
+
+@app.delete("/api/jobs/{organization_id}/{job_id}")
+async def cancel_job(organization_id: int, job_id: str, current_user: dict = Depends(get_current_user)):
+    own_organization(current_user, organization_id)
+    organization_job(organization_id, job_id)
+    return {
+        "success": True,
+        "data": job_manager.cancel(job_id).to_dict()
+    }
+
+@app.get("/api/system/event-loop")
+async def get_event_loop_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "success": True,
+        "data": {
+            "lag": loop_lag.stats(),
+            "data_executor": executor_stats()
+        }
+    }
+
+@app.get("/api/system/jobs")
+async def get_job_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "success": True,
+        "data": job_manager.stats()
+    }
+
 # Organizations endpoints
 @app.get("/api/organizations")
 async def get_organizations(current_user: dict = Depends(get_current_user)):
     return {
         "success": True,
-        "data": list(organizations_db.values())
+        "data": await run_blocking(organization_repository.list)
     }
 
 @app.get("/api/organizations/{org_id}")
 async def get_organization(org_id: int, current_user: dict = Depends(get_current_user)):
-    if org_id not in organizations_db:
+    organization = await run_blocking(organization_repository.get, org_id)
+    if organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
     
     return {
         "success": True,
-        "data": organizations_db[org_id]
+        "data": organization
     }
 
 # Sales forecasts endpoints
 @app.get("/api/sales-forecasts/{organization_id}")
-async def get_sales_forecasts(organization_id: int, current_user: dict = Depends(get_current_user)):
+async def get_sales_forecasts(organization_id: int, query: ListingQuery = Depends(),
+                              output_format: str = Query("json", alias="format", pattern="^(json|ndjson|json-stream)$"),
+                              current_user: dict = Depends(get_current_user)):
+    fields = query.projection(FORECAST_FIELDS)
+    build_export_columns = (
+        lambda chunk, now=datetime.now().isoformat(): forecast_columns(chunk, organization_id, now, fields))
+    if output_format != "json" and sales_store.exists(WOOCOMMERCE_FEATURES):
+        # Full export: stream the organization's Parquet partitions batch by batch
+        return store_export(sales_store, WOOCOMMERCE_FEATURES, organization_id, output_format, query,
+                            FORECAST_FILTERS, build_export_columns)
+    if output_format != "json" and os.path.exists(FORECASTS_CSV):
+        # Full export: stream the file in chunks instead of building one document
+        return streaming_export(FORECASTS_CSV, output_format, query, FORECAST_FILTERS, build_export_columns)
     try:
         # Load your existing forecast data safely
-        forecast_data = safe_load_csv("woocommerce_sales_with_features.csv")
+        listing = await run_blocking(listing_page, organization_id, WOOCOMMERCE_FEATURES, FORECASTS_CSV, query,
+                                     FORECAST_FILTERS, lambda page: forecast_columns(page, organization_id, fields=fields))
         
-        forecasts = []
-        if not forecast_data.empty:
-            for _, row in forecast_data.iterrows():
-                forecasts.append({
-                    "id": int(row.get('product_id', 0)),
-                    "product_id": int(row.get('product_id', 0)),
-                    "forecasted_sales": float(row.get('quantity', 0)),
-                    "forecast_date": datetime.now().isoformat(),
-                    "organization_id": organization_id
-                })
+        if listing is not None:
+            columns, forecasts, total, next_cursor = listing
         else:
             # Mock data if CSV is not available
+            columns = None
             forecasts = [
                 {
                     "id": 1,
                     "product_id": 1,
-                    "forecasted_sales": 100.0,
+                    "forecasted_sales": 100,
                     "forecast_date": datetime.now().isoformat(),
                     "organization_id": organization_id
                 }
             ]
+            total, next_cursor = len(forecasts), None
         
-        return {
+        return await run_blocking(json_response, {
             "success": True,
             "data": forecasts
-        }
+        }, columns, page_headers(total, next_cursor))
     except Exception as e:
         return {
             "success": False,
             "error": str(e)
         }
 
+@app.get("/api/forecast/{organization_id}/{product}")
+async def get_forecast(organization_id: int, product: str,
+                       horizon: int = Query(14, ge=1, le=MAX_HORIZON),
+                       interval_width: float = Query(0.8, gt=0, lt=1),
+                       current_user: dict = Depends(get_current_user)):
+    # Served from preloaded models; loading and predict() run in the data thread pool
+    try:
+        result = await run_blocking(forecast_service.forecast, organization_id, product, horizon, interval_width)
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Forecasting is not available: {e}")
+    return {
+        "success": True,
+        "data": result
+    }
+
+@app.get("/api/sales-forecasts/{organization_id}/products/{product_id}")
+async def get_product_forecasts(organization_id: int, product_id: int,
+                                start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                current_user: dict = Depends(get_current_user)):
+    # Stored forecasts of one product (served by the (organization, product, date) index)
+    return {
+        "success": True,
+        "data": await run_blocking(forecast_repository.for_product, organization_id, product_id, start, end)
+    }
+
 @app.post("/api/sales-forecasts")
-async def create_sales_forecast(forecast_data: dict, current_user: dict = Depends(get_current_user)):
-    # Mock creation - replace with real database operation
+async def create_sales_forecast(forecast_data: SalesForecastCreate, current_user: dict = Depends(get_current_user)):
+    organization_id = own_organization(current_user, forecast_data.organization_id)
+    try:
+        forecast = await run_blocking(forecast_repository.create, organization_id, forecast_data.product_id,
+                                      forecast_data.forecasted_sales, forecast_data.forecast_date)
+    except MissingRecord as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except DuplicateRecord as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return {
         "success": True,
-        "data": {
-            "id": 1,
-            "product_id": forecast_data.get("product_id"),
-            "forecasted_sales": forecast_data.get("forecasted_sales"),
-            "forecast_date": datetime.now().isoformat(),
-            "organization_id": forecast_data.get("organization_id")
+        "data": forecast
+    }
+
+def write_forecasts(organization_id: int, forecasts: List[SalesForecastInput]):
+    # One set-based upsert for a validated batch
+    return forecast_repository.bulk_upsert(organization_id, pd.DataFrame({
+        "product_id": [forecast.product_id for forecast in forecasts],
+        "forecasted_sales": [forecast.forecasted_sales for forecast in forecasts],
+        "forecast_date": [forecast.forecast_date for forecast in forecasts],
+    }))
+
+@app.post("/api/sales-forecasts/{organization_id}/bulk")
+async def upsert_sales_forecasts(organization_id: int, request: Request, response: Response,
+                                 current_user: dict = Depends(get_current_user)):
+    # JSON array or NDJSON stream of SalesForecastInput rows, upserted in batches keyed on (product_id, forecast_date)
+    # The organization is checked before the body is read: nothing is streamed for an unknown one
+    if await run_blocking(organization_repository.get, organization_id) is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    own_organization(current_user, organization_id)
+
+    def check(forecast: SalesForecastInput):
+        if forecast.organization_id not in (None, organization_id):
+            raise ValueError(f"organization_id {forecast.organization_id} does not match the URL")
+
+    ndjson = is_ndjson(request.headers.get("content-type"))
+    batches = ndjson_batches(request) if ndjson else json_batches(request)
+    try:
+        result = await bulk_write(batches, SalesForecastInput,
+                                  functools.partial(write_forecasts, organization_id), parse=ndjson, check=check)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid body: {e}")
+    if result["failed_batches"]:
+        # Batches are committed one by one: 207 when some rows were written, 500 when none were
+        response.status_code = 207 if result["written"] else 500
+        return {
+            "success": False,
+            "error": f"{result['failed_batches']} of {len(result['batches'])} batches could not be written",
+            "data": result
         }
+    return {
+        "success": True,
+        "data": result
     }
 
 @app.put("/api/sales-forecasts/{forecast_id}")
-async def update_sales_forecast(forecast_id: int, forecast_data: dict, current_user: dict = Depends(get_current_user)):
-    # Mock update - replace with real database operation
+async def update_sales_forecast(forecast_id: int, forecast_data: SalesForecastUpdate,
+                                current_user: dict = Depends(get_current_user)):
+    try:
+        forecast = await run_blocking(forecast_repository.update, own_organization(current_user), forecast_id,
+                                      **forecast_data.model_dump())
+    except DuplicateRecord as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if forecast is None:
+        raise HTTPException(status_code=404, detail="Forecast not found")
     return {
         "success": True,
-        "data": {
-            "id": forecast_id,
-            "product_id": forecast_data.get("product_id"),
-            "forecasted_sales": forecast_data.get("forecasted_sales"),
-            "forecast_date": datetime.now().isoformat(),
-            "organization_id": forecast_data.get("organization_id")
-        }
+        "data": forecast
     }
 
 @app.delete("/api/sales-forecasts/{forecast_id}")
 async def delete_sales_forecast(forecast_id: int, current_user: dict = Depends(get_current_user)):
-    # Mock deletion - replace with real database operation
+    if not await run_blocking(forecast_repository.delete, own_organization(current_user), forecast_id):
+        raise HTTPException(status_code=404, detail="Forecast not found")
     return {
         "success": True,
         "data": None
     }
 
-# WooCommerce integration endpoints
-@app.post("/api/woocommerce/sync/{organization_id}")
-async def sync_woocommerce_data(organization_id: int, current_user: dict = Depends(get_current_user)):
+# Inventory endpoints
+@app.get("/api/inventory/reorder/{organization_id}")
+async def get_reorder_report(organization_id: int,
+                             lead_time_days: float = Query(14, gt=0),
+                             service_level: float = Query(0.95, gt=0, lt=1),
+                             product: Optional[List[str]] = Query(None),
+                             only_reorder: bool = False,
+                             current_user: dict = Depends(get_current_user)):
+    # Uses the organization's last posted stock levels (default stock for the rest)
     try:
-        # Use your existing WooCommerce processor if available
-        if ML_MODELS_AVAILABLE:
-            try:
-                processor = WooCommerceDataProcessor()
-                # Mock sync operation
-                return {
-                    "success": True,
-                    "data": {
-                        "message": f"Successfully synced WooCommerce data for organization {organization_id}"
-                    }
-                }
-            except Exception as e:
-                print(f"Warning: WooCommerce processor error: {e}")
-        
-        # Fallback response
+        report, unknown = await run_blocking(
+            inventory_service.evaluate, organization_id, product, None, lead_time_days, service_level)
+        if only_reorder:
+            report = report[report['recommended_order_qty'] > 0]
         return {
             "success": True,
             "data": {
-                "message": f"Successfully synced WooCommerce data for organization {organization_id}"
+                "items": report_records(report),
+                "unknown_products": unknown
             }
         }
     except Exception as e:
@@ -341,24 +675,63 @@ async def sync_woocommerce_data(organization_id: int, current_user: dict = Depen
             "error": str(e)
         }
 
+@app.post("/api/inventory/reorder/{organization_id}")
+async def evaluate_reorder_points(organization_id: int, request: ReorderRequest, current_user: dict = Depends(get_current_user)):
+    # Bulk evaluation from live stock levels; only products whose inputs changed are recomputed
+    try:
+        stock = {item.product: item.current_stock for item in request.items}
+        overrides = {
+            item.product: {"lead_time_days": item.lead_time_days, "service_level": item.service_level}
+            for item in request.items
+            if item.lead_time_days is not None or item.service_level is not None
+        }
+        report, unknown = await run_blocking(
+            inventory_service.evaluate, organization_id, list(stock), stock,
+            request.lead_time_days, request.service_level, overrides)
+        return {
+            "success": True,
+            "data": {
+                "items": report_records(report),
+                "unknown_products": unknown
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+# WooCommerce integration endpoints
+@app.post("/api/woocommerce/sync/{organization_id}", status_code=status.HTTP_202_ACCEPTED)
+async def sync_woocommerce_data(organization_id: int, current_user: dict = Depends(get_current_user)):
+    # Runs as a background job; poll GET /api/jobs/{organization_id}/{job_id} for the result
+    own_organization(current_user, organization_id)
+    try:
+        connection_settings(organization_id)
+    except WooCommerceNotConfigured as e:
+        raise HTTPException(status_code=503, detail=f"WooCommerce is not configured: {e}")
+    job = submit_job("woocommerce_sync", organization_id)
+    return {
+        "success": True,
+        "data": {
+            "message": f"WooCommerce sync for organization {organization_id} is {job.status}",
+            "job": job.to_dict()
+        }
+    }
+
 @app.get("/api/woocommerce/products/{organization_id}")
-async def get_woocommerce_products(organization_id: int, current_user: dict = Depends(get_current_user)):
+async def get_woocommerce_products(organization_id: int, query: ListingQuery = Depends(), current_user: dict = Depends(get_current_user)):
+    fields = query.projection(PRODUCT_FIELDS)
     try:
         # Load your existing WooCommerce data safely
-        wc_data = safe_load_csv("woocommerce_orders_export.csv")
+        listing = await run_blocking(listing_page, organization_id, WOOCOMMERCE_ORDERS, WOOCOMMERCE_ORDERS_CSV,
+                                     query, PRODUCT_FILTERS, lambda page: product_columns(page, fields=fields))
         
-        products = []
-        if not wc_data.empty:
-            for _, row in wc_data.iterrows():
-                products.append({
-                    "id": int(row.get('product_id', 0)),
-                    "name": str(row.get('product_name', 'Unknown')),
-                    "price": str(row.get('price', '0')),
-                    "status": 'publish',
-                    "stock_quantity": int(row.get('quantity', 0))
-                })
+        if listing is not None:
+            columns, products, total, next_cursor = listing
         else:
             # Mock data if CSV is not available
+            columns = None
             products = [
                 {
                     "id": 1,
@@ -368,11 +741,12 @@ async def get_woocommerce_products(organization_id: int, current_user: dict = De
                     "stock_quantity": 10
                 }
             ]
+            total, next_cursor = len(products), None
         
-        return {
+        return await run_blocking(json_response, {
             "success": True,
             "data": products
-        }
+        }, columns, page_headers(total, next_cursor))
     except Exception as e:
         return {
             "success": False,
@@ -380,23 +754,29 @@ async def get_woocommerce_products(organization_id: int, current_user: dict = De
         }
 
 @app.get("/api/woocommerce/orders/{organization_id}")
-async def get_woocommerce_orders(organization_id: int, current_user: dict = Depends(get_current_user)):
+async def get_woocommerce_orders(organization_id: int, query: ListingQuery = Depends(),
+                                 output_format: str = Query("json", alias="format", pattern="^(json|ndjson|json-stream)$"),
+                                 current_user: dict = Depends(get_current_user)):
+    fields = query.projection(ORDER_FIELDS)
+    if output_format != "json" and sales_store.exists(WOOCOMMERCE_ORDERS):
+        # Full export: stream the organization's synced order lines batch by batch
+        return store_export(sales_store, WOOCOMMERCE_ORDERS, organization_id, output_format, query, ORDER_FILTERS,
+                            lambda chunk, now=datetime.now().isoformat(): order_columns(chunk, now, fields))
+    if output_format != "json" and os.path.exists(WOOCOMMERCE_ORDERS_CSV):
+        # Full export: stream the file in chunks instead of building one document
+        return streaming_export(
+            WOOCOMMERCE_ORDERS_CSV, output_format, query, ORDER_FILTERS,
+            lambda chunk, now=datetime.now().isoformat(): order_columns(chunk, now, fields))
     try:
         # Load your existing WooCommerce data safely
-        wc_data = safe_load_csv("woocommerce_orders_export.csv")
+        listing = await run_blocking(listing_page, organization_id, WOOCOMMERCE_ORDERS, WOOCOMMERCE_ORDERS_CSV,
+                                     query, ORDER_FILTERS, lambda page: order_columns(page, fields=fields))
         
-        orders = []
-        if not wc_data.empty:
-            for _, row in wc_data.iterrows():
-                orders.append({
-                    "id": int(row.get('order_id', 0)),
-                    "status": str(row.get('status', 'completed')),
-                    "total": str(row.get('total', '0')),
-                    "date_created": str(row.get('date', datetime.now().isoformat())),
-                    "customer_id": int(row.get('customer_id', 0)) if 'customer_id' in wc_data.columns else None
-                })
+        if listing is not None:
+            columns, orders, total, next_cursor = listing
         else:
             # Mock data if CSV is not available
+            columns = None
             orders = [
                 {
                     "id": 1,
@@ -406,11 +786,12 @@ async def get_woocommerce_orders(organization_id: int, current_user: dict = Depe
                     "customer_id": 1
                 }
             ]
+            total, next_cursor = len(orders), None
         
-        return {
+        return await run_blocking(json_response, {
             "success": True,
             "data": orders
-        }
+        }, columns, page_headers(total, next_cursor))
     except Exception as e:
         return {
             "success": False,
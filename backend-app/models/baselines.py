@@ -0,0 +1,208 @@
+"""
+Vectorized baseline forecasters
+
+Fitting Prophet costs seconds per product, which is wasted on the long tail
+of low-volume products. The baselines here forecast every product at once:
+the sales are laid out as a products x days matrix and each model is a few
+NumPy operations over its rows.
+
+- seasonal_naive:        repeats the last `season` days
+- moving_average:        mean of the last `window` days
+- exponential_smoothing: simple exponential smoothing with `alpha`
+- croston:               Croston's method for intermittent demand (SBA
+                         bias correction by default): smoothed demand size
+                         divided by the smoothed interval between demands
+
+The matrix covers the last HISTORY_DAYS days of the data. Days without a sales
+row count as zero sales from a product's first row on; earlier days are NaN
+and ignored. Products are processed in blocks of BLOCK_PRODUCTS rows to bound
+memory. The interval is yhat +/- z * (standard deviation of the last `window`
+days), clipped at zero.
+
+Output matches models/batch_forecast.py: product, ds, yhat, yhat_lower,
+yhat_upper for the `horizon` days after the last date of the data.
+
+Usage (from backend-app/):
+    python -m models.baselines --model croston --horizon 14
+"""
+import argparse
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from storage.parquet_store import ParquetStore, load_dataset, WOOCOMMERCE_FEATURES, STORE_DIR
+
+HISTORY_DAYS = int(os.getenv("BASELINE_HISTORY_DAYS", "365"))
+BLOCK_PRODUCTS = int(os.getenv("BASELINE_BLOCK_PRODUCTS", "20000"))
+SEASON = 7
+WINDOW = 28
+
+
+def sales_panel(df, product_col='product', date_col='date', value_col='sales', history_days=HISTORY_DAYS,
+                end=None):
+    """(products, dates, matrix) of daily sales; matrix[i, t] is NaN before product i's first row.
+
+    Duplicate (product, day) rows are summed. `end` (default: the last date
+    of `df`) is the last day of the matrix.
+    """
+    df = df[df[product_col].notna()]
+    dates = pd.to_datetime(df[date_col]).dt.normalize()
+    codes, products = pd.factorize(df[product_col], sort=True)
+    end = pd.Timestamp(end).normalize() if end is not None else dates.max()
+    start = max(dates.min(), end - pd.Timedelta(days=history_days - 1))
+    columns = ((dates - start) // pd.Timedelta(days=1)).to_numpy()
+    days = int((end - start) // pd.Timedelta(days=1)) + 1
+
+    first = pd.Series(np.clip(columns, 0, None)).groupby(codes).min().reindex(
+        range(len(products)), fill_value=days).to_numpy()
+    inside = (columns >= 0) & (columns < days)
+    flat = codes[inside].astype(np.int64) * days + columns[inside]
+    matrix = np.bincount(flat, weights=df[value_col].to_numpy(dtype=np.float64)[inside],
+                         minlength=len(products) * days).reshape(len(products), days)
+    matrix[np.arange(days)[None, :] < first[:, None]] = np.nan
+    return pd.Index(products), pd.date_range(start, periods=days), matrix
+
+
+def _last_valid(matrix):
+    """Last non-NaN value of every row (0 for all-NaN rows)."""
+    valid = ~np.isnan(matrix)
+    last = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    values = matrix[np.arange(len(matrix)), last]
+    return np.where(valid.any(axis=1), values, 0.0)
+
+
+def _row_nanmean(matrix):
+    counts = (~np.isnan(matrix)).sum(axis=1)
+    sums = np.nansum(matrix, axis=1)
+    return np.divide(sums, counts, out=np.zeros(len(matrix)), where=counts > 0)
+
+
+def seasonal_naive(matrix, horizon, season=SEASON):
+    """The last `season` days repeated (days the product did not exist yet fall back to its last value)."""
+    if matrix.shape[1] < season:
+        return np.repeat(_last_valid(matrix)[:, None], horizon, axis=1)
+    last_season = matrix[:, -season:]
+    forecast = last_season[:, np.arange(horizon) % season]
+    return np.where(np.isnan(forecast), _last_valid(matrix)[:, None], forecast)
+
+
+def moving_average(matrix, horizon, window=WINDOW):
+    return np.repeat(_row_nanmean(matrix[:, -window:])[:, None], horizon, axis=1)
+
+
+def exponential_smoothing(matrix, horizon, alpha=0.2):
+    """Simple exponential smoothing; the level starts at each product's first value."""
+    level = np.full(len(matrix), np.nan)
+    for t in range(matrix.shape[1]):
+        y = matrix[:, t]
+        observed = ~np.isnan(y)
+        level = np.where(observed, np.where(np.isnan(level), y, alpha * y + (1 - alpha) * level), level)
+    return np.repeat(np.nan_to_num(level)[:, None], horizon, axis=1)
+
+
+def croston(matrix, horizon, alpha=0.1, variant='sba'):
+    """Croston's method; 'sba' applies the Syntetos-Boylan (1 - alpha / 2) bias correction."""
+    size = np.full(len(matrix), np.nan)      # smoothed non-zero demand
+    interval = np.full(len(matrix), np.nan)  # smoothed days between demands
+    since = np.ones(len(matrix))             # days since the last demand (inclusive)
+    for t in range(matrix.shape[1]):
+        y = matrix[:, t]
+        demand = y > 0  # NaN compares False
+        first = demand & np.isnan(size)
+        update = demand & ~first
+        size = np.where(first, y, np.where(update, size + alpha * (y - size), size))
+        interval = np.where(first, since, np.where(update, interval + alpha * (since - interval), interval))
+        since = np.where(demand, 1.0, np.where(np.isnan(y), since, since + 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(np.isnan(size), 0.0, size / interval)
+    if variant == 'sba':
+        rate = rate * (1 - alpha / 2)
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+BASELINES = {
+    'seasonal_naive': seasonal_naive,
+    'moving_average': moving_average,
+    'exponential_smoothing': exponential_smoothing,
+    'croston': croston,
+}
+
+
+def forecast_matrix(matrix, model, horizon, interval_width=0.8, window=WINDOW, **params):
+    """(yhat, yhat_lower, yhat_upper) arrays of shape (products, horizon)."""
+    if model not in BASELINES:
+        raise ValueError(f"Unknown baseline '{model}' (available: {', '.join(BASELINES)})")
+    yhat = BASELINES[model](matrix, horizon, **params)
+    recent = matrix[:, -window:]
+    counts = (~np.isnan(recent)).sum(axis=1)
+    spread = np.sqrt(np.divide(np.nansum((recent - _row_nanmean(recent)[:, None]) ** 2, axis=1), counts,
+                               out=np.zeros(len(matrix)), where=counts > 0))
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    return yhat, np.clip(yhat - z * spread[:, None], 0, None), yhat + z * spread[:, None]
+
+
+def baseline_forecast(df, model='seasonal_naive', horizon=14, products=None, interval_width=0.8,
+                      product_col='product', date_col='date', value_col='sales', history_days=HISTORY_DAYS,
+                      block_products=BLOCK_PRODUCTS, end=None, **params):
+    """Forecast DataFrame (product, ds, yhat, yhat_lower, yhat_upper) for every product of `df` (or `products`).
+
+    The forecast starts the day after `end` (default: the last date of `df`,
+    taken before the `products` selection).
+    """
+    if end is None and not df.empty:
+        end = pd.to_datetime(df[date_col]).max()
+    if products is not None:
+        df = df[df[product_col].isin(list(products))]
+    columns = ['product', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    end = pd.Timestamp(end)
+    future = pd.date_range(end.normalize() + pd.Timedelta(days=1), periods=horizon)
+    names = pd.Index(pd.unique(df[product_col])).sort_values()
+    frames = []
+    for offset in range(0, len(names), block_products):
+        block = df[df[product_col].isin(names[offset:offset + block_products])]
+        block_products_index, _, matrix = sales_panel(block, product_col, date_col, value_col, history_days, end)
+        yhat, lower, upper = forecast_matrix(matrix, model, horizon, interval_width, **params)
+        frames.append(pd.DataFrame({
+            'product': np.repeat(block_products_index.to_numpy(), horizon),
+            'ds': np.tile(future.to_numpy(), len(block_products_index)),
+            'yhat': yhat.ravel(),
+            'yhat_lower': lower.ravel(),
+            'yhat_upper': upper.ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def history_forecaster(model):
+    """Adapter for evaluation/backtest.py: forecast one product's ds/y history at the given dates."""
+    def forecast(history, dates, params=None):
+        _, days, matrix = sales_panel(history.assign(product=0), 'product', 'ds', 'y', end=history['ds'].max())
+        steps = ((pd.DatetimeIndex(dates).normalize() - days[-1]) // pd.Timedelta(days=1)).to_numpy()
+        yhat = BASELINES[model](matrix, int(steps.max()), **(params or {}))[0]
+        return yhat[steps - 1]
+    forecast.__name__ = f"{model}_forecast"
+    return forecast
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast every product with a vectorized baseline model")
+    parser.add_argument("--input", help="read the sales from this CSV instead of the store")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--model", default="seasonal_naive", choices=sorted(BASELINES))
+    parser.add_argument("--horizon", type=int, default=14, help="days to forecast")
+    parser.add_argument("--output", default="baseline_forecast.csv")
+    args = parser.parse_args()
+
+    sales = load_dataset(WOOCOMMERCE_FEATURES, args.input, args.organization_id, ParquetStore(args.store),
+                         columns=['date', 'product', 'sales'], encoding=args.encoding)
+    started = time.perf_counter()
+    forecasts = baseline_forecast(sales, args.model, args.horizon)
+    forecasts.to_csv(args.output, index=False)
+    print(f"Forecast {forecasts['product'].nunique()} products with {args.model} "
+          f"in {time.perf_counter() - started:.2f}s; saved to {args.output}")
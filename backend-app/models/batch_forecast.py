@@ -0,0 +1,234 @@
+"""
+Batch Prophet Forecasting
+
+Fits one Prophet model per product across a process pool and writes a single
+consolidated forecast table, instead of fitting one hard-coded product per run.
+
+Products are grouped into chunks of roughly equal expected cost (a fixed
+per-model overhead plus the length of the history) with a longest-first greedy
+assignment, and each chunk is fitted by one worker. A failing product is
+recorded in the report and does not affect the rest of its chunk.
+
+Inputs:
+- The woocommerce_features dataset of the Parquet store (only the 'date',
+  'product' and 'sales' columns are read), or with --input a CSV with at
+  least those columns.
+
+Outputs:
+- batch_forecast.csv: product, ds, yhat, yhat_lower, yhat_upper for the
+  forecast horizon of every product that fitted successfully.
+- batch_forecast_report.csv: per-product history length, fit time, fit mode
+  (full / warm_start / cached, see model_registry.py), status and error.
+
+With --routes (see models/forecast_router.py) only the products for which
+Prophet won the backtest are fitted with Prophet; the others are forecast by
+the vectorized baselines of models/baselines.py and their fit mode is the
+baseline's name.
+
+Usage (from backend-app/):
+    python -m models.batch_forecast --workers 8 --horizon 14
+    python -m models.batch_forecast --routes forecast_routes.csv
+"""
+import argparse
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from models.model_registry import ModelRegistry, REGISTRY_DIR
+from storage.parquet_store import ParquetStore, load_dataset, WOOCOMMERCE_FEATURES, STORE_DIR
+
+PROPHET_PARAMS = {
+    "yearly_seasonality": True,
+    "weekly_seasonality": True,
+    "daily_seasonality": False,
+}
+
+# Expected cost of a fit, in "history rows": Prophet's fixed per-model
+# overhead (Stan setup, seasonality matrices) dominates short histories.
+FIT_OVERHEAD_ROWS = 500
+
+
+def fit_product(history, horizon, params=None, include_history=False, registry=None,
+                organization_id=None, product=None):
+    """Fit Prophet on one product's history (columns ds, y) and forecast `horizon` days.
+
+    With a ModelRegistry the fitted model is persisted and reused (or
+    warm-started) on the next run; returns (model, forecast, fit_mode).
+    """
+    from prophet import Prophet
+
+    params = params or PROPHET_PARAMS
+    if registry is not None:
+        model, mode = registry.get_or_fit(organization_id, product, history, params)
+    else:
+        model, mode = Prophet(**params), 'full'
+        model.fit(history)
+    future = model.make_future_dataframe(periods=horizon)
+    if not include_history:
+        future = future[future['ds'] > history['ds'].max()]
+    forecast = model.predict(future)
+    return model, forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']], mode
+
+
+def _quiet_prophet():
+    import prophet  # noqa: F401  (configures the loggers on first import)
+
+    for name in ("prophet", "cmdstanpy"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def fit_chunk(tasks, horizon, params=None, include_history=False, registry_dir=None, organization_id=None):
+    """Fit every (product, history) pair of a chunk; one product's failure does not stop the others."""
+    _quiet_prophet()
+    registry = ModelRegistry(registry_dir) if registry_dir else None
+    forecasts = []
+    report = []
+    for product, history in tasks:
+        start = time.perf_counter()
+        mode = None
+        try:
+            _, forecast, mode = fit_product(history, horizon, params, include_history,
+                                            registry, organization_id, product)
+            forecast.insert(0, 'product', product)
+            forecasts.append(forecast)
+            status, error = 'ok', None
+        except Exception as e:
+            status, error = 'failed', f"{type(e).__name__}: {e}"
+        report.append({
+            'product': product,
+            'rows': len(history),
+            'fit_seconds': time.perf_counter() - start,
+            'fit_mode': mode,
+            'status': status,
+            'error': error,
+        })
+    return forecasts, report
+
+
+def plan_chunks(costs, n_chunks):
+    """Split {product: cost} into at most `n_chunks` lists of similar total cost (longest first)."""
+    n_chunks = max(1, min(n_chunks, len(costs)))
+    bins = [(0, i, []) for i in range(n_chunks)]
+    heapq.heapify(bins)
+    for product, cost in sorted(costs.items(), key=lambda item: item[1], reverse=True):
+        total, i, products = heapq.heappop(bins)
+        products.append(product)
+        heapq.heappush(bins, (total + cost, i, products))
+    return [products for _, _, products in sorted(bins, key=lambda b: b[1]) if products]
+
+
+def product_histories(df, product_col='product', date_col='date', value_col='sales'):
+    """{product: DataFrame(ds, y)} with rows sorted by date."""
+    data = df[[product_col, date_col, value_col]].rename(columns={date_col: 'ds', value_col: 'y'})
+    data['ds'] = pd.to_datetime(data['ds'])
+    data = data.sort_values([product_col, 'ds'], kind='stable')
+    return {product: group[['ds', 'y']].reset_index(drop=True)
+            for product, group in data.groupby(product_col, sort=False)}
+
+
+def run_batch(df, workers=None, horizon=14, params=None, include_history=False, registry_dir=None,
+              organization_id=1, chunks_per_worker=4, product_col='product', date_col='date', value_col='sales',
+              progress=None):
+    """Forecast every product of `df`; returns (forecasts, report) DataFrames.
+
+    `registry_dir` enables the on-disk model registry, so unchanged products
+    are not refitted and lightly extended ones are warm-started.
+    `progress(done, total)` is called with the number of products fitted
+    after every chunk; an exception it raises (e.g. a cancelled job) stops
+    the batch and cancels the chunks that have not started.
+    """
+    workers = workers or os.cpu_count() or 1
+    histories = product_histories(df, product_col, date_col, value_col)
+    costs = {product: FIT_OVERHEAD_ROWS + len(history) for product, history in histories.items()}
+    chunks = plan_chunks(costs, workers * chunks_per_worker)
+
+    forecasts, report = [], []
+    if workers == 1:
+        for chunk in chunks:
+            chunk_forecasts, chunk_report = fit_chunk(
+                [(p, histories[p]) for p in chunk], horizon, params, include_history,
+                registry_dir, organization_id)
+            forecasts += chunk_forecasts
+            report += chunk_report
+            if progress is not None:
+                progress(len(report), len(histories))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fit_chunk, [(p, histories[p]) for p in chunk], horizon, params, include_history,
+                            registry_dir, organization_id): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                try:
+                    chunk_forecasts, chunk_report = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. out of memory): fail the chunk, keep the batch
+                    chunk_forecasts = []
+                    chunk_report = [{'product': p, 'rows': len(histories[p]), 'fit_seconds': None, 'fit_mode': None,
+                                     'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                                    for p in futures[future]]
+                forecasts += chunk_forecasts
+                report += chunk_report
+                if progress is not None:
+                    try:
+                        progress(len(report), len(histories))
+                    except BaseException:
+                        pool.shutdown(cancel_futures=True)
+                        raise
+
+    forecast_df = (pd.concat(forecasts, ignore_index=True) if forecasts
+                   else pd.DataFrame(columns=['product', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']))
+    forecast_df = forecast_df.sort_values(['product', 'ds'], kind='stable').reset_index(drop=True)
+    report_df = pd.DataFrame(report, columns=['product', 'rows', 'fit_seconds', 'fit_mode', 'status', 'error'])
+    return forecast_df, report_df.sort_values('product', kind='stable').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit one Prophet model per product in parallel")
+    parser.add_argument("--input", help="read the sales from this CSV instead of the store")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--output", default="batch_forecast.csv")
+    parser.add_argument("--report", default="batch_forecast_report.csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--horizon", type=int, default=14, help="days to forecast")
+    parser.add_argument("--include-history", action="store_true", help="also write in-sample predictions")
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="model registry directory")
+    parser.add_argument("--no-registry", action="store_true", help="always refit from scratch")
+    parser.add_argument("--routes", help="forecast_routes.csv from models.forecast_router: fit Prophet only for "
+                                         "the products routed to it and use the vectorized baselines for the rest")
+    args = parser.parse_args()
+
+    sales = load_dataset(WOOCOMMERCE_FEATURES, args.input, args.organization_id, ParquetStore(args.store),
+                         columns=['date', 'product', 'sales'], encoding=args.encoding)
+    started = time.perf_counter()
+    if args.routes:
+        from models.forecast_router import load_routes, run_routed
+
+        routes, default_model = load_routes(args.routes)
+        forecasts, report = run_routed(sales, routes or {}, default_model, horizon=args.horizon,
+                                       workers=args.workers, registry_dir=None if args.no_registry else args.registry,
+                                       organization_id=args.organization_id)
+    else:
+        forecasts, report = run_batch(sales, workers=args.workers, horizon=args.horizon,
+                                      include_history=args.include_history,
+                                      registry_dir=None if args.no_registry else args.registry,
+                                      organization_id=args.organization_id)
+    forecasts.to_csv(args.output, index=False)
+    report.to_csv(args.report, index=False)
+
+    failed = report[report['status'] != 'ok']
+    print(f"Fitted {len(report) - len(failed)}/{len(report)} products with {args.workers} workers "
+          f"in {time.perf_counter() - started:.1f}s")
+    if len(report):
+        print(f"Fit time per product: mean {report['fit_seconds'].mean():.2f}s, max {report['fit_seconds'].max():.2f}s")
+        print(f"Fit modes: {report['fit_mode'].value_counts().to_dict()}")
+    for _, row in failed.iterrows():
+        print(f"  {row['product']}: {row['error']}")
+    print(f'Forecasts saved to {args.output}, fit report saved to {args.report}')
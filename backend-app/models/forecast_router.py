@@ -0,0 +1,136 @@
+"""
+Forecast routing: Prophet only where it wins
+
+Chooses a model per product from a backtest report (evaluation/backtest.py)
+and runs the nightly forecast accordingly. A product is routed to Prophet
+only when its backtest error (MASE, or sMAPE where MASE is undefined) beats
+the best baseline's by more than PROPHET_MARGIN (default 10%); otherwise it
+gets the best baseline. Products without backtest results get the baseline
+that won the most products.
+
+run_routed() forecasts the baseline products of each model in one vectorized
+call (models/baselines.py) and fits Prophet for the rest with run_batch(), so
+the Prophet cost is only paid for the products that need it.
+
+Usage (from backend-app/):
+    python -m evaluation.backtest --models seasonal_naive moving_average exponential_smoothing croston prophet
+    python -m models.forecast_router backtest_report.csv --output forecast_routes.csv
+    python -m models.batch_forecast --routes forecast_routes.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.baselines import BASELINES, baseline_forecast
+from models.batch_forecast import run_batch
+
+ROUTES_FILE = os.getenv("FORECAST_ROUTES", "forecast_routes.csv")
+PROPHET_MARGIN = float(os.getenv("PROPHET_MARGIN", "0.1"))
+DEFAULT_BASELINE = 'seasonal_naive'
+ROUTE_COLUMNS = ['product', 'model', 'metric', 'prophet_error', 'baseline_model', 'baseline_error']
+
+
+def choose_routes(report, margin=PROPHET_MARGIN):
+    """Routes DataFrame (product, model, metric, prophet_error, baseline_model, baseline_error) from a backtest report."""
+    scored = report[report['folds'] > 0].copy()
+    # MASE where every model has it for the product, sMAPE otherwise (e.g. an all-zero training season)
+    has_mase = scored.groupby('product')['mase'].transform(lambda values: values.notna().all())
+    scored['metric'] = np.where(has_mase, 'mase', 'smape')
+    scored['error'] = np.where(has_mase, scored['mase'], scored['smape'])
+    scored = scored.dropna(subset=['error'])
+
+    baselines = scored[scored['model'].isin(list(BASELINES))].sort_values(['product', 'error'], kind='stable')
+    best = baselines.drop_duplicates('product').set_index('product')
+    prophet = scored[scored['model'] == 'prophet'].set_index('product')['error']
+
+    routes = pd.DataFrame({
+        'product': best.index,
+        'metric': best['metric'].to_numpy(),
+        'prophet_error': prophet.reindex(best.index).to_numpy(),
+        'baseline_model': best['model'].to_numpy(),
+        'baseline_error': best['error'].to_numpy(),
+    })
+    wins = routes['prophet_error'] < routes['baseline_error'] * (1 - margin)
+    routes['model'] = np.where(wins, 'prophet', routes['baseline_model'])
+    return routes[ROUTE_COLUMNS]
+
+
+def default_baseline(routes):
+    """The baseline chosen for the most products (for products without backtest results)."""
+    counts = routes['baseline_model'].value_counts()
+    return counts.index[0] if len(counts) else DEFAULT_BASELINE
+
+
+def load_routes(path=ROUTES_FILE):
+    """{product: model} and the default baseline, or (None, DEFAULT_BASELINE) without a routes file."""
+    if not path or not os.path.exists(path):
+        return None, DEFAULT_BASELINE
+    routes = pd.read_csv(path, dtype={'product': object})
+    return dict(zip(routes['product'], routes['model'])), default_baseline(routes)
+
+
+def run_routed(df, routes, default_model=DEFAULT_BASELINE, horizon=14, workers=None, registry_dir=None,
+               organization_id=1, progress=None, product_col='product', date_col='date', value_col='sales'):
+    """Forecast every product of `df` with its routed model; returns (forecasts, report) like run_batch().
+
+    `routes` maps products (compared as strings) to a model name.
+    """
+    products = pd.Series(pd.unique(df[product_col].dropna()))
+    models = products.astype(str).map(routes).fillna(default_model)
+    unknown = set(models) - set(BASELINES) - {'prophet'}
+    if unknown:
+        raise ValueError(f"Unknown models in the routes: {', '.join(sorted(unknown))}")
+
+    forecasts, reports = [], []
+    for model, group in products.groupby(models.to_numpy()):
+        if model == 'prophet':
+            continue
+        start = time.perf_counter()
+        forecast = baseline_forecast(df, model, horizon, products=group, product_col=product_col,
+                                     date_col=date_col, value_col=value_col)
+        seconds = time.perf_counter() - start
+        forecasts.append(forecast)
+        rows = df[df[product_col].isin(group)].groupby(product_col).size()
+        reports.append(pd.DataFrame({
+            'product': rows.index, 'rows': rows.to_numpy(), 'fit_seconds': seconds / max(len(group), 1),
+            'fit_mode': model, 'status': 'ok', 'error': None,
+        }))
+
+    prophet_products = products[models.to_numpy() == 'prophet']
+    if len(prophet_products):
+        baseline_done = sum(len(report) for report in reports)
+        prophet_forecasts, prophet_report = run_batch(
+            df[df[product_col].isin(prophet_products)], workers=workers, horizon=horizon,
+            registry_dir=registry_dir, organization_id=organization_id, product_col=product_col,
+            date_col=date_col, value_col=value_col,
+            progress=None if progress is None else
+            lambda done, total: progress(baseline_done + done, len(products)))
+        forecasts.append(prophet_forecasts)
+        reports.append(prophet_report)
+    elif progress is not None:
+        progress(len(products), len(products))
+
+    forecast_df = (pd.concat(forecasts, ignore_index=True) if forecasts
+                   else pd.DataFrame(columns=['product', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']))
+    report_df = (pd.concat(reports, ignore_index=True) if reports
+                 else pd.DataFrame(columns=['product', 'rows', 'fit_seconds', 'fit_mode', 'status', 'error']))
+    return (forecast_df.sort_values(['product', 'ds'], kind='stable').reset_index(drop=True),
+            report_df.sort_values('product', kind='stable').reset_index(drop=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Choose Prophet or a baseline per product from a backtest report")
+    parser.add_argument("report", help="backtest_report.csv written by evaluation.backtest")
+    parser.add_argument("--output", default=ROUTES_FILE)
+    parser.add_argument("--margin", type=float, default=PROPHET_MARGIN,
+                        help="relative error improvement Prophet needs over the best baseline")
+    args = parser.parse_args()
+
+    routes = choose_routes(pd.read_csv(args.report, dtype={'product': object}), args.margin)
+    routes.to_csv(args.output, index=False)
+    print(f"Routed {len(routes)} products: {routes['model'].value_counts().to_dict()} "
+          f"(default baseline: {default_baseline(routes)})")
+    print(f"Routes saved to {args.output}")
@@ -0,0 +1,343 @@
+"""
+Hierarchical aggregation and reconciliation of the product forecasts
+
+Forecasts are fitted per product, but the dashboard reports category and
+organization totals. Summing the product forecasts is one option; forecasting
+the aggregates directly is often more accurate, but then the levels no longer
+add up. Reconciliation combines both into forecasts that are coherent (every
+aggregate is the sum of its children).
+
+The hierarchy is organization -> category -> product. It is stored as a
+sparse summing matrix S (nodes x products, nodes ordered organization,
+categories, products), so the aggregate histories of every node are one
+sparse product S @ sales instead of a groupby per level.
+
+Base forecasts: the products' own forecasts (batch_forecast / forecast_router
+output), and a vectorized baseline (models/baselines.py) for the aggregates
+and for products without a forecast. They are reconciled in one batched pass
+over the whole (nodes x horizon) matrix:
+
+- bottom_up:   the aggregates are the sums of the product forecasts
+- wls_struct:  weighted least squares, each node weighted by the number of
+               products under it
+- mint_shrink: MinT with the shrunk covariance of the nodes' in-sample
+               seasonal-naive residuals; above MINT_DENSE_MAX_NODES nodes only
+               the diagonal of it is used (WLS on the residual variances)
+
+WLS/MinT are computed in projection form,
+    y~ = y^ - W C' (C W C')^-1 C y^     with C = [I  -S_agg],
+so the only system solved is aggregates x aggregates (categories + 1).
+Reconciled forecasts are not clipped at zero, which would break coherence.
+
+Product categories come from the woocommerce_products dataset (the first
+category of each synced product) or from a CSV with category and product_id
+and/or product columns; other products are UNCATEGORIZED. They are matched to
+the sales on product_id, through the sales' own product_id column or else
+the synced order lines (which carry the product_id of the line item names
+the sales are aggregated by), so renamed or identically named products get
+the right category; the product name is only the fallback.
+
+The retrain_forecasts job (deployment/job_tasks.py) writes the reconciled
+forecasts to the store's reconciled_forecasts dataset, which the dashboard
+totals are served from.
+
+Usage (from backend-app/):
+    python -m models.hierarchy --forecasts batch_forecast.csv --categories categories.csv
+    python -m models.hierarchy --verify
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from models.baselines import BASELINES, sales_panel, seasonal_naive, SEASON
+from storage.parquet_store import ParquetStore, load_dataset, WOOCOMMERCE_FEATURES, STORE_DIR
+
+RECONCILED_FORECASTS = "reconciled_forecasts"
+RECONCILE_METHOD = os.getenv("RECONCILE_METHOD", "mint_shrink")
+MINT_DENSE_MAX_NODES = int(os.getenv("MINT_DENSE_MAX_NODES", "2000"))
+AGGREGATE_MODEL = 'seasonal_naive'
+LEVELS = ('organization', 'category', 'product')
+TOTAL_NODE = 'total'
+UNCATEGORIZED = 'Uncategorized'
+METHODS = ('bottom_up', 'wls_struct', 'mint_shrink')
+RECONCILED_COLUMNS = ['level', 'node', 'ds', 'yhat', 'yhat_base']
+
+if RECONCILE_METHOD not in METHODS:
+    raise ValueError(f"RECONCILE_METHOD must be one of {', '.join(METHODS)}, not '{RECONCILE_METHOD}'")
+
+
+class Hierarchy:
+    """organization -> category -> product summing structure over a fixed product order."""
+
+    def __init__(self, products, categories=None):
+        self.products = pd.Index(products)
+        categories = categories or {}
+        product_categories = pd.Series([categories.get(p) for p in self.products], dtype=object)
+        product_categories = product_categories.where(product_categories.notna() & (product_categories != ''),
+                                                      UNCATEGORIZED).astype(str)
+        codes, self.categories = pd.factorize(product_categories, sort=True)
+
+        n_products, n_categories = len(self.products), len(self.categories)
+        columns = np.arange(n_products)
+        # Aggregate rows: the organization total, then one row per category
+        self.S_agg = sparse.vstack([
+            sparse.csr_matrix(np.ones((1, n_products))),
+            sparse.csr_matrix((np.ones(n_products), (codes, columns)), shape=(n_categories, n_products)),
+        ]).tocsr()
+        self.S = sparse.vstack([self.S_agg, sparse.identity(n_products, format='csr')]).tocsr()
+        self.nodes = pd.DataFrame({
+            'level': [LEVELS[0]] + [LEVELS[1]] * n_categories + [LEVELS[2]] * n_products,
+            'node': [TOTAL_NODE] + list(self.categories) + list(self.products),
+        })
+
+    @property
+    def n_aggregates(self):
+        return self.S_agg.shape[0]
+
+    def aggregate(self, bottom):
+        """Every node's series (nodes x columns) from the products' (missing values count as 0)."""
+        bottom = np.nan_to_num(bottom)
+        return np.vstack([self.S_agg @ bottom, bottom])
+
+    def constraints(self):
+        """C = [I  -S_agg]: C @ y is zero exactly when y is coherent."""
+        return sparse.hstack([sparse.identity(self.n_aggregates, format='csr'), -self.S_agg]).tocsr()
+
+
+def shrunk_covariance(residuals):
+    """Covariance of the rows of `residuals` (nodes x time), shrunk towards its diagonal (Schafer-Strimmer)."""
+    n = residuals.shape[1]
+    cov = residuals @ residuals.T / n
+    sd = np.sqrt(np.maximum(np.diag(cov), 1e-12))
+    scaled = residuals / sd[:, None]
+    corr = scaled @ scaled.T / n
+    squared = scaled ** 2
+    v = (squared @ squared.T - corr ** 2 * n) / (n * (n - 1))
+    np.fill_diagonal(v, 0)
+    off_diagonal = corr ** 2
+    np.fill_diagonal(off_diagonal, 0)
+    shrinkage = float(np.clip(v.sum() / max(off_diagonal.sum(), 1e-12), 0, 1))
+    shrunk = (1 - shrinkage) * cov
+    shrunk[np.diag_indices_from(shrunk)] = np.diag(cov)
+    return shrunk, shrinkage
+
+
+def _floor(variances):
+    # Constant series have zero variance; keep W positive definite
+    return np.maximum(variances, 1e-6 * max(float(variances.mean()) if len(variances) else 0.0, 1.0))
+
+
+def reconcile(base, hierarchy, method=RECONCILE_METHOD, residuals=None, dense_max_nodes=MINT_DENSE_MAX_NODES):
+    """Coherent forecasts (nodes x horizon) from the base forecasts of every node; returns (forecasts, info)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown reconciliation method '{method}' (available: {', '.join(METHODS)})")
+    if method == 'bottom_up':
+        return hierarchy.S @ base[hierarchy.n_aggregates:], {"method": method}
+
+    info = {"method": method}
+    if method == 'wls_struct':
+        W = sparse.diags(np.asarray(hierarchy.S.sum(axis=1)).ravel())
+    elif residuals is None:
+        raise ValueError("mint_shrink needs the in-sample residuals of every node")
+    elif len(base) <= dense_max_nodes:
+        W, info["shrinkage"] = shrunk_covariance(residuals)
+        W[np.diag_indices_from(W)] = _floor(np.diag(W))
+    else:
+        W = sparse.diags(_floor((residuals ** 2).mean(axis=1)))
+        info["covariance"] = "diagonal"
+
+    C = hierarchy.constraints()
+    WCt = W @ C.T
+    WCt = WCt.toarray() if sparse.issparse(WCt) else np.asarray(WCt)
+    CWCt = C @ WCt
+    return base - WCt @ np.linalg.solve(CWCt, C @ base), info
+
+
+def seasonal_residuals(history, season=SEASON):
+    """In-sample one-step residuals of the seasonal naive forecast (nodes x days - season)."""
+    return history[:, season:] - history[:, :-season]
+
+
+def _id_keys(values):
+    # Product ids read as int, float or str compare equal
+    return pd.to_numeric(pd.Series(values), errors='coerce').astype('Int64').astype(str).to_numpy()
+
+
+def load_categories(organization_id, store=None, path=None, sales=None, product_col='product'):
+    """{product: category} for the products of `sales`, from a CSV or the synced WooCommerce products.
+
+    Matched on product_id through `sales` (if it has a product_id column) or
+    the synced order lines, falling back to the product name.
+    """
+    from data_ingestion.woocommerce_sync import WOOCOMMERCE_ORDERS, WOOCOMMERCE_PRODUCTS
+
+    if path:
+        mapping = pd.read_csv(path, dtype=str)
+    elif store is not None and store.exists(WOOCOMMERCE_PRODUCTS, organization_id):
+        mapping = store.read(WOOCOMMERCE_PRODUCTS, organization_id=organization_id).rename(columns={'name': 'product'})
+    else:
+        return {}
+    if 'category' not in mapping.columns:
+        return {}
+    mapping = mapping.dropna(subset=['category'])
+    categories = {}
+    if 'product' in mapping.columns:
+        named = mapping.dropna(subset=['product'])
+        categories.update(zip(named['product'], named['category']))
+    if 'product_id' not in mapping.columns:
+        return categories
+
+    if sales is not None and 'product_id' in sales.columns:
+        ids = sales[[product_col, 'product_id']].rename(columns={product_col: 'product'})
+    elif store is not None and store.exists(WOOCOMMERCE_ORDERS, organization_id):
+        ids = store.read(WOOCOMMERCE_ORDERS, columns=['product_name', 'product_id'], organization_id=organization_id)
+        ids = ids.rename(columns={'product_name': 'product'})
+    else:
+        return categories
+    # The latest product_id seen for a name wins (order lines are stored oldest first)
+    ids = ids.dropna().drop_duplicates('product', keep='last')
+    by_id = dict(zip(_id_keys(mapping['product_id']), mapping['category']))
+    categories.update((product, by_id[key]) for product, key in zip(ids['product'], _id_keys(ids['product_id']))
+                      if key in by_id)
+    return categories
+
+
+def reconcile_forecasts(sales, forecasts, categories=None, method=RECONCILE_METHOD, model=AGGREGATE_MODEL,
+                        product_col='product', date_col='date', value_col='sales'):
+    """Reconciled forecasts of every node as a DataFrame (level, node, ds, yhat, yhat_base); returns (df, info).
+
+    `forecasts` are the product forecasts (product, ds, yhat); the horizon runs
+    from the day after the last sales date to their last date.
+    """
+    products, days, bottom = sales_panel(sales, product_col, date_col, value_col)
+    hierarchy = Hierarchy(products, categories)
+    history = hierarchy.aggregate(bottom)
+
+    forecasts = forecasts[forecasts['ds'].notna()]
+    steps = ((pd.to_datetime(forecasts['ds']).dt.normalize() - days[-1]) // pd.Timedelta(days=1)).to_numpy()
+    horizon = int(steps.max()) if len(steps) and steps.max() > 0 else 0
+    if horizon == 0:
+        return pd.DataFrame(columns=RECONCILED_COLUMNS), {"method": method, "nodes": len(hierarchy.nodes)}
+
+    base = np.vstack([BASELINES[model](history[:hierarchy.n_aggregates], horizon), BASELINES[model](bottom, horizon)])
+    # The products' own forecasts replace the baseline where they exist
+    rows = hierarchy.products.get_indexer(forecasts[product_col])
+    keep = (rows >= 0) & (steps >= 1)
+    base[hierarchy.n_aggregates + rows[keep], steps[keep] - 1] = forecasts['yhat'].to_numpy(dtype=np.float64)[keep]
+
+    residuals = seasonal_residuals(history) if method == 'mint_shrink' else None
+    reconciled, info = reconcile(base, hierarchy, method, residuals)
+    info["nodes"] = len(hierarchy.nodes)
+    info["categories"] = len(hierarchy.categories)
+
+    dates = pd.date_range(days[-1] + pd.Timedelta(days=1), periods=horizon)
+    result = pd.DataFrame({
+        'level': np.repeat(hierarchy.nodes['level'].to_numpy(), horizon),
+        'node': np.repeat(hierarchy.nodes['node'].astype(str).to_numpy(), horizon),
+        'ds': np.tile(dates.to_numpy(), len(hierarchy.nodes)),
+        'yhat': reconciled.ravel(),
+        'yhat_base': base.ravel(),
+    })
+    return result, info
+
+
+def forecast_totals(reconciled, start=None, end=None):
+    """Organization total and per-category totals of the reconciled forecasts over [start, end]."""
+    frame = reconciled[reconciled['level'] != LEVELS[2]]
+    if start is not None:
+        frame = frame[frame['ds'] >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame['ds'] <= pd.Timestamp(end)]
+    totals = frame.groupby(['level', 'node'])['yhat'].sum()
+    return {
+        "total": float(totals.get((LEVELS[0], TOTAL_NODE), 0.0)),
+        "categories": {str(node): float(value) for (level, node), value in totals.items() if level == LEVELS[1]},
+        "start": frame['ds'].min().strftime('%Y-%m-%d') if len(frame) else None,
+        "end": frame['ds'].max().strftime('%Y-%m-%d') if len(frame) else None,
+    }
+
+
+def coherence_error(reconciled):
+    """Largest absolute difference between an aggregate and the sum of the products under it."""
+    hierarchy_nodes = reconciled.pivot_table(index=['level', 'node'], columns='ds', values='yhat', sort=False)
+    products = hierarchy_nodes.loc[LEVELS[2]]
+    total = hierarchy_nodes.loc[(LEVELS[0], TOTAL_NODE)]
+    return float(np.abs(total.to_numpy() - products.sum().to_numpy()).max())
+
+
+def verify(products=40, categories=4, days=200, horizon=14, seed=3):
+    """Check the reconciliation against the textbook formulas on a random hierarchy; returns the problems found."""
+    rng = np.random.default_rng(seed)
+    names = [f"P{i:03d}" for i in range(products)]
+    mapping = {name: f"C{i % categories}" for i, name in enumerate(names)}
+    bottom = rng.poisson(rng.uniform(0.2, 20, products)[:, None], (products, days)).astype(float)
+    hierarchy = Hierarchy(names, mapping)
+    history = hierarchy.aggregate(bottom)
+    base = np.vstack([seasonal_naive(history[:hierarchy.n_aggregates], horizon), rng.gamma(2, 3, (products, horizon))])
+    residuals = seasonal_residuals(history)
+    S = hierarchy.S.toarray()
+
+    problems = []
+    for method in METHODS:
+        reconciled, info = reconcile(base, hierarchy, method, residuals)
+        if np.abs(hierarchy.constraints() @ reconciled).max() > 1e-6:
+            problems.append(f"{method}: forecasts are not coherent")
+        if method == 'bottom_up':
+            expected = S @ base[hierarchy.n_aggregates:]
+        else:
+            if method == 'wls_struct':
+                W = np.diag(S.sum(axis=1))
+            else:
+                W, _ = shrunk_covariance(residuals)
+                W[np.diag_indices_from(W)] = _floor(np.diag(W))
+            W_inv = np.linalg.inv(W)
+            expected = S @ np.linalg.solve(S.T @ W_inv @ S, S.T @ W_inv @ base)
+        if not np.allclose(reconciled, expected, atol=1e-6, rtol=1e-6):
+            problems.append(f"{method}: differs from S (S' W^-1 S)^-1 S' W^-1 y^")
+        # The diagonal fallback must stay coherent too
+        if method == 'mint_shrink':
+            diagonal, info = reconcile(base, hierarchy, method, residuals, dense_max_nodes=0)
+            if info.get("covariance") != "diagonal" or np.abs(hierarchy.constraints() @ diagonal).max() > 1e-6:
+                problems.append("mint_shrink: diagonal fallback is not coherent")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile product forecasts across categories and the organization")
+    parser.add_argument("--input", help="read the sales from this CSV instead of the store")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet store root directory")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--organization-id", type=int, default=1)
+    parser.add_argument("--forecasts", default="batch_forecast.csv", help="product forecasts (product, ds, yhat)")
+    parser.add_argument("--categories", help="CSV with product and category columns (default: synced products)")
+    parser.add_argument("--method", default=RECONCILE_METHOD, choices=METHODS)
+    parser.add_argument("--output", default="reconciled_forecast.csv")
+    parser.add_argument("--verify", action="store_true", help="check the reconciliation on a random hierarchy")
+    args = parser.parse_args()
+
+    if args.verify:
+        problems = verify()
+        for problem in problems:
+            print(f"  {problem}")
+        print("Reconciliation OK" if not problems else "Reconciliation FAILED")
+        raise SystemExit(1 if problems else 0)
+
+    store = ParquetStore(args.store)
+    sales = load_dataset(WOOCOMMERCE_FEATURES, args.input, args.organization_id, store,
+                         columns=['date', 'product', 'sales'], encoding=args.encoding)
+    product_forecasts = pd.read_csv(args.forecasts, parse_dates=['ds'], dtype={'product': object})
+    started = time.perf_counter()
+    result, info = reconcile_forecasts(sales, product_forecasts,
+                                       load_categories(args.organization_id, store, args.categories, sales),
+                                       args.method)
+    seconds = time.perf_counter() - started
+    result.to_csv(args.output, index=False)
+    totals = forecast_totals(result)
+    print(f"Reconciled {info['nodes']} nodes ({info['categories']} categories) with {info['method']} in {seconds:.2f}s")
+    print(f"Organization total {totals['total']:.1f} from {totals['start']} to {totals['end']} "
+          f"(largest incoherence {coherence_error(result):.2g})")
+    print(f"Reconciled forecasts saved to {args.output}")
@@ -0,0 +1,160 @@
+"""
+Model Registry
+
+Local on-disk registry of fitted Prophet models, keyed by organization,
+product, hyperparameters and a fingerprint of the training data.
+
+Layout (under MODEL_REGISTRY_DIR, default ./model_registry):
+    <organization_id>/<product>/<params_key>/<data_fingerprint>.json   serialized model
+    <organization_id>/<product>/<params_key>/latest.json               metadata of the newest fit
+(directory names are sanitized and suffixed with a short hash of the key)
+
+get_or_fit() decides how much work a (re)fit needs:
+- "cached":     the training slice is unchanged -> the stored model is returned
+- "warm_start": the previous slice is a prefix of the new one and at most
+                WARM_START_MAX_NEW_ROWS rows were appended -> Prophet is refitted
+                starting from the previous model's parameters
+- "full":       anything else -> regular fit from scratch
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+WARM_START_MAX_NEW_ROWS = 14
+KEEP_VERSIONS = 3
+
+
+def data_fingerprint(history, rows=None):
+    """SHA-256 of the first `rows` (default: all) ds/y pairs of a date-sorted history."""
+    if rows is not None:
+        history = history.iloc[:rows]
+    digest = hashlib.sha256()
+    digest.update(pd.to_datetime(history['ds']).to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+    digest.update(history['y'].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def stan_init(model):
+    """Fitted parameters of `model` in the form Prophet.fit(init=...) expects."""
+    init = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        init[name] = model.params[name][0][0]
+    for name in ['delta', 'beta']:
+        init[name] = model.params[name][0]
+    return init
+
+
+def _slug(value):
+    """Filesystem-safe directory name; the hash suffix keeps e.g. "A B" and "A_B" apart."""
+    text = str(value)
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', text).strip('_') or '_'
+    return f"{safe}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def _dir(self, organization_id, product, params):
+        return os.path.join(self.root, _slug(organization_id), _slug(product), params_key(params))
+
+    def latest(self, organization_id, product, params):
+        """Metadata of the newest model for this key, or None."""
+        path = os.path.join(self._dir(organization_id, product, params), 'latest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, organization_id, product, params, fingerprint=None):
+        """Deserialize the model trained on `fingerprint` (default: the newest one)."""
+        from prophet.serialize import model_from_json
+
+        if fingerprint is None:
+            meta = self.latest(organization_id, product, params)
+            if meta is None:
+                return None
+            fingerprint = meta['fingerprint']
+        path = os.path.join(self._dir(organization_id, product, params), f'{fingerprint}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return model_from_json(f.read())
+
+    def save(self, organization_id, product, params, history, model, mode='full'):
+        from prophet.serialize import model_to_json
+
+        directory = self._dir(organization_id, product, params)
+        os.makedirs(directory, exist_ok=True)
+        fingerprint = data_fingerprint(history)
+        meta = {
+            'organization_id': organization_id,
+            'product': str(product),
+            'params': params,
+            'fingerprint': fingerprint,
+            'rows': len(history),
+            'last_ds': str(pd.to_datetime(history['ds']).max().date()) if len(history) else None,
+            'fit_mode': mode,
+            'fitted_at': datetime.now().isoformat(),
+        }
+        _write_atomic(os.path.join(directory, f'{fingerprint}.json'), model_to_json(model))
+        _write_atomic(os.path.join(directory, 'latest.json'), json.dumps(meta))
+        self._prune(directory)
+        return meta
+
+    def _prune(self, directory):
+        versions = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith('.json') and entry.name != 'latest.json'),
+            key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+        for entry in versions[KEEP_VERSIONS:]:
+            os.remove(entry.path)
+
+    def get_or_fit(self, organization_id, product, history, params, max_new_rows=WARM_START_MAX_NEW_ROWS):
+        """Return (model, mode) for a date-sorted ds/y history, refitting only when needed."""
+        from prophet import Prophet
+
+        meta = self.latest(organization_id, product, params)
+        previous = None
+        if meta is not None:
+            if meta['rows'] == len(history) and meta['fingerprint'] == data_fingerprint(history):
+                model = self.load(organization_id, product, params, meta['fingerprint'])
+                if model is not None:
+                    return model, 'cached'
+            elif (0 < len(history) - meta['rows'] <= max_new_rows
+                  and data_fingerprint(history, meta['rows']) == meta['fingerprint']):
+                previous = self.load(organization_id, product, params, meta['fingerprint'])
+
+        mode = 'full'
+        model = None
+        if previous is not None:
+            try:
+                model = Prophet(**params)
+                model.fit(history, init=stan_init(previous))
+                mode = 'warm_start'
+            except Exception:
+                # e.g. the number of changepoints changed with the longer history
+                model = None
+        if model is None:
+            model = Prophet(**params)
+            model.fit(history)
+        self.save(organization_id, product, params, history, model, mode)
+        return model, mode
@@ -1,13 +1,13 @@
-import pandas as pd
 from prophet import Prophet
 import matplotlib.pyplot as plt
 
-# Load feature-engineered data
-df = pd.read_csv('sales_with_features.csv', parse_dates=['date'])
+from storage.parquet_store import sales_store, SALES_FEATURES
 
 # Select one product for demonstration
 product = 'Widget A'
-df_prod = df[df['product'] == product].copy()
+
+# Load the product's feature-engineered data (only the columns Prophet needs)
+df_prod = sales_store.read(SALES_FEATURES, columns=['date', 'sales'], organization_id=1, filters={'product': product})
 
 # Prophet expects columns: ds (date), y (value)
 df_prophet = df_prod[['date', 'sales']].rename(columns={'date': 'ds', 'sales': 'y'})
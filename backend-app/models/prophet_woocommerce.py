@@ -1,31 +1,40 @@
-import pandas as pd
-from prophet import Prophet
 import matplotlib.pyplot as plt
 
-# Load feature-engineered WooCommerce data
-df = pd.read_csv('woocommerce_sales_with_features.csv', parse_dates=['date'])
-
-# Select one product for demonstration
-product = 'Widget A'
-df_prod = df[df['product'] == product].copy()
-
-# Prophet expects columns: ds (date), y (value)
-df_prophet = df_prod[['date', 'sales']].rename(columns={'date': 'ds', 'sales': 'y'})
-
-# Fit Prophet model
-model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=False)
-model.fit(df_prophet)
-
-# Make future dataframe for 14 days
-days_ahead = 14
-future = model.make_future_dataframe(periods=days_ahead)
-forecast = model.predict(future)
-
-# Plot forecast
-fig = model.plot(forecast)
-plt.title(f'Prophet Forecast for {product} (WooCommerce)')
-plt.xlabel('Date')
-plt.ylabel('Sales')
-plt.tight_layout()
-plt.savefig('prophet_woocommerce_forecast.png')
-print('Forecast plot saved as prophet_woocommerce_forecast.png') 
\ No newline at end of file
+from models.model_registry import ModelRegistry
+from storage.parquet_store import sales_store, WOOCOMMERCE_FEATURES
+
+# Run from backend-app/:  python -m models.prophet_woocommerce
+# The fitted model is kept in the model registry, so re-running on unchanged
+# data skips the fit and a few appended days only need a warm-started refit.
+ORGANIZATION_ID = 1
+
+if __name__ == "__main__":
+    # Select one product for demonstration
+    product = 'Widget A'
+
+    # Load the product's feature-engineered WooCommerce data (only the columns Prophet needs)
+    df_prod = sales_store.read(WOOCOMMERCE_FEATURES, columns=['date', 'sales'], organization_id=ORGANIZATION_ID,
+                               filters={'product': product})
+
+    # Prophet expects columns: ds (date), y (value)
+    df_prophet = df_prod[['date', 'sales']].rename(columns={'date': 'ds', 'sales': 'y'})
+    df_prophet = df_prophet.sort_values('ds').reset_index(drop=True)
+
+    # Fit Prophet model (or reuse the registered one)
+    params = {"yearly_seasonality": True, "weekly_seasonality": True, "daily_seasonality": False}
+    model, fit_mode = ModelRegistry().get_or_fit(ORGANIZATION_ID, product, df_prophet, params)
+    print(f'Model for {product}: {fit_mode}')
+
+    # Make future dataframe for 14 days
+    days_ahead = 14
+    future = model.make_future_dataframe(periods=days_ahead)
+    forecast = model.predict(future)
+
+    # Plot forecast
+    fig = model.plot(forecast)
+    plt.title(f'Prophet Forecast for {product} (WooCommerce)')
+    plt.xlabel('Date')
+    plt.ylabel('Sales')
+    plt.tight_layout()
+    plt.savefig('prophet_woocommerce_forecast.png')
+    print('Forecast plot saved as prophet_woocommerce_forecast.png')
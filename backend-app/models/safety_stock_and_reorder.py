@@ -4,7 +4,7 @@ Safety Stock and Reorder Point Calculator
 This script calculates safety stock and reorder points for each product using historical or forecasted sales data.
 
 Inputs:
-- sales_with_features.csv: CSV file containing at least 'date', 'product', and 'sales' columns (UTF-8 encoded recommended).
+- The sales_features dataset of the Parquet store (storage/parquet_store.py); only its 'date', 'product' and 'sales' columns are read.
 - User-defined parameters (customize in the script):
     - LEAD_TIME_DAYS: Number of days between placing an order and receiving stock from the supplier. Affects how much demand you need to cover while waiting for new stock.
     - SERVICE_LEVEL: Desired probability (e.g., 0.95 for 95%) of not running out of stock during lead time. Higher values mean more safety stock.
@@ -20,65 +20,156 @@ Formulas Used:
 - Recommended Order Quantity = max(0, ROP - current stock)
 
 Usage:
-1. Ensure your sales data is in 'sales_with_features.csv' with correct columns and UTF-8 encoding.
+1. Ensure your sales data is in the store's sales_features dataset (run feature_engineering.simple_time_features,
+   or import a CSV with `python -m storage.parquet_store import sales_features <file.csv>`).
 2. Adjust LEAD_TIME_DAYS, SERVICE_LEVEL, and CURRENT_STOCK as needed in the script.
 3. Run the script:
-   python models/safety_stock_and_reorder.py
+   python -m models.safety_stock_and_reorder
 4. The output CSV will be saved in the project directory.
 
+The calculation is also importable: compute_reorder_report(sales_df, ...) computes every
+product in one vectorized pass and accepts per-product lead times, service levels and
+current stock (scalars, {product: value} mappings, aligned arrays or an `inventory` DataFrame).
+
 This script bridges demand forecasting and actionable inventory management, enabling data-driven purchasing decisions.
 """
-import pandas as pd
 import numpy as np
+import pandas as pd
 from scipy.stats import norm
 
+from storage.parquet_store import sales_store, SALES_FEATURES
+
 # --- User Inputs (customize as needed) ---
 LEAD_TIME_DAYS = 14  # Supplier lead time in days
 SERVICE_LEVEL = 0.95  # Desired service level (e.g., 0.95 for 95%)
 Z = norm.ppf(SERVICE_LEVEL)  # Z-score for service level
 CURRENT_STOCK = 100  # Example: current stock for all products (customize per product if needed)
 
-# --- Load forecasted sales data ---
-# For demonstration, use the feature-engineered sales data as a proxy for forecast
-# Replace with actual forecast output if available
-sales_df = pd.read_csv('sales_with_features.csv', parse_dates=['date'], encoding='utf-7')
+REPORT_COLUMNS = ['product', 'avg_daily_demand', 'std_daily_demand', 'demand_lead_time', 'safety_stock',
+                  'reorder_point', 'current_stock', 'recommended_order_qty']
+
+
+def demand_statistics(sales_df, product_col='product', sales_col='sales'):
+    """Mean and standard deviation (ddof=1) of daily sales for every product.
+
+    One vectorized pass over the frame: products are factorized in order of
+    first appearance and the per-product sums are accumulated with bincount.
+    Returns a DataFrame with columns product, count, mean, std.
+    """
+    codes, products = pd.factorize(sales_df[product_col], sort=False)
+    sales = pd.to_numeric(sales_df[sales_col], errors='coerce').to_numpy(dtype=np.float64)
+    valid = (codes >= 0) & ~np.isnan(sales)
+    codes, sales = codes[valid], sales[valid]
+
+    n = len(products)
+    counts = np.bincount(codes, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(codes, weights=sales, minlength=n) / counts
+        deviations = sales - means[codes]
+        variances = np.bincount(codes, weights=deviations * deviations, minlength=n) / (counts - 1)
+    variances[counts < 2] = np.nan
+    return pd.DataFrame({
+        'product': products,
+        'count': counts,
+        'mean': means,
+        'std': np.sqrt(variances),
+    })
+
+
+def _per_product(value, products, name):
+    """Broadcast a scalar, {product: value} mapping/Series or aligned array to one value per product."""
+    if isinstance(value, (dict, pd.Series)):
+        mapped = pd.Series(products).map(pd.Series(value) if isinstance(value, dict) else value)
+        if mapped.isna().any():
+            missing = list(pd.Series(products)[mapped.isna()][:5])
+            raise ValueError(f"{name} is missing for products: {missing}")
+        return mapped.to_numpy(dtype=np.float64)
+    array = np.asarray(value, dtype=np.float64)
+    if array.ndim == 0:
+        return np.full(len(products), float(array))
+    if len(array) != len(products):
+        raise ValueError(f"{name} has {len(array)} values for {len(products)} products")
+    return array
+
 
-# Get unique products
-products = sales_df['product'].unique()
+def whole_units(values):
+    """`values` as int64 when every one is a whole number, else as float64.
 
-results = []
+    Stock levels and order quantities are reported as integers in that case,
+    as max(0, ...) gave for them before the calculation was vectorized.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return values.astype(np.int64) if np.all(values == np.round(values)) else values
 
-for product in products:
-    prod_df = sales_df[sales_df['product'] == product].copy()
-    # Calculate average daily demand (mean sales)
-    avg_daily_demand = prod_df['sales'].mean()
-    # Calculate std deviation of daily demand (sales variability)
-    std_daily_demand = prod_df['sales'].std()
+
+def reorder_points(stats, lead_time_days=LEAD_TIME_DAYS, service_level=SERVICE_LEVEL,
+                   current_stock=CURRENT_STOCK, inventory=None):
+    """Safety stock, reorder point and order quantity from per-product demand statistics.
+
+    Parameters may be scalars, {product: value} mappings/Series or arrays
+    aligned with stats['product']. `inventory` is an alternative DataFrame with
+    a 'product' column and any of 'lead_time_days', 'service_level' and
+    'current_stock'; its columns override the keyword arguments.
+    """
+    products = stats['product'].to_numpy()
+    if inventory is not None:
+        indexed = inventory.set_index('product')
+        lead_time_days = indexed['lead_time_days'] if 'lead_time_days' in indexed else lead_time_days
+        service_level = indexed['service_level'] if 'service_level' in indexed else service_level
+        current_stock = indexed['current_stock'] if 'current_stock' in indexed else current_stock
+
+    lead_time = _per_product(lead_time_days, products, 'lead_time_days')
+    stock = _per_product(current_stock, products, 'current_stock')
+    levels = _per_product(service_level, products, 'service_level')
+    z = norm.ppf(levels)  # Z-score per product
+
+    avg_daily_demand = stats['mean'].to_numpy()
+    std_daily_demand = stats['std'].to_numpy()
     # Demand during lead time
-    demand_lead_time = avg_daily_demand * LEAD_TIME_DAYS
+    demand_lead_time = avg_daily_demand * lead_time
     # Std deviation of demand during lead time
-    std_lead_time = std_daily_demand * np.sqrt(LEAD_TIME_DAYS)
+    std_lead_time = std_daily_demand * np.sqrt(lead_time)
     # Safety stock
-    safety_stock = Z * std_lead_time
+    safety_stock = z * std_lead_time
     # Reorder point
     reorder_point = demand_lead_time + safety_stock
-    # Example: recommended order quantity (to top up to cover next lead time + safety stock)
-    recommended_order_qty = max(0, reorder_point - CURRENT_STOCK)
-    results.append({
-        'product': product,
+    # Recommended order quantity (to top up to cover next lead time + safety stock);
+    # a missing reorder point (e.g. a single sale) recommends nothing
+    shortfall = reorder_point - stock
+    recommended_order_qty = np.where(shortfall > 0, shortfall, 0.0)
+
+    current_stock_column = whole_units(stock)
+    recommended_order_qty = whole_units(recommended_order_qty)
+    return pd.DataFrame({
+        'product': products,
         'avg_daily_demand': avg_daily_demand,
         'std_daily_demand': std_daily_demand,
         'demand_lead_time': demand_lead_time,
         'safety_stock': safety_stock,
         'reorder_point': reorder_point,
-        'current_stock': CURRENT_STOCK,
-        'recommended_order_qty': recommended_order_qty
-    })
+        'current_stock': current_stock_column,
+        'recommended_order_qty': recommended_order_qty,
+    }, columns=REPORT_COLUMNS)
+
+
+def compute_reorder_report(sales_df, lead_time_days=LEAD_TIME_DAYS, service_level=SERVICE_LEVEL,
+                           current_stock=CURRENT_STOCK, inventory=None, product_col='product', sales_col='sales'):
+    """Safety stock and reorder report for every product of `sales_df` (one row per product)."""
+    stats = demand_statistics(sales_df, product_col, sales_col)
+    return reorder_points(stats, lead_time_days, service_level, current_stock, inventory)
+
+
+if __name__ == "__main__":
+    # --- Load forecasted sales data ---
+    # For demonstration, use the feature-engineered sales data as a proxy for forecast
+    # Replace with actual forecast output if available
+    sales_df = sales_store.read(SALES_FEATURES, columns=['date', 'product', 'sales'], organization_id=1)
+
+    results_df = compute_reorder_report(sales_df)
 
-# Output results to CSV
-results_df = pd.DataFrame(results)
-results_df.to_csv('safety_stock_and_reorder_report.csv', index=False)
-print('Safety stock and reorder report saved as safety_stock_and_reorder_report.csv') 
+    # Output results to CSV
+    results_df.to_csv('safety_stock_and_reorder_report.csv', index=False)
+    print('Safety stock and reorder report saved as safety_stock_and_reorder_report.csv')
 
 """
 - **Product**: The name or identifier of the product for which the calculations are made.
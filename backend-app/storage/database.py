@@ -0,0 +1,189 @@
+"""
+Relational storage for users, organizations and sales forecasts.
+
+The tables follow the frontend's schema (frontend-app/drizzle: organizations
+with id, name and stripe_customer_id; sales_forecasts with integer forecasted
+sales) and add the users the API authenticates and their revoked access
+tokens. DATABASE_URL selects the database: a
+local SQLite file by default, Postgres in production (the frontend's
+`postgres://` URLs are accepted as well).
+
+Connections come from a pool shared by all requests of a worker. Its size is
+tuned with DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT; connections are
+recycled after DB_POOL_RECYCLE seconds and checked with a ping before use, so
+a Postgres restart does not surface as failed requests. SQLite files run in
+WAL mode so that readers are not blocked by a writing worker.
+
+sales_forecasts has a unique index on (organization_id, product_id,
+forecast_date). It serves the per-product lookups and is the conflict target
+of the bulk upsert in repositories.py. init_database() creates the tables and
+indexes that are missing, including that index on a table the frontend's
+migrations created. If rows there repeat a key the index cannot be created
+and startup fails with MigrationRequired; removing them is an explicit step:
+    python -m storage.database dedupe-forecasts [--dry-run]
+keeps the row with the highest id (the latest written) of every key and
+creates the index.
+"""
+import argparse
+import os
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, event, func, insert, inspect, select,
+)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/wpm.sqlite3")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+FORECAST_KEY = ("organization_id", "product_id", "forecast_date")
+FORECAST_KEY_INDEX = "uq_sales_forecasts_org_product_date"
+
+metadata = MetaData()
+
+organizations = Table(
+    "organizations", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(256), nullable=False),
+    Column("stripe_customer_id", Text),
+)
+
+users = Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("email", String(320), nullable=False),
+    Column("password_hash", String(256), nullable=False),
+    Column("name", String(256), nullable=False),
+    Column("organization_id", Integer, ForeignKey("organizations.id"), nullable=False),
+    Column("created_at", DateTime, default=datetime.now),
+    Index("uq_users_email", "email", unique=True),
+)
+
+sales_forecasts = Table(
+    "sales_forecasts", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("product_id", Integer, nullable=False),
+    Column("forecasted_sales", Integer, nullable=False),
+    Column("forecast_date", DateTime, nullable=False, server_default=func.now()),
+    Column("organization_id", Integer, ForeignKey("organizations.id"), nullable=False),
+    Index(FORECAST_KEY_INDEX, *FORECAST_KEY, unique=True),
+)
+
+# Access tokens revoked before their expiry (rows are purged once the token has expired)
+revoked_tokens = Table(
+    "revoked_tokens", metadata,
+    Column("jti", String(64), primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("expires_at", DateTime, nullable=False, index=True),
+)
+
+
+class MigrationRequired(RuntimeError):
+    pass
+
+
+def normalize_url(url):
+    # The frontend's DATABASE_URL uses the postgres:// scheme, which SQLAlchemy does not register
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_db_engine(url=DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                     pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE):
+    """Engine with a bounded connection pool for `url`."""
+    url = normalize_url(url)
+    options = {"pool_pre_ping": True, "pool_recycle": pool_recycle}
+    if url.startswith("sqlite"):
+        path = url.split(":///", 1)[-1]
+        if path and path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Connections are handed between the worker threads of the API
+        options["connect_args"] = {"check_same_thread": False, "timeout": pool_timeout}
+    if ":memory:" not in url:
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    engine = create_engine(url, **options)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+def _superseded_forecasts():
+    latest = (select(func.max(sales_forecasts.c.id))
+              .group_by(*(sales_forecasts.c[column] for column in FORECAST_KEY)))
+    return sales_forecasts.c.id.not_in(latest)
+
+
+def count_duplicate_forecasts(engine):
+    """Number of forecasts repeating an (organization_id, product_id, forecast_date) key of a later one."""
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count()).select_from(sales_forecasts).where(_superseded_forecasts())).scalar()
+
+
+def dedupe_forecasts(engine):
+    """Delete the forecasts repeating an (organization_id, product_id, forecast_date) key but the latest; returns the count."""
+    with engine.begin() as connection:
+        return connection.execute(delete(sales_forecasts).where(_superseded_forecasts())).rowcount
+
+
+def init_database(engine, seed=True):
+    """Create missing tables and indexes; with `seed`, add the demo organization and admin user to an empty database.
+
+    Raises MigrationRequired when duplicate forecasts keep the forecast key
+    index from being created (see dedupe-forecasts).
+    """
+    metadata.create_all(engine)
+    # Tables created by the frontend's migrations lack the forecast key index
+    existing = {index["name"] for index in inspect(engine).get_indexes(sales_forecasts.name)}
+    if FORECAST_KEY_INDEX not in existing:
+        duplicates = count_duplicate_forecasts(engine)
+        if duplicates:
+            raise MigrationRequired(
+                f"{duplicates} sales forecasts repeat an (organization_id, product_id, forecast_date) key, so "
+                f"{FORECAST_KEY_INDEX} cannot be created; review them and run "
+                "`python -m storage.database dedupe-forecasts`")
+    for table in (users, sales_forecasts):
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    if not seed:
+        return
+    from storage.repositories import hash_password
+
+    with engine.begin() as connection:
+        if connection.execute(select(func.count()).select_from(organizations)).scalar():
+            return
+        organization_id = connection.execute(
+            insert(organizations).values(name="Demo Organization")).inserted_primary_key[0]
+        connection.execute(insert(users).values(
+            email="admin@example.com", password_hash=hash_password("admin123"), name="Admin User",
+            organization_id=organization_id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance commands of the relational database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dedupe = commands.add_parser("dedupe-forecasts", help="delete forecasts repeating a key (the latest is kept) "
+                                                          "and create the forecast key index")
+    dedupe.add_argument("--dry-run", action="store_true", help="only count the forecasts that would be deleted")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.database_url)
+    if args.dry_run:
+        print(f"{count_duplicate_forecasts(engine)} duplicate forecasts would be deleted")
+    else:
+        print(f"Deleted {dedupe_forecasts(engine)} duplicate forecasts")
+        init_database(engine, seed=False)
+        print(f"{FORECAST_KEY_INDEX} is in place")
@@ -0,0 +1,363 @@
+"""
+Columnar storage for the pipeline's intermediate datasets.
+
+Ingestion, feature engineering, the model scripts and the API used to hand
+data to each other as CSV files that every consumer re-parsed in full. The
+ParquetStore keeps each dataset (cleaned_sales, sales_features,
+woocommerce_features) as a hive-partitioned Parquet directory:
+
+    <root>/<dataset>/organization_id=<id>/year_month=<YYYY-MM>/part-<ns>-<i>.parquet
+
+Reads take a column list and organization / date-range / value filters. The
+filters are pushed into the scan: partition directories that cannot match are
+skipped, and the date and value predicates are checked against the row-group
+statistics before any data is decoded. Files are memory-mapped.
+
+write() replaces an organization's partitions and replace_months() only the
+given months of them; append() adds new part files (named so that lexical
+order is write order). Every change bumps the
+`_version` files of the dataset and of the organization, so version() is a
+single stat() and can be used to validate cached frames.
+
+CSV remains the import / export format:
+    python -m storage.parquet_store import cleaned_sales cleaned_sales.csv --organization-id 1
+    python -m storage.parquet_store export woocommerce_features out.csv --start 2024-06-01
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:
+    pa = None
+
+STORE_DIR = os.getenv("SALES_STORE_DIR", "data/store")
+DEFAULT_ORGANIZATION_ID = 1
+
+CLEANED_SALES = "cleaned_sales"
+SALES_FEATURES = "sales_features"
+WOOCOMMERCE_FEATURES = "woocommerce_features"
+
+ORGANIZATION_COLUMN = "organization_id"
+MONTH_COLUMN = "year_month"
+PARTITION_COLUMNS = (ORGANIZATION_COLUMN, MONTH_COLUMN)
+VERSION_FILE = "_version"
+
+# Rows per record batch when a dataset is streamed with iter_batches()
+BATCH_ROWS = int(os.getenv("STORE_BATCH_ROWS", "50000"))
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the Parquet store (pip install pyarrow)")
+
+
+def months_of(dates):
+    """The year_month partition value ("YYYY-MM") of every date in `dates` (a Series)."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format="ISO8601")
+    return dates.dt.strftime("%Y-%m")
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(ORGANIZATION_COLUMN, pa.int64()), (MONTH_COLUMN, pa.string())]),
+                           flavor="hive")
+
+
+class ParquetStore:
+    def __init__(self, root=STORE_DIR, memory_map=True):
+        self.root = root
+        self.memory_map = memory_map
+        self._lock = threading.Lock()
+
+    def path(self, dataset, organization_id=None):
+        path = os.path.join(self.root, dataset)
+        if organization_id is not None:
+            path = os.path.join(path, f"{ORGANIZATION_COLUMN}={int(organization_id)}")
+        return path
+
+    def exists(self, dataset, organization_id=None):
+        """True once `dataset` (or the organization's part of it) has been written to."""
+        return os.path.exists(self._version_path(dataset, organization_id))
+
+    def _version_path(self, dataset, organization_id=None):
+        name = VERSION_FILE if organization_id is None else f"{VERSION_FILE}_{ORGANIZATION_COLUMN}={int(organization_id)}"
+        return os.path.join(self.path(dataset), name)
+
+    def version(self, dataset, organization_id=None):
+        """(mtime_ns, size) of the version file of the dataset or of one organization's data in it.
+
+        Raises FileNotFoundError if it was never written.
+        """
+        stat = os.stat(self._version_path(dataset, organization_id))
+        return stat.st_mtime_ns, stat.st_size
+
+    def _bump(self, dataset, organization_id):
+        # Rewritten with a fresh token so the signature changes even within one mtime tick
+        for path in (self._version_path(dataset, organization_id), self._version_path(dataset)):
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(f"{time.time_ns()} {uuid.uuid4().hex}\n")
+            os.replace(tmp, path)
+
+    # -- writing ---------------------------------------------------------
+
+    def _table(self, df, organization_id, date_col, schema=None):
+        frame = df.drop(columns=[c for c in PARTITION_COLUMNS if c in df.columns])
+        if date_col in frame.columns and not pd.api.types.is_datetime64_any_dtype(frame[date_col]):
+            frame = frame.assign(**{date_col: pd.to_datetime(frame[date_col], format="ISO8601")})
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        months = (months_of(frame[date_col]) if date_col in frame.columns
+                  else pd.Series(None, index=frame.index, dtype=object))
+        table = table.append_column(ORGANIZATION_COLUMN, pa.array([int(organization_id)] * len(frame), pa.int64()))
+        return table.append_column(MONTH_COLUMN, pa.array(months.to_numpy(dtype=object), pa.string()))
+
+    def _existing_schema(self, dataset):
+        if not self.exists(dataset):
+            return None
+        existing = self._dataset(dataset).schema
+        fields = [existing.field(name) for name in existing.names if name not in PARTITION_COLUMNS]
+        return pa.schema(fields) if fields else None
+
+    @staticmethod
+    def _replace_dir(staged, target):
+        """Swap the directory `staged` in for `target` (removing `target` when nothing was staged).
+
+        The old directory is renamed aside to a hidden sibling, which dataset
+        scans ignore, before the staged one is renamed into place; both are
+        single rename() calls, so a reader never sees a half-deleted
+        partition, and a failed swap puts the old directory back.
+        """
+        aside = None
+        if os.path.isdir(target):
+            aside = os.path.join(os.path.dirname(target), f".replaced-{uuid.uuid4().hex}")
+            os.replace(target, aside)
+        try:
+            if os.path.isdir(staged):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(staged, target)
+        except OSError:
+            if aside is not None:
+                os.replace(aside, target)
+            raise
+        if aside is not None:
+            shutil.rmtree(aside, ignore_errors=True)
+
+    def _write_files(self, table, base_dir):
+        ds.write_dataset(table, base_dir, format="parquet", partitioning=_partitioning(),
+                         basename_template=f"part-{time.time_ns():020d}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+
+    def write(self, dataset, df, organization_id=DEFAULT_ORGANIZATION_ID, date_col="date"):
+        """Replace the organization's data in `dataset` with `df` (partitioned by month of `date_col`)."""
+        _require_pyarrow()
+        table = self._table(df, organization_id, date_col)
+        root = self.path(dataset)
+        staging = os.path.join(root, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(root, exist_ok=True)
+        try:
+            self._write_files(table, staging)
+            target = self.path(dataset, organization_id)
+            staged = os.path.join(staging, os.path.basename(target))
+            with self._lock:
+                self._replace_dir(staged, target)
+                self._bump(dataset, organization_id)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return len(df)
+
+    def replace_months(self, dataset, df, organization_id=DEFAULT_ORGANIZATION_ID, months=(), date_col="date"):
+        """Replace the organization's partitions of `months` ("YYYY-MM") with `df`; other months are left as they are.
+
+        Every row of `df` must fall in one of `months`; a listed month without
+        rows in `df` is removed. The rows are cast to the dataset's schema.
+        """
+        _require_pyarrow()
+        if not self.exists(dataset, organization_id):
+            return self.write(dataset, df, organization_id, date_col)
+        table = self._table(df, organization_id, date_col, self._existing_schema(dataset))
+        outside = set(table.column(MONTH_COLUMN).unique().to_pylist()) - set(months)
+        if outside:
+            raise ValueError(f"rows dated in {', '.join(sorted(map(str, outside)))} are outside the replaced months")
+        root = self.path(dataset)
+        staging = os.path.join(root, f".staging-{uuid.uuid4().hex}")
+        organization_dir = os.path.basename(self.path(dataset, organization_id))
+        try:
+            self._write_files(table, staging)
+            with self._lock:
+                for month in months:
+                    partition = f"{MONTH_COLUMN}={month}"
+                    self._replace_dir(os.path.join(staging, organization_dir, partition),
+                                      os.path.join(self.path(dataset, organization_id), partition))
+                self._bump(dataset, organization_id)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return len(df)
+
+    def append(self, dataset, df, organization_id=DEFAULT_ORGANIZATION_ID, date_col="date"):
+        """Add the rows of `df` to `dataset` as new part files (cast to the existing schema)."""
+        _require_pyarrow()
+        if df.empty:
+            return 0
+        table = self._table(df, organization_id, date_col, self._existing_schema(dataset))
+        with self._lock:
+            self._write_files(table, self.path(dataset))
+            self._bump(dataset, organization_id)
+        return len(df)
+
+    def import_csv(self, dataset, csv_path, organization_id=DEFAULT_ORGANIZATION_ID, date_col="date",
+                   **read_csv_kwargs):
+        df = pd.read_csv(csv_path, **read_csv_kwargs)
+        return self.write(dataset, df, organization_id, date_col)
+
+    # -- reading ---------------------------------------------------------
+
+    def _dataset(self, dataset):
+        _require_pyarrow()
+        filesystem = pafs.LocalFileSystem(use_mmap=self.memory_map)
+        return ds.dataset(self.path(dataset), format="parquet", partitioning=_partitioning(),
+                          filesystem=filesystem)
+
+    def columns(self, dataset):
+        """Data columns of `dataset` (without the partition columns)."""
+        return [name for name in self._dataset(dataset).schema.names if name not in PARTITION_COLUMNS]
+
+    def _scan_args(self, source, columns, organization_id, start, end, filters, date_col):
+        expression = None
+
+        def add(condition):
+            nonlocal expression
+            expression = condition if expression is None else expression & condition
+
+        if organization_id is not None:
+            add(ds.field(ORGANIZATION_COLUMN) == int(organization_id))
+        names = source.schema.names
+        if start is not None or end is not None:
+            if date_col not in names:
+                raise ValueError(f"dataset has no '{date_col}' column to filter on")
+            date_type = source.schema.field(date_col).type
+            if start is not None:
+                start = pd.Timestamp(start)
+                add(ds.field(MONTH_COLUMN) >= start.strftime("%Y-%m"))
+                add(ds.field(date_col) >= pa.scalar(start.to_pydatetime(), date_type))
+            if end is not None:
+                end = pd.Timestamp(end)
+                if end == end.normalize():
+                    # a bare end date includes the whole day
+                    end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+                add(ds.field(MONTH_COLUMN) <= end.strftime("%Y-%m"))
+                add(ds.field(date_col) <= pa.scalar(end.to_pydatetime(), date_type))
+        for column, value in (filters or {}).items():
+            if column not in names:
+                raise ValueError(f"dataset has no '{column}' column to filter on")
+            if isinstance(value, (list, tuple, set)):
+                add(ds.field(column).isin(list(value)))
+            else:
+                add(ds.field(column) == value)
+        if columns is None:
+            columns = [name for name in names if name not in PARTITION_COLUMNS]
+        return {"columns": list(columns), "filter": expression}
+
+    def read(self, dataset, columns=None, organization_id=None, start=None, end=None, filters=None,
+             date_col="date"):
+        """DataFrame of the rows of `dataset` matching the filters, restricted to `columns`.
+
+        `filters` maps column names to a value or a list of accepted values.
+        Partition columns are only returned when listed in `columns`.
+        """
+        source = self._dataset(dataset)
+        table = source.to_table(**self._scan_args(source, columns, organization_id, start, end, filters, date_col))
+        return table.to_pandas()
+
+    def iter_batches(self, dataset, columns=None, organization_id=None, start=None, end=None, filters=None,
+                     date_col="date", batch_rows=BATCH_ROWS):
+        """Like read(), but yields DataFrames of at most `batch_rows` rows."""
+        source = self._dataset(dataset)
+        scan = self._scan_args(source, columns, organization_id, start, end, filters, date_col)
+        for batch in source.to_batches(batch_size=batch_rows, **scan):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def files(self, dataset, organization_id=None):
+        """Part files of `dataset` (or of one organization's data), relative to the dataset directory."""
+        root = self.path(dataset)
+        files = []
+        for directory, subdirectories, names in os.walk(self.path(dataset, organization_id)):
+            # Staged and replaced directories are hidden, like they are from dataset scans
+            subdirectories[:] = [name for name in subdirectories if not name.startswith(('.', '_'))]
+            files.extend(os.path.relpath(os.path.join(directory, name), root) for name in names
+                         if name.endswith(".parquet") and not name.startswith(('.', '_')))
+        return sorted(files)
+
+    def read_files(self, dataset, files, columns=None):
+        """DataFrame of the rows in `files` (as returned by files()), restricted to `columns`."""
+        _require_pyarrow()
+        if not files:
+            source = self._dataset(dataset)
+            return source.schema.empty_table().select(self._scan_args(source, columns, None, None, None, None,
+                                                                      "date")["columns"]).to_pandas()
+        root = self.path(dataset)
+        source = ds.dataset([os.path.join(root, name) for name in files], format="parquet",
+                            partitioning=_partitioning(), partition_base_dir=root,
+                            filesystem=pafs.LocalFileSystem(use_mmap=self.memory_map))
+        return source.to_table(**self._scan_args(source, columns, None, None, None, None, "date")).to_pandas()
+
+    def export_csv(self, dataset, csv_path, **read_kwargs):
+        df = self.read(dataset, **read_kwargs)
+        df.to_csv(csv_path, index=False)
+        return len(df)
+
+
+def load_dataset(dataset, csv_path=None, organization_id=DEFAULT_ORGANIZATION_ID, store=None, columns=None,
+               filters=None, **read_csv_kwargs):
+    """Read `dataset` from the store, or import it from `csv_path` when a CSV is given instead.
+
+    The CSV path is for one-off runs on exported files; its dates are parsed
+    and the same column / value filters are applied after parsing.
+    """
+    if csv_path is None:
+        return (store or sales_store).read(dataset, columns=columns, organization_id=organization_id,
+                                           filters=filters)
+    df = pd.read_csv(csv_path, usecols=columns, **read_csv_kwargs)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], format="ISO8601")
+    for column, value in (filters or {}).items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        df = df[df[column].isin(values)]
+    return df
+
+
+# Shared instance used by the pipeline scripts and the API process
+sales_store = ParquetStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import CSV files into the Parquet store or export datasets as CSV")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("dataset")
+    parser.add_argument("csv")
+    parser.add_argument("--store", default=STORE_DIR, help="store root directory")
+    parser.add_argument("--organization-id", type=int, default=None,
+                        help=f"organization to import into (default {DEFAULT_ORGANIZATION_ID}) or to export")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--start", help="export rows dated on or after this day")
+    parser.add_argument("--end", help="export rows dated on or before this day")
+    args = parser.parse_args()
+
+    store = ParquetStore(args.store)
+    if args.action == "import":
+        organization_id = DEFAULT_ORGANIZATION_ID if args.organization_id is None else args.organization_id
+        rows = store.import_csv(args.dataset, args.csv, organization_id, encoding=args.encoding)
+        print(f"Imported {rows} rows of {args.csv} into {store.path(args.dataset, organization_id)}")
+    else:
+        rows = store.export_csv(args.dataset, args.csv, organization_id=args.organization_id,
+                                start=args.start, end=args.end)
+        print(f"Exported {rows} rows of {args.dataset} to {args.csv}")
@@ -0,0 +1,243 @@
+"""
+Repositories over the tables of database.py.
+
+Every method runs on a pooled connection in a single transaction and uses
+set-based statements: lists of rows are written with one executemany (sent
+as multi-row INSERTs, so there is no round trip per row), and bulk upserts
+resolve conflicts on the (organization_id, product_id, forecast_date) key in
+the database with ON CONFLICT DO UPDATE.
+
+Methods are blocking; API handlers call them through run_blocking().
+Rows are returned as plain dicts in the shape of the API's Pydantic models.
+Writes to an organization that does not exist raise MissingRecord (checked
+in the writing transaction, so it is not mistaken for a DuplicateRecord),
+and aware timestamps are stored as naive UTC.
+"""
+import hashlib
+import hmac
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from storage.database import FORECAST_KEY, organizations, revoked_tokens, sales_forecasts, users
+
+# Rows per executemany batch of a bulk upsert
+UPSERT_BATCH_ROWS = int(os.getenv("DB_UPSERT_BATCH_ROWS", "5000"))
+PASSWORD_ITERATIONS = 200_000
+
+
+class DuplicateRecord(Exception):
+    pass
+
+
+class MissingRecord(Exception):
+    pass
+
+
+def hash_password(password, salt=None):
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PASSWORD_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_ITERATIONS}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password, password_hash):
+    try:
+        _, iterations, salt, expected = password_hash.split("$")
+    except ValueError:
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _naive_utc(value):
+    # Aware timestamps are stored as naive UTC, naive ones as given (the columns have no time zone)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _require_organization(connection, organization_id):
+    if connection.execute(select(organizations.c.id).where(organizations.c.id == organization_id)).first() is None:
+        raise MissingRecord(f"Organization {organization_id} not found")
+
+
+def _upsert_statement(engine, table, key, update_columns):
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"bulk upsert is not supported on {engine.dialect.name}")
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: statement.excluded[column] for column in update_columns})
+
+
+class UserRepository:
+    def __init__(self, engine):
+        self.engine = engine
+
+    @staticmethod
+    def _public(row):
+        return {"id": row.id, "email": row.email, "name": row.name, "organization_id": row.organization_id}
+
+    def get(self, user_id):
+        with self.engine.connect() as connection:
+            row = connection.execute(select(users).where(users.c.id == user_id)).first()
+        return None if row is None else self._public(row)
+
+    def authenticate(self, email, password):
+        """The user with `email` if `password` matches, else None (uses the unique email index)."""
+        with self.engine.connect() as connection:
+            row = connection.execute(select(users).where(users.c.email == email)).first()
+        if row is None or not verify_password(password, row.password_hash):
+            return None
+        return self._public(row)
+
+    def create(self, email, password, name, organization_id):
+        try:
+            with self.engine.begin() as connection:
+                result = connection.execute(insert(users).values(
+                    email=email, password_hash=hash_password(password), name=name,
+                    organization_id=organization_id))
+        except IntegrityError:
+            raise DuplicateRecord(f"A user with email {email} already exists")
+        return {"id": result.inserted_primary_key[0], "email": email, "name": name,
+                "organization_id": organization_id}
+
+
+class RevokedTokenRepository:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def revoke(self, jti, user_id, expires_at):
+        """Record a revoked token (idempotent) and purge the rows of tokens that have expired since."""
+        with self.engine.begin() as connection:
+            connection.execute(delete(revoked_tokens).where(
+                (revoked_tokens.c.jti == jti)
+                | (revoked_tokens.c.expires_at < _naive_utc(datetime.now(timezone.utc)))))
+            connection.execute(insert(revoked_tokens).values(jti=jti, user_id=user_id, expires_at=_naive_utc(expires_at)))
+
+    def is_revoked(self, jti):
+        with self.engine.connect() as connection:
+            return connection.execute(select(revoked_tokens.c.jti).where(revoked_tokens.c.jti == jti)).first() is not None
+
+
+class OrganizationRepository:
+    def __init__(self, engine):
+        self.engine = engine
+
+    @staticmethod
+    def _public(row):
+        return {"id": row.id, "name": row.name, "stripe_customer_id": row.stripe_customer_id}
+
+    def list(self):
+        with self.engine.connect() as connection:
+            return [self._public(row) for row in connection.execute(select(organizations).order_by(organizations.c.id))]
+
+    def get(self, organization_id):
+        with self.engine.connect() as connection:
+            row = connection.execute(select(organizations).where(organizations.c.id == organization_id)).first()
+        return None if row is None else self._public(row)
+
+
+class ForecastRepository:
+    def __init__(self, engine, batch_rows=UPSERT_BATCH_ROWS):
+        self.engine = engine
+        self.batch_rows = batch_rows
+
+    @staticmethod
+    def _public(row):
+        return {"id": row.id, "product_id": row.product_id, "forecasted_sales": row.forecasted_sales,
+                "forecast_date": _iso(row.forecast_date), "organization_id": row.organization_id}
+
+    def get(self, forecast_id):
+        with self.engine.connect() as connection:
+            row = connection.execute(select(sales_forecasts).where(sales_forecasts.c.id == forecast_id)).first()
+        return None if row is None else self._public(row)
+
+    def for_product(self, organization_id, product_id, start=None, end=None):
+        """Forecasts of one product ordered by date, optionally from `start` / until `end` (index range scan)."""
+        query = select(sales_forecasts).where(sales_forecasts.c.organization_id == organization_id,
+                                              sales_forecasts.c.product_id == product_id)
+        if start is not None:
+            query = query.where(sales_forecasts.c.forecast_date >= start)
+        if end is not None:
+            query = query.where(sales_forecasts.c.forecast_date <= end)
+        with self.engine.connect() as connection:
+            return [self._public(row) for row in connection.execute(query.order_by(sales_forecasts.c.forecast_date))]
+
+    def create(self, organization_id, product_id, forecasted_sales, forecast_date=None):
+        values = {"organization_id": organization_id, "product_id": product_id,
+                  "forecasted_sales": forecasted_sales, "forecast_date": _naive_utc(forecast_date) or datetime.now()}
+        try:
+            with self.engine.begin() as connection:
+                _require_organization(connection, organization_id)
+                result = connection.execute(insert(sales_forecasts).values(**values))
+        except IntegrityError:
+            raise DuplicateRecord(f"A forecast for product {product_id} on {_iso(values['forecast_date'])} "
+                                  f"already exists in organization {organization_id}")
+        return {"id": result.inserted_primary_key[0], **values, "forecast_date": _iso(values["forecast_date"])}
+
+    def update(self, organization_id, forecast_id, **values):
+        """Update the given columns of a forecast of the organization; returns it, or None if there is no such forecast."""
+        values = {column: _naive_utc(value) for column, value in values.items() if value is not None}
+        match = (sales_forecasts.c.id == forecast_id) & (sales_forecasts.c.organization_id == organization_id)
+        try:
+            with self.engine.begin() as connection:
+                if values:
+                    connection.execute(update(sales_forecasts).where(match).values(**values))
+                row = connection.execute(select(sales_forecasts).where(match)).first()
+        except IntegrityError:
+            raise DuplicateRecord("Another forecast already exists for this product and date")
+        return None if row is None else self._public(row)
+
+    def delete(self, organization_id, forecast_id):
+        with self.engine.begin() as connection:
+            return connection.execute(delete(sales_forecasts).where(
+                sales_forecasts.c.id == forecast_id, sales_forecasts.c.organization_id == organization_id)).rowcount > 0
+
+    def bulk_upsert(self, organization_id, rows):
+        """Insert or update forecasts keyed on (product_id, forecast_date); returns the number of rows written.
+
+        `rows` is a DataFrame or an iterable of dicts with product_id,
+        forecasted_sales and forecast_date. Rows are written in batches of
+        `batch_rows` within one transaction. Raises ValueError (nothing is
+        written) when a forecasted_sales value is not a whole number.
+        """
+        frame = pd.DataFrame(rows, columns=["product_id", "forecasted_sales", "forecast_date"])
+        if frame.empty:
+            return 0
+        # Aware timestamps are stored as naive UTC, naive ones as given
+        frame["forecast_date"] = pd.to_datetime(frame["forecast_date"], format="ISO8601", utc=True).dt.tz_convert(None)
+        frame["product_id"] = frame["product_id"].astype(int)
+        # The last forecast wins when a batch repeats a key (ON CONFLICT cannot touch a row twice)
+        frame = frame.drop_duplicates(["product_id", "forecast_date"], keep="last")
+        # forecasted_sales is an integer column (frontend schema): fractional values are rejected, not rounded
+        sales = frame["forecasted_sales"].astype(float)
+        fractional = sales[sales != sales.round()]
+        if len(fractional):
+            raise ValueError(f"forecasted_sales must be whole units, got {fractional.iloc[0]}")
+        statement = _upsert_statement(self.engine, sales_forecasts, FORECAST_KEY, ["forecasted_sales"])
+        product_ids = frame["product_id"].tolist()
+        sales = sales.astype(int).tolist()
+        dates = frame["forecast_date"].dt.to_pydatetime().tolist()
+        with self.engine.begin() as connection:
+            _require_organization(connection, organization_id)
+            for offset in range(0, len(frame), self.batch_rows):
+                connection.execute(statement, [
+                    {"organization_id": organization_id, "product_id": product_id,
+                     "forecasted_sales": value, "forecast_date": date}
+                    for product_id, value, date in zip(product_ids[offset:offset + self.batch_rows],
+                                                       sales[offset:offset + self.batch_rows],
+                                                       dates[offset:offset + self.batch_rows])
+                ])
+        return len(frame)
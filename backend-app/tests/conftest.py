@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from sqlalchemy import insert
+
+ADMIN = {"email": "admin@example.com", "password": "admin123"}
+MEMBER = {"email": "member@example.com", "password": "member123"}
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """The API module (main.py), with its database, store and sources in a temporary directory."""
+    from benchmarks.load import isolate
+
+    cwd, environ = os.getcwd(), dict(os.environ)
+    # The settings are read when the modules are imported, relative paths from the working directory
+    isolate(str(tmp_path_factory.mktemp("api")))
+    import main
+
+    yield main
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+@pytest.fixture(scope="session")
+def client(api):
+    """Client of the running app: the seeded admin of organization 1 and a member of organization 2."""
+    from fastapi.testclient import TestClient
+    from storage.database import organizations
+
+    with TestClient(api.app) as client:
+        with api.engine.begin() as connection:
+            connection.execute(insert(organizations).values(name="Other"))
+        api.user_repository.create(MEMBER["email"], MEMBER["password"], "Member", 2)
+        yield client
+
+
+def login(client, credentials):
+    response = client.post("/api/auth/login", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    return login(client, ADMIN)
+
+
+@pytest.fixture(scope="session")
+def member(client):
+    return login(client, MEMBER)
@@ -0,0 +1,21 @@
+def test_fractional_forecasts_are_rejected(client, admin):
+    single = client.post("/api/sales-forecasts", json={"product_id": 1, "forecasted_sales": 2.5}, headers=admin)
+    assert single.status_code == 422
+    bulk = client.post("/api/sales-forecasts/1/bulk", headers=admin, json=[
+        {"product_id": 1, "forecasted_sales": 3.0, "forecast_date": "2024-01-01"},
+        {"product_id": 2, "forecasted_sales": 2.5, "forecast_date": "2024-01-01"},
+    ])
+    # Rows are rejected one by one, with their position in the body
+    assert bulk.json()["data"]["rejected"] == 1
+    assert bulk.json()["data"]["batches"][0]["errors"][0]["row"] == 1
+    assert "fractional" in bulk.json()["data"]["batches"][0]["errors"][0]["error"]
+
+    assert bulk.json()["data"]["written"] == 1
+    stored = client.get("/api/sales-forecasts/1/products/1", headers=admin).json()["data"]
+    assert [forecast["forecasted_sales"] for forecast in stored] == [3]
+
+
+def test_the_mock_forecast_has_whole_units(client, admin):
+    # No forecast data has been written in the test app
+    forecasts = client.get("/api/sales-forecasts/1", headers=admin).json()["data"]
+    assert forecasts[0]["forecasted_sales"] == 100 and isinstance(forecasts[0]["forecasted_sales"], int)
@@ -0,0 +1,82 @@
+"""
+The benchmark suite under pytest.
+
+Every micro benchmark of benchmarks/micro.py runs as a test on a small
+dataset. With pytest-benchmark installed its `benchmark` fixture does the
+timing (`pytest tests/test_benchmarks.py --benchmark-only`); otherwise each
+benchmark runs for a single round, which keeps them working as smoke tests.
+The CLI test runs `python -m benchmarks` end to end, load test included.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import micro
+from benchmarks.datasets import dataset
+from benchmarks.harness import MIN_ROUNDS, REGISTRY, Bench
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PytestBenchmark:
+    """Adapts pytest-benchmark's fixture to the `bench` callable of the suite."""
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+    @property
+    def params(self):
+        return self.fixture.extra_info
+
+    @params.setter
+    def params(self, values):
+        self.fixture.extra_info.update(values)
+
+    def __call__(self, fn, *args, setup=None, **kwargs):
+        if setup is None:
+            return self.fixture(fn, *args, **kwargs)
+        return self.fixture.pedantic(fn, setup=lambda: (setup(), kwargs), rounds=MIN_ROUNDS, warmup_rounds=1)
+
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory):
+    sales, orders = dataset((40, 120), seed=7)
+    return micro.prepare(sales, orders, str(tmp_path_factory.mktemp("benchmarks")))
+
+
+@pytest.fixture
+def bench(request):
+    if request.config.pluginmanager.hasplugin("benchmark"):
+        return PytestBenchmark(request.getfixturevalue("benchmark"))
+    return Bench(min_rounds=1, max_time=0)
+
+
+@pytest.mark.parametrize("group, name, fn", REGISTRY, ids=[f"{group}.{name}" for group, name, _ in REGISTRY])
+def test_micro_benchmark(bench, data, group, name, fn):
+    fn(bench, data)
+    assert bench.params.get("rows")
+    if isinstance(bench, Bench):
+        assert bench.stats["rounds"] >= 1
+
+
+def test_cli_writes_and_compares_results(tmp_path):
+    output = tmp_path / "results.json"
+    command = [sys.executable, "-m", "benchmarks", "--size", "small", "--rounds", "1", "--max-time", "0",
+               "--requests", "4", "--concurrency", "2", "--output", str(output)]
+    subprocess.run(command, cwd=BACKEND_DIR, check=True, capture_output=True)
+    results = json.loads(output.read_text())
+
+    names = {entry["name"] for entry in results["benchmarks"]}
+    assert {f"{group}.{name}" for group, name, _ in REGISTRY} <= names
+    load = [entry for entry in results["benchmarks"] if entry["group"] == "api"]
+    assert load and all(entry["params"]["errors"] == 0 for entry in load)
+    assert all(entry["stats"]["p50"] <= entry["stats"]["p99"] for entry in load)
+
+    # Compared with itself nothing regressed
+    compared = subprocess.run(command[:-2] + ["--output", str(tmp_path / "again.json"), "--suite", "micro",
+                                              "--compare", str(output), "--threshold", "1000"],
+                              cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert compared.returncode == 0, compared.stderr
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from deployment.bulk_writes import WRITE_FAILED, bulk_write, is_ndjson, json_batches, ndjson_batches, process_batch
+
+
+class Row(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class Body:
+    """Request stand-in delivering its body in the given chunks."""
+
+    def __init__(self, *chunks):
+        self.chunks = [chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks]
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def body(self):
+        return b"".join(self.chunks)
+
+
+def collect(batches):
+    async def run():
+        return [batch async for batch in batches]
+    return asyncio.run(run())
+
+
+class Writer:
+    def __init__(self, fail_on=()):
+        self.batches = []
+        self.fail_on = set(fail_on)
+
+    def __call__(self, records):
+        if len(self.batches) in self.fail_on:
+            self.batches.append(None)
+            raise RuntimeError("connection to db-primary:5432 refused")
+        self.batches.append([record.product_id for record in records])
+        return len(records)
+
+
+def test_ndjson_lines_are_cut_into_batches_across_chunks():
+    body = Body('{"product_id": 1, "quantity": 1}\n{"product_', 'id": 2, "quantity": 2}\n\n',
+                '{"product_id": 3, "quantity": 3}\n{"product_id": 4, "quantity": 4}')
+    batches = collect(ndjson_batches(body, batch_rows=3))
+
+    assert [(first, len(lines)) for first, lines in batches] == [(0, 3), (3, 1)]
+    assert [json.loads(line)["product_id"] for _, lines in batches for line in lines] == [1, 2, 3, 4]
+    assert is_ndjson("application/x-ndjson; charset=utf-8") and not is_ndjson("application/json")
+
+
+def test_json_arrays_are_batched_and_must_be_arrays():
+    rows = [{"product_id": i, "quantity": i} for i in range(7)]
+    batches = collect(json_batches(Body(json.dumps(rows)), batch_rows=3))
+    assert [(first, len(batch)) for first, batch in batches] == [(0, 3), (3, 3), (6, 1)]
+    with pytest.raises(ValueError, match="JSON array"):
+        collect(json_batches(Body('{"product_id": 1}')))
+
+
+def test_invalid_rows_are_rejected_with_their_position():
+    rows = [{"product_id": 1, "quantity": 1}, {"product_id": "x", "quantity": 1}, {"quantity": 2},
+            {"product_id": 4, "quantity": 2.5}, {"product_id": 5, "quantity": 5}]
+    writer = Writer()
+    result = process_batch(Row, rows, 100, writer, max_errors=2)
+
+    assert writer.batches == [[1, 5]]
+    assert (result["rows"], result["written"], result["rejected"]) == (5, 2, 3)
+    # Only the first max_errors errors are reported
+    assert [error["row"] for error in result["errors"]] == [101, 102]
+    assert result["errors"][0]["error"].startswith("product_id:")
+
+
+def test_check_and_unparseable_lines_reject_single_rows():
+    def check(row):
+        if row.product_id == 2:
+            raise ValueError("product 2 is discontinued")
+
+    lines = [b'{"product_id": 1, "quantity": 1}', b'{"product_id": 2, "quantity": 1}', b'{not json']
+    result = process_batch(Row, lines, 0, Writer(), parse=True, check=check)
+    assert result["written"] == 1
+    assert [error["row"] for error in result["errors"]] == [1, 2]
+    assert result["errors"][0]["error"] == "product 2 is discontinued"
+
+
+def test_failed_batches_do_not_stop_the_others():
+    rows = [{"product_id": i, "quantity": 1} for i in range(5)]
+    writer = Writer(fail_on={1})
+
+    async def run():
+        return await bulk_write(json_batches(Body(json.dumps(rows)), batch_rows=2), Row, writer)
+
+    result = asyncio.run(run())
+    assert (result["rows"], result["written"], result["failed_batches"]) == (5, 3, 1)
+    assert [batch["batch"] for batch in result["batches"]] == [0, 1, 2]
+    failed = result["batches"][1]
+    # The exception text is logged, not returned
+    assert failed["error"] == WRITE_FAILED and failed["written"] == 0
+    assert writer.batches == [[0, 1], None, [4]]
+
+
+def test_bulk_endpoint_accepts_ndjson(client, admin, member):
+    lines = [
+        {"product_id": 901, "forecasted_sales": 4, "forecast_date": "2024-03-01"},
+        {"product_id": 901, "forecasted_sales": 5, "forecast_date": "2024-03-02", "organization_id": 2},
+        {"product_id": 902, "forecasted_sales": 6, "forecast_date": "2024-03-01", "organization_id": 1},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n\n"
+    headers = {**admin, "Content-Type": "application/x-ndjson"}
+    response = client.post("/api/sales-forecasts/1/bulk", content=body, headers=headers)
+
+    data = response.json()["data"]
+    assert response.status_code == 200
+    assert (data["rows"], data["written"], data["rejected"]) == (3, 2, 1)
+    assert data["batches"][0]["errors"] == [{"row": 1, "error": "organization_id 2 does not match the URL"}]
+    assert client.post("/api/sales-forecasts/1/bulk", content="{}", headers=admin).status_code == 400
+    assert client.post("/api/sales-forecasts/1/bulk", content=body, headers={**member,
+                       "Content-Type": "application/x-ndjson"}).status_code == 403
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deployment.dashboard_aggregates import DashboardAggregateStore, OrganizationAggregates, compare_states
+from storage.parquet_store import ParquetStore, SALES_FEATURES
+
+
+def sales_frame(seed=0, products=5, days=40, start="2024-01-20"):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": np.tile(pd.date_range(start, periods=days), products),
+        "product": np.repeat([f"P{i}" for i in range(products)], days),
+        "sales": rng.poisson(5, products * days).astype(float),
+    })
+
+
+def from_scratch(df):
+    return {
+        "daily": df.groupby(df["date"].dt.strftime("%Y-%m-%d"))["sales"].sum().to_dict(),
+        "products": df.groupby("product")["sales"].sum().to_dict(),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ParquetStore(str(tmp_path / "store"))
+
+
+def test_appended_part_files_are_folded_in_incrementally(store):
+    sales = sales_frame()
+    store.write(SALES_FEATURES, sales.iloc[:80], 1)
+    aggregates = DashboardAggregateStore(store)
+    assert aggregates.summary(1) == {"totalProducts": 2, "totalForecastedSales": sales["sales"].iloc[:80].sum()}
+
+    # Crosses into a new month and adds products
+    store.append(SALES_FEATURES, sales.iloc[80:], 1)
+    summary = aggregates.summary(1)
+    assert (aggregates.appends, aggregates.rebuilds) == (1, 1)
+    assert summary == {"totalProducts": 5, "totalForecastedSales": sales["sales"].sum()}
+
+    rollups = aggregates.rollups(1)
+    expected = from_scratch(sales)
+    assert {row["date"]: row["quantity"] for row in rollups["daily"]} == pytest.approx(expected["daily"])
+    assert {row["product"]: row["quantity"] for row in rollups["products"]} == pytest.approx(expected["products"])
+    assert aggregates.verify(1)["consistent"]
+
+
+def test_rewritten_months_trigger_a_rebuild(store):
+    sales = sales_frame()
+    store.write(SALES_FEATURES, sales, 1)
+    aggregates = DashboardAggregateStore(store)
+    aggregates.summary(1)
+
+    changed = sales.copy()
+    changed.loc[changed["date"] >= "2024-02-01", "sales"] += 1
+    store.replace_months(SALES_FEATURES, changed[changed["date"] >= "2024-02-01"], 1, months=["2024-02"])
+    assert aggregates.summary(1)["totalForecastedSales"] == changed["sales"].sum()
+    assert (aggregates.appends, aggregates.rebuilds) == (0, 2)
+    assert aggregates.verify(1)["consistent"]
+
+
+def test_organizations_are_kept_apart(store):
+    store.write(SALES_FEATURES, sales_frame(products=3), 1)
+    store.write(SALES_FEATURES, sales_frame(seed=1, products=2), 2)
+    aggregates = DashboardAggregateStore(store)
+
+    assert aggregates.summary(1)["totalProducts"] == 3
+    assert aggregates.summary(2)["totalProducts"] == 2
+    assert aggregates.summary(3) is None
+
+    store.append(SALES_FEATURES, sales_frame(products=4).iloc[-40:], 2)
+    assert aggregates.summary(2)["totalProducts"] == 3
+    assert aggregates.summary(1)["totalProducts"] == 3
+
+
+def test_rollups_filter_days_and_rank_products(store):
+    sales = sales_frame()
+    store.write(SALES_FEATURES, sales, 1)
+    rollups = DashboardAggregateStore(store).rollups(1, start="2024-02-01", end="2024-02-03", top=2)
+
+    assert [row["date"] for row in rollups["daily"]] == ["2024-02-01", "2024-02-02", "2024-02-03"]
+    totals = sales.groupby("product")["sales"].sum().sort_values(ascending=False, kind="stable")
+    assert [row["product"] for row in rollups["products"]] == list(totals.index[:2])
+    assert rollups["totalProducts"] == 5
+
+
+def test_compare_states_reports_drift(store):
+    store.write(SALES_FEATURES, sales_frame(), 1)
+    aggregates = OrganizationAggregates(store, SALES_FEATURES, 1)
+    aggregates.refresh()
+    drifted = aggregates.state()
+    drifted["product_quantities"]["P0"] += 1
+
+    result = compare_states(drifted, aggregates.state())
+    assert not result["consistent"]
+    assert set(result["differences"]) == {"product_quantities"}
+
+
+def test_rollups_endpoint(api, client, admin):
+    assert client.get("/api/dashboard/3/rollups", headers=admin).status_code == 404
+    sales = sales_frame()
+    api.sales_store.write(SALES_FEATURES, sales, 3)
+
+    response = client.get("/api/dashboard/3/rollups", params={"start_date": "2024-01-20", "end_date": "2024-01-21",
+                                                               "top": 1}, headers=admin)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    expected = from_scratch(sales)
+    assert [row["quantity"] for row in data["daily"]] == [expected["daily"]["2024-01-20"],
+                                                            expected["daily"]["2024-01-21"]]
+    assert len(data["products"]) == 1 and data["totalProducts"] == 5
+
+    dashboard = client.get("/api/dashboard/3", headers=admin).json()["data"]
+    assert (dashboard["totalProducts"], dashboard["forecastSource"]) == (5, "sales")
+    assert client.post("/api/dashboard/3/recompute", headers=admin).json()["data"]["consistent"]
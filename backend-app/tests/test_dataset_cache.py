@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from deployment.dataset_cache import DatasetCache, frame_nbytes
+
+
+class SlowLoader:
+    """Loader that blocks until released, counting its calls."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def __call__(self, path, **read_kwargs):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise OSError("unreadable")
+        return pd.read_csv(path, **read_kwargs)
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"product": ["a", "b"], "sales": [1, 2]}).to_csv(path, index=False)
+    return str(path)
+
+
+def concurrent_gets(cache, loader, path, callers=8):
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(cache.get, path) for _ in range(callers)]
+        assert loader.started.wait(5)
+        # Let every caller reach the cache before the load finishes
+        deadline = time.monotonic() + 5
+        while cache.stats()["coalesced"] < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        loader.release.set()
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_misses_are_coalesced_into_one_load(csv):
+    loader = SlowLoader()
+    cache = DatasetCache(loader=loader)
+
+    frames = concurrent_gets(cache, loader, csv)
+
+    assert loader.calls == 1
+    assert all(frame is frames[0] for frame in frames)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["entries"]) == (1, 7, 1)
+    assert cache.get(csv) is frames[0]
+    assert cache.stats()["hits"] == 1
+
+
+def test_a_failed_load_is_raised_to_every_waiting_caller_and_not_cached(csv):
+    loader = SlowLoader(fail=True)
+    cache = DatasetCache(loader=loader)
+
+    errors = concurrent_gets(cache, loader, csv)
+
+    assert loader.calls == 1
+    assert all(isinstance(error, OSError) for error in errors)
+    assert cache.stats()["entries"] == 0
+    loader.fail = False
+    assert len(cache.get(csv)) == 2
+    assert loader.calls == 2
+
+
+def test_changed_files_are_reloaded(csv):
+    cache = DatasetCache()
+    first = cache.get(csv)
+    pd.DataFrame({"product": ["a", "b", "c"], "sales": [1, 2, 3]}).to_csv(csv, index=False)
+
+    assert len(cache.get(csv)) == 3 and len(first) == 2
+    assert cache.stats()["reloads"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = []
+    for name in "abc":
+        path = tmp_path / f"{name}.csv"
+        pd.DataFrame({"sales": range(100)}).to_csv(path, index=False)
+        paths.append(str(path))
+    # Room for two of the three frames
+    cache = DatasetCache(max_bytes=2 * frame_nbytes(pd.read_csv(paths[0])))
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+
+    assert cache.stats()["evictions"] == 1
+    cache.get(paths[0])
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from deployment.export_stream import store_export, streaming_export
+from deployment.query import ListingQuery
+from deployment.serialization import dumps, forecast_columns, order_columns, records
+from storage.parquet_store import ParquetStore
+
+NOW = "2024-06-01T12:00:00"
+FILTERS = {"date_column": ("date", "date_created"), "product_column": "product_id",
+           "status_column": "status", "status_default": "completed"}
+
+
+def query(**kwargs):
+    params = dict(limit=None, cursor=None, fields=None, start_date=None, end_date=None, product_id=None, status=None)
+    return ListingQuery(**{**params, **kwargs})
+
+
+def sales(rows=250):
+    rng = np.random.default_rng(4)
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=rows, freq="6h").strftime("%Y-%m-%d %H:%M:%S"),
+        "order_id": np.arange(rows),
+        "product_id": rng.integers(1, 6, rows),
+        "quantity": rng.uniform(0, 50, rows).round(2),
+        "status": rng.choice(["completed", "processing"], rows),
+        "total": [f"{value:.2f}" for value in rng.uniform(1, 100, rows)],
+    })
+
+
+def body(response):
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(read())
+
+
+def build_forecasts(fields=None):
+    return lambda chunk: forecast_columns(chunk, 1, NOW, fields)
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    sales().to_csv(path, index=False)
+    return str(path)
+
+
+def test_json_stream_matches_the_unpaged_document(csv):
+    listing = query(product_id=3, start_date="2024-01-10", end_date="2024-02-20")
+    response = streaming_export(csv, "json-stream", listing, FILTERS, build_forecasts(), chunksize=40)
+
+    columns = build_forecasts()(listing.filter(pd.read_csv(csv), **FILTERS))
+    assert response.media_type == "application/json"
+    assert body(response) == dumps({"success": True, "data": records(columns)}, columns)
+
+
+def test_ndjson_has_one_projected_record_per_line(csv):
+    listing = query(status="processing", fields="product_id,forecasted_sales")
+    fields = listing.projection(("id", "product_id", "forecasted_sales", "forecast_date", "organization_id"))
+    response = streaming_export(csv, "ndjson", listing, FILTERS, build_forecasts(fields), chunksize=33)
+
+    lines = body(response).decode("utf-8").splitlines()
+    expected = records(build_forecasts(fields)(listing.filter(pd.read_csv(csv), **FILTERS)))
+    assert response.media_type == "application/x-ndjson"
+    assert [json.loads(line) for line in lines] == expected
+    assert len(lines) == len(expected) > 0
+
+
+def test_exports_without_matches_and_paged_exports(csv):
+    response = streaming_export(csv, "json-stream", query(product_id=99), FILTERS, build_forecasts())
+    assert body(response) == b'{"success":true,"data":[]}'
+    assert body(streaming_export(csv, "ndjson", query(product_id=99), FILTERS, build_forecasts())) == b""
+    for listing in (query(limit=10), query(cursor="eyJvIjoxMH0")):
+        with pytest.raises(HTTPException):
+            streaming_export(csv, "ndjson", listing, FILTERS, build_forecasts())
+
+
+def test_store_export_streams_the_organizations_rows(tmp_path):
+    store = ParquetStore(str(tmp_path / "store"))
+    rows = sales().assign(date=lambda df: pd.to_datetime(df["date"]))
+    store.write("orders", rows, 1)
+    store.write("orders", rows.assign(order_id=rows["order_id"] + 1000), 2)
+
+    listing = query(start_date="2024-02-01", end_date="2024-02-29", status="completed")
+    build = lambda chunk: order_columns(chunk, NOW)
+    response = store_export(store, "orders", 1, "ndjson", listing, FILTERS, build, chunksize=16)
+
+    exported = [json.loads(line) for line in body(response).decode("utf-8").splitlines()]
+    expected = records(build(listing.filter(store.read("orders", organization_id=1), **FILTERS)))
+    assert exported == expected
+    assert {order["id"] for order in exported} <= set(range(1000))
+    assert exported and all(order["date_created"].startswith("2024-02") for order in exported)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import dataset
+from models.hierarchy import (
+    LEVELS, METHODS, TOTAL_NODE, UNCATEGORIZED, coherence_error, forecast_totals, load_categories,
+    reconcile_forecasts, verify,
+)
+
+HORIZON = 14
+
+
+@pytest.fixture(scope="module")
+def panel():
+    sales, _ = dataset((30, 200), seed=5)
+    sales = sales[['date', 'product', 'sales']]
+    products = sorted(sales['product'].unique())
+    # One product is left without a category
+    categories = {product: f"C{i % 3}" for i, product in enumerate(products[1:])}
+    last = pd.to_datetime(sales['date']).max()
+    rng = np.random.default_rng(1)
+    forecasts = pd.DataFrame([
+        {"product": product, "ds": last + pd.Timedelta(days=step), "yhat": rng.gamma(2, 3)}
+        for product in products[::2] for step in range(1, HORIZON + 1)
+    ])
+    return sales, forecasts, categories
+
+
+def test_the_reconciliation_matches_the_textbook_formulas():
+    assert verify(products=20, categories=3, days=120) == []
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_reconciled_forecasts_are_coherent(panel, method):
+    sales, forecasts, categories = panel
+    result, info = reconcile_forecasts(sales, forecasts, categories, method)
+
+    assert info["categories"] == 4
+    assert result['ds'].nunique() == HORIZON
+    assert coherence_error(result) < 1e-6
+    by_node = result.pivot_table(index=['level', 'node'], columns='ds', values='yhat')
+    category_sum = by_node.loc[LEVELS[1]].sum()
+    assert np.allclose(by_node.loc[(LEVELS[0], TOTAL_NODE)], category_sum)
+    assert UNCATEGORIZED in by_node.loc[LEVELS[1]].index
+
+    totals = forecast_totals(result)
+    assert totals["total"] == pytest.approx(sum(totals["categories"].values()))
+
+
+def test_bottom_up_keeps_the_product_forecasts(panel):
+    sales, forecasts, categories = panel
+    result, _ = reconcile_forecasts(sales, forecasts, categories, 'bottom_up')
+
+    products = result[result['level'] == LEVELS[2]].merge(forecasts, left_on=['node', 'ds'], right_on=['product', 'ds'])
+    assert len(products) == len(forecasts)
+    assert np.allclose(products['yhat_x'], products['yhat_y'])
+
+
+def test_categories_are_matched_on_product_id(tmp_path):
+    mapping = tmp_path / "categories.csv"
+    pd.DataFrame({"product_id": ["1", "2"], "product": ["Old name", "Mug"],
+                  "category": ["Shirts", "Kitchen"]}).to_csv(mapping, index=False)
+    sales = pd.DataFrame({"product": ["New name", "Mug", "Other"], "product_id": [1.0, 2.0, None]})
+
+    assert load_categories(1, path=str(mapping), sales=sales) == {
+        "Old name": "Shirts", "New name": "Shirts", "Mug": "Kitchen"}
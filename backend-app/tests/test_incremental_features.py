@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engineering.incremental_features import IncrementalFeatureBuilder
+from feature_engineering.window_features import build_features
+from storage.parquet_store import ParquetStore, SALES_FEATURES
+
+WINDOWS = (3, 7)
+LAGS = (1, 7)
+
+
+def daily_sales(start="2024-01-01", days=30, products=("A", "B", "C"), seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days)
+    return pd.DataFrame({
+        "date": np.tile(dates, len(products)),
+        "product": np.repeat(products, days),
+        "sales": rng.poisson(8, days * len(products)),
+    }).sort_values(["date", "product"], kind="stable")
+
+
+def to_csv(df):
+    return df.assign(date=df["date"].dt.strftime("%Y-%m-%d")).to_csv(index=False, header=False)
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text("date,product,sales\n" + to_csv(daily_sales()))
+    return path
+
+
+def append(path, df):
+    with open(path, "a") as f:
+        f.write(to_csv(df))
+
+
+def full_rebuild(path):
+    return build_features(pd.read_csv(path, parse_dates=["date"]), WINDOWS, LAGS)
+
+
+def assert_same_as_rebuild(features, path):
+    expected = full_rebuild(path)
+    keys = ["product", "date"]
+    features = features.sort_values(keys).reset_index(drop=True)
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(features[list(expected.columns)], expected, check_dtype=False, rtol=1e-12)
+
+
+def test_appended_days_match_a_full_rebuild(sales_csv, tmp_path):
+    output = tmp_path / "features.csv"
+    builder = IncrementalFeatureBuilder(str(sales_csv), str(output), WINDOWS, LAGS)
+    assert builder.update() == ("rebuild", 90)
+
+    # New days for every product, and a product with no history yet
+    append(sales_csv, daily_sales("2024-01-31", days=10, products=("A", "B", "C", "D"), seed=1))
+    assert builder.update() == ("append", 40)
+    assert builder.update() == ("noop", 0)
+
+    assert_same_as_rebuild(pd.read_csv(output, parse_dates=["date"]), sales_csv)
+    assert builder.verify()["consistent"]
+
+
+def test_partial_last_lines_wait_for_the_next_run(sales_csv, tmp_path):
+    builder = IncrementalFeatureBuilder(str(sales_csv), str(tmp_path / "features.csv"), WINDOWS, LAGS)
+    builder.rebuild()
+    with open(sales_csv, "a") as f:
+        f.write("2024-01-31,A,5\n2024-01-31,B,")
+    assert builder.update() == ("append", 1)
+    with open(sales_csv, "a") as f:
+        f.write("7\n")
+    assert builder.update() == ("append", 1)
+    assert builder.verify()["consistent"]
+
+
+def test_rewrites_and_late_rows_fall_back_to_a_rebuild(sales_csv, tmp_path):
+    output = tmp_path / "features.csv"
+    builder = IncrementalFeatureBuilder(str(sales_csv), str(output), WINDOWS, LAGS)
+    builder.rebuild()
+
+    # A day already processed for product A
+    append(sales_csv, pd.DataFrame({"date": pd.to_datetime(["2024-01-15"]), "product": ["A"], "sales": [3]}))
+    assert builder.update() == ("rebuild", 91)
+    assert builder.verify()["consistent"]
+
+    # The input rewritten rather than appended to
+    sales_csv.write_text("date,product,sales\n" + to_csv(daily_sales(seed=2)))
+    assert builder.update()[0] == "rebuild"
+    assert builder.verify()["consistent"]
+
+    # Other windows cannot reuse the state
+    other = IncrementalFeatureBuilder(str(sales_csv), str(output), (5,), LAGS)
+    assert other.update()[0] == "rebuild"
+
+
+def test_store_output_appends_part_files(sales_csv, tmp_path):
+    store = ParquetStore(str(tmp_path / "store"))
+    builder = IncrementalFeatureBuilder(str(sales_csv), None, WINDOWS, LAGS, store=store, dataset=SALES_FEATURES,
+                                        organization_id=2)
+    builder.update()
+    files = store.files(SALES_FEATURES, 2)
+
+    append(sales_csv, daily_sales("2024-01-31", days=5, seed=3))
+    assert builder.update() == ("append", 15)
+    assert set(files) < set(store.files(SALES_FEATURES, 2))
+    assert_same_as_rebuild(store.read(SALES_FEATURES, organization_id=2), sales_csv)
+    assert builder.verify()["consistent"]
+
+    # Someone else rewrote the organization's features: the state no longer applies
+    store.write(SALES_FEATURES, full_rebuild(sales_csv).head(10), 2)
+    append(sales_csv, daily_sales("2024-02-05", days=1, seed=4))
+    assert builder.update()[0] == "rebuild"
+    assert builder.verify()["consistent"]
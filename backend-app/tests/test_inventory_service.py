@@ -0,0 +1,108 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from deployment.dataset_cache import DatasetCache
+from deployment.inventory_service import InventoryService, report_records
+from models.safety_stock_and_reorder import CURRENT_STOCK, LEAD_TIME_DAYS, REPORT_COLUMNS, compute_reorder_report
+from storage.parquet_store import ParquetStore, SALES_FEATURES, VERSION_FILE
+
+
+def sales_frame(seed=0, products=6, days=60):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days)
+    return pd.DataFrame({
+        "date": np.tile(dates, products),
+        "product": np.repeat([f"P{i}" for i in range(products)], days),
+        "sales": rng.poisson(np.repeat(rng.uniform(1, 20, products), days)).astype(float),
+    })
+
+
+def write(store, df, organization_id=1):
+    store.write(SALES_FEATURES, df, organization_id)
+    # Make the rewrite visible to the (mtime, size) signature even within one clock tick
+    path = os.path.join(store.path(SALES_FEATURES), VERSION_FILE)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def full_report(sales, stock):
+    inventory = pd.DataFrame({"product": list(stock), "current_stock": list(stock.values())})
+    report = compute_reorder_report(sales, inventory=inventory)
+    return report.sort_values("product").reset_index(drop=True)
+
+
+def assert_same(report, expected):
+    report = report.sort_values("product").reset_index(drop=True)
+    pd.testing.assert_frame_equal(report[REPORT_COLUMNS], expected[REPORT_COLUMNS], check_dtype=False)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ParquetStore(str(tmp_path / "store"))
+
+
+@pytest.fixture
+def service(store):
+    cache = DatasetCache(loader=store.read, signature=store.version)
+    return InventoryService(functools.partial(cache.get, SALES_FEATURES))
+
+
+def test_incremental_evaluations_match_a_full_recompute(store, service):
+    sales = sales_frame()
+    write(store, sales)
+    stock = {f"P{i}": 10.0 for i in range(6)}
+
+    report, unknown = service.evaluate(1, stock=stock)
+    assert unknown == []
+    assert_same(report, full_report(sales, stock))
+    assert service.rows_recomputed == 6
+
+    # New stock for one product, new history for another: only those two are recomputed
+    stock["P1"] = 500.0
+    sales.loc[sales["product"] == "P4", "sales"] += 3
+    write(store, sales)
+    report, _ = service.evaluate(1, stock={"P1": 500.0})
+
+    assert_same(report, full_report(sales, stock))
+    assert service.rows_recomputed == 8
+    assert service.stats()["stats_recomputed_products"] == 7
+
+
+def test_unknown_products_and_overrides(store, service):
+    sales = sales_frame()
+    write(store, sales)
+
+    report, unknown = service.evaluate(1, ["P0", "P2", "nope"], overrides={"P2": {"lead_time_days": 30}})
+    assert unknown == ["nope"]
+    expected = compute_reorder_report(sales[sales["product"].isin(["P0", "P2"])],
+                                      lead_time_days={"P0": LEAD_TIME_DAYS, "P2": 30}, current_stock=CURRENT_STOCK)
+    assert_same(report, expected.sort_values("product").reset_index(drop=True))
+
+
+def test_quantities_have_one_type_per_response(store, service):
+    write(store, sales_frame())
+    # Stocked well above the reorder points: nothing to order
+    service.evaluate(1, stock={f"P{i}": 10000.0 for i in range(6)})
+    # A later call recomputes one product with a fractional stock level
+    report, _ = service.evaluate(1, stock={"P3": 2.5})
+
+    for column in ("current_stock", "recommended_order_qty"):
+        assert {type(row[column]) for row in report_records(report)} == {float}
+    report, _ = service.evaluate(1, ["P0", "P1"])
+    for column in ("current_stock", "recommended_order_qty"):
+        assert report[column].dtype == np.int64
+
+
+def test_each_organization_gets_its_own_products(store, service):
+    report, _ = service.evaluate(1)
+    assert report.empty
+
+    write(store, sales_frame(products=3), 1)
+    write(store, sales_frame(seed=1, products=2).assign(product=lambda df: df["product"].str.replace("P", "Q")), 2)
+    assert sorted(service.evaluate(1)[0]["product"]) == ["P0", "P1", "P2"]
+    report, unknown = service.evaluate(2, ["Q0", "P0"])
+    assert list(report["product"]) == ["Q0"] and unknown == ["P0"]
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from deployment.jobs import (
+    CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager, JobQueueFull, UnknownJobKind,
+)
+
+
+class WaitParams(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    name: str = "job"
+
+
+def wait(context, organization_id, params, release):
+    """Job reporting progress until `release` is set (or it is cancelled)."""
+    while not release.wait(0.01):
+        context.progress(0.5)
+    return {"organization_id": organization_id, "name": params.name}
+
+
+def fail(context, organization_id, params):
+    raise RuntimeError("boom")
+
+
+@pytest.fixture
+def release():
+    return threading.Event()
+
+
+@pytest.fixture
+def manager(release):
+    manager = JobManager(max_workers=2, organization_concurrency=1, max_queued_per_organization=2)
+    manager.register("wait", lambda context, **kwargs: wait(context, release=release, **kwargs), WaitParams)
+    manager.register("fail", fail, WaitParams)
+    yield manager
+    release.set()
+    manager.shutdown()
+
+
+def until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_unknown_kinds_and_parameters_are_rejected(manager):
+    with pytest.raises(UnknownJobKind):
+        manager.submit("nope", 1)
+    with pytest.raises(ValidationError):
+        manager.submit("wait", 1, {"name": "x", "extra": 1})
+
+
+def test_identical_active_jobs_are_deduplicated(manager):
+    first = manager.submit("wait", 1, {"name": "a"})
+    assert manager.submit("wait", 1, {"name": "a"}) is first
+    assert manager.submit("wait", 2, {"name": "a"}) is not first
+
+
+def test_organization_concurrency_and_queue_limit(manager, release):
+    running = manager.submit("wait", 1, {"name": "a"})
+    queued = [manager.submit("wait", 1, {"name": name}) for name in "bc"]
+    other = manager.submit("wait", 2)
+
+    until(lambda: other.status == RUNNING)
+    assert running.status == RUNNING
+    assert [job.status for job in queued] == [QUEUED, QUEUED]
+    with pytest.raises(JobQueueFull):
+        manager.submit("wait", 1, {"name": "d"})
+
+    release.set()
+    until(lambda: all(job.status == SUCCEEDED for job in [running, other, *queued]))
+    assert queued[1].result == {"organization_id": 1, "name": "c"}
+
+
+def test_cancelling_queued_and_running_jobs(manager):
+    running = manager.submit("wait", 1, {"name": "a"})
+    queued = manager.submit("wait", 1, {"name": "b"})
+    until(lambda: running.status == RUNNING)
+
+    assert manager.cancel(queued.id).status == CANCELLED
+    manager.cancel(running.id)
+    until(lambda: running.status == CANCELLED)
+    assert running.error is None
+    assert manager.stats()["running"] == 0
+
+    # A cancelled job frees its slot and its key
+    again = manager.submit("wait", 1, {"name": "a"})
+    assert again is not running
+    until(lambda: again.status == RUNNING)
+
+
+def test_failures_are_recorded(manager):
+    job = manager.submit("fail", 1)
+    until(lambda: job.status == FAILED)
+    assert job.error == "RuntimeError: boom"
+    assert job.to_dict()["params"] == {"name": "job"}
+
+
+def test_job_endpoints_are_scoped_to_the_organization(client, admin, member):
+    job = client.post("/api/jobs/1", json={"kind": "reorder_report"}, headers=admin)
+    assert job.status_code == 202
+    job_id = job.json()["data"]["id"]
+
+    for method, path in [("POST", "/api/jobs/1"), ("GET", "/api/jobs/1"), ("GET", f"/api/jobs/1/{job_id}"),
+                         ("DELETE", f"/api/jobs/1/{job_id}"), ("POST", "/api/woocommerce/sync/1")]:
+        assert client.request(method, path, json={"kind": "reorder_report"}, headers=member).status_code == 403
+    assert client.get(f"/api/jobs/2/{job_id}", headers=member).status_code == 404
+    assert client.get(f"/api/jobs/1/{job_id}", headers=admin).status_code == 200
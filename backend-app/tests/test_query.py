@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from data_ingestion.woocommerce_sync import WOOCOMMERCE_ORDERS
+from deployment.query import (
+    NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, ListingQuery, decode_cursor, encode_cursor, page_headers,
+)
+
+ORDERS = pd.DataFrame({
+    "order_id": range(1, 11),
+    "date_created": [f"2024-01-{day:02d} 10:30:00" for day in range(1, 11)],
+    "product_id": [1, 2] * 5,
+    "status": ["completed", "Processing"] * 5,
+    "total": [f"{n}.00" for n in range(1, 11)],
+})
+ORDER_FILTERS = {"date_column": ("date", "date_created"), "product_column": "product_id",
+                 "status_column": "status", "status_default": "completed"}
+
+
+def query(**kwargs):
+    params = dict(limit=None, cursor=None, fields=None, start_date=None, end_date=None, product_id=None, status=None)
+    return ListingQuery(**{**params, **kwargs})
+
+
+def test_cursors_round_trip_and_reject_garbage():
+    assert decode_cursor(encode_cursor(1234)) == 1234
+    for cursor in ("not-a-cursor", encode_cursor(-1), encode_cursor("5")):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor)
+        assert error.value.status_code == 400
+
+
+def test_pages_follow_the_cursor_to_the_end():
+    seen, cursor = [], None
+    while True:
+        page, total, cursor = query(limit=4, cursor=cursor).page(ORDERS)
+        assert total == 10
+        seen += page["order_id"].tolist()
+        if cursor is None:
+            break
+    assert seen == list(range(1, 11))
+    page, total, cursor = query().page(ORDERS)
+    assert (len(page), total, cursor) == (10, 10, None)
+
+
+def test_date_product_and_status_filters():
+    # A bare end date includes the whole day
+    rows = query(start_date="2024-01-03", end_date="2024-01-06").filter(ORDERS, **ORDER_FILTERS)
+    assert rows["order_id"].tolist() == [3, 4, 5, 6]
+    rows = query(product_id=2, status="processing").filter(ORDERS, **ORDER_FILTERS)
+    assert rows["order_id"].tolist() == [2, 4, 6, 8, 10]
+    assert query(status="refunded").filter(ORDERS, **ORDER_FILTERS).empty
+
+
+def test_filters_on_missing_columns_use_the_serialized_default():
+    no_status = ORDERS.drop(columns="status")
+    assert len(query(status="COMPLETED").filter(no_status, **ORDER_FILTERS)) == 10
+    assert query(status="processing").filter(no_status, **ORDER_FILTERS).empty
+    assert query(start_date="2024-01-01").filter(ORDERS.drop(columns="date_created"), **ORDER_FILTERS).empty
+
+
+def test_projection_and_invalid_parameters():
+    assert query(fields="id, status").projection(("id", "status", "total")) == {"id", "status"}
+    assert query().projection(("id",)) is None
+    with pytest.raises(HTTPException, match="Unknown fields: nope"):
+        query(fields="id,nope").projection(("id",))
+    with pytest.raises(HTTPException, match="Invalid start_date"):
+        query(start_date="yesterday-ish")
+    assert page_headers(3, None) == {TOTAL_COUNT_HEADER: "3"}
+
+
+def test_order_listing_pages_filters_and_projects(api, client, admin):
+    api.sales_store.write(WOOCOMMERCE_ORDERS, ORDERS, 4, date_col="date_created")
+    url = "/api/woocommerce/orders/4"
+
+    response = client.get(url, params={"limit": 2, "status": "processing", "fields": "id,status"}, headers=admin)
+    assert response.headers[TOTAL_COUNT_HEADER] == "5"
+    assert response.json()["data"] == [{"id": 2, "status": "Processing"}, {"id": 4, "status": "Processing"}]
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3, "start_date": "2024-01-02", "end_date": "2024-01-09"}
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}, headers=admin)
+        ids += [order["id"] for order in response.json()["data"]]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert ids == list(range(2, 10))
+    assert client.get(url, params={"cursor": "garbage"}, headers=admin).status_code == 400
+    assert client.get(url, params={"fields": "nope"}, headers=admin).status_code == 400
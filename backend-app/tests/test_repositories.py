@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select
+
+from storage.database import (
+    FORECAST_KEY_INDEX, MigrationRequired, count_duplicate_forecasts, create_db_engine, dedupe_forecasts,
+    init_database, organizations, sales_forecasts,
+)
+from storage.repositories import DuplicateRecord, ForecastRepository, MissingRecord
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.sqlite3'}")
+    init_database(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(organizations).values(name="Other"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def forecasts(engine):
+    return ForecastRepository(engine, batch_rows=3)
+
+
+def stored(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(select(sales_forecasts).order_by(sales_forecasts.c.organization_id,
+                                                                   sales_forecasts.c.product_id,
+                                                                   sales_forecasts.c.forecast_date))
+        return [(row.organization_id, row.product_id, row.forecast_date, row.forecasted_sales) for row in rows]
+
+
+def test_bulk_upsert_inserts_then_updates_on_the_forecast_key(engine, forecasts):
+    rows = [{"product_id": p, "forecasted_sales": 10 * p, "forecast_date": f"2024-01-0{d}"}
+            for p in (1, 2) for d in (1, 2, 3, 4)]
+    assert forecasts.bulk_upsert(1, rows) == 8
+    assert forecasts.bulk_upsert(1, [{"product_id": 1, "forecasted_sales": 99, "forecast_date": "2024-01-02"}]) == 1
+
+    rows = stored(engine)
+    assert len(rows) == 8
+    assert (1, 1, datetime(2024, 1, 2), 99) in rows
+    assert (1, 2, datetime(2024, 1, 2), 20) in rows
+
+
+def test_bulk_upsert_normalizes_the_key_and_keeps_the_last_repeat(engine, forecasts):
+    rows = pd.DataFrame({
+        "product_id": ["3", 3, 3],
+        "forecasted_sales": [1, 2.0, 8.0],
+        # The same instant, naive UTC and in two other offsets
+        "forecast_date": ["2024-03-01T12:00:00", "2024-03-01T14:00:00+02:00", "2024-03-01T07:00:00-05:00"],
+    })
+    assert forecasts.bulk_upsert(1, rows) == 1
+    assert stored(engine) == [(1, 3, datetime(2024, 3, 1, 12), 8)]
+
+    # The same key from another organization is a separate row
+    forecasts.bulk_upsert(2, [{"product_id": 3, "forecasted_sales": 2, "forecast_date": "2024-03-01T12:00:00Z"}])
+    assert stored(engine) == [(1, 3, datetime(2024, 3, 1, 12), 8), (2, 3, datetime(2024, 3, 1, 12), 2)]
+
+
+def test_bulk_upsert_rejects_fractional_forecasts(engine, forecasts):
+    rows = [{"product_id": 1, "forecasted_sales": 4, "forecast_date": "2024-01-01"},
+            {"product_id": 2, "forecasted_sales": 2.5, "forecast_date": "2024-01-01"}]
+    with pytest.raises(ValueError, match="whole units"):
+        forecasts.bulk_upsert(1, rows)
+    assert stored(engine) == []
+
+
+def test_bulk_upsert_of_an_unknown_organization_writes_nothing(engine, forecasts):
+    with pytest.raises(MissingRecord):
+        forecasts.bulk_upsert(42, [{"product_id": 1, "forecasted_sales": 1, "forecast_date": "2024-01-01"}])
+    assert stored(engine) == []
+    with pytest.raises(MissingRecord):
+        forecasts.create(42, 1, 5)
+
+
+def test_create_and_update_store_aware_dates_as_naive_utc(engine, forecasts):
+    aware = datetime(2024, 5, 1, 9, tzinfo=timezone(timedelta(hours=-4)))
+    created = forecasts.create(1, 7, 5, aware)
+    assert created["forecast_date"] == "2024-05-01T13:00:00"
+    with pytest.raises(DuplicateRecord):
+        forecasts.create(1, 7, 6, datetime(2024, 5, 1, 13))
+
+    updated = forecasts.update(1, created["id"], forecast_date=datetime(2024, 5, 2, tzinfo=timezone.utc))
+    assert updated["forecast_date"] == "2024-05-02T00:00:00"
+
+
+def test_update_and_delete_are_scoped_to_the_organization(engine, forecasts):
+    forecast_id = forecasts.create(1, 7, 5, datetime(2024, 5, 1))["id"]
+
+    assert forecasts.update(2, forecast_id, forecasted_sales=9) is None
+    assert forecasts.delete(2, forecast_id) is False
+    assert forecasts.get(forecast_id)["forecasted_sales"] == 5
+
+    assert forecasts.update(1, forecast_id, forecasted_sales=9)["forecasted_sales"] == 9
+    assert forecasts.delete(1, forecast_id) is True
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(sales_forecasts)).scalar() == 0
+
+
+def test_startup_refuses_duplicate_forecasts_instead_of_deleting_them(engine):
+    # A table created by the frontend's migrations: no unique forecast key
+    rows = [{"organization_id": 1, "product_id": 1, "forecast_date": datetime(2024, 1, 1), "forecasted_sales": value}
+            for value in (1, 2, 3)]
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP INDEX {FORECAST_KEY_INDEX}")
+        connection.execute(insert(sales_forecasts), rows)
+
+    with pytest.raises(MigrationRequired, match="dedupe-forecasts"):
+        init_database(engine)
+    assert count_duplicate_forecasts(engine) == 2
+    assert len(stored(engine)) == 3
+
+    assert dedupe_forecasts(engine) == 2
+    init_database(engine)
+    assert stored(engine) == [(1, 1, datetime(2024, 1, 1), 3)]
+    with pytest.raises(DuplicateRecord):
+        ForecastRepository(engine).create(1, 1, 4, datetime(2024, 1, 1))
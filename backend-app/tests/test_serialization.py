@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.responses import JSONResponse
+
+from deployment.serialization import dumps, forecast_columns, order_columns, product_columns, records
+
+NOW = "2024-06-01T12:00:00"
+
+
+# The payloads the endpoints built row by row before the columnar serializers
+
+def iterrows_forecasts(df, organization_id):
+    return [{
+        "id": int(row.get('product_id', 0)),
+        "product_id": int(row.get('product_id', 0)),
+        "forecasted_sales": float(row.get('quantity', 0)),
+        "forecast_date": NOW,
+        "organization_id": organization_id,
+    } for _, row in df.iterrows()]
+
+
+def iterrows_products(df):
+    return [{
+        "id": int(row.get('product_id', 0)),
+        "name": str(row.get('product_name', 'Unknown')),
+        "price": str(row.get('price', '0')),
+        "status": 'publish',
+        "stock_quantity": int(row.get('quantity', 0)),
+    } for _, row in df.iterrows()]
+
+
+def iterrows_orders(df):
+    return [{
+        "id": int(row.get('order_id', 0)),
+        "status": str(row.get('status', 'completed')),
+        "total": str(row.get('total', '0')),
+        "date_created": str(row.get('date', NOW)),
+        "customer_id": int(row.get('customer_id', 0)) if 'customer_id' in df.columns else None,
+    } for _, row in df.iterrows()]
+
+
+def assert_same_bytes(columns, legacy):
+    payload = {"success": True, "data": records(columns)}
+    assert dumps(payload, columns) == JSONResponse({"success": True, "data": legacy}).body
+
+
+FRAMES = {
+    "mixed": pd.DataFrame({
+        "product_id": [1, 2, 3], "product_name": ["Café", "Ünïcode ☕", "plain"], "price": [9.5, 10.0, 0.25],
+        "quantity": [3, 0, 12], "order_id": [10, 11, 12], "status": ["completed", "processing", "refunded"],
+        "total": ["19.00", "0.00", "3.00"], "date": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        "customer_id": [7, 8, 9],
+    }),
+    # iterrows() upcasts every cell of an all-numeric frame to float64
+    "numeric": pd.DataFrame({"product_id": [1, 2, 3], "quantity": [1.5, 2.75, 1e-5], "order_id": [4, 5, 6],
+                             "customer_id": [1, 2, 3], "total": [1.0, 2.5, 3.25]}),
+    # Floats json.dumps writes in exponent notation
+    "exponents": pd.DataFrame({"product_id": [1, 2, 3], "quantity": [1e-7, 2e16, 123456789012345680.0],
+                               "product_name": ["a", "b", "c"]}),
+    "missing_columns": pd.DataFrame({"other": ["x", "y"]}),
+}
+
+
+@pytest.mark.parametrize("name", sorted(FRAMES))
+def test_forecast_payloads_are_byte_identical(name):
+    df = FRAMES[name]
+    assert_same_bytes(forecast_columns(df, 1, now=NOW), iterrows_forecasts(df, 1))
+
+
+@pytest.mark.parametrize("name", sorted(FRAMES))
+def test_product_payloads_are_byte_identical(name):
+    df = FRAMES[name]
+    assert_same_bytes(product_columns(df), iterrows_products(df))
+
+
+@pytest.mark.parametrize("name", sorted(FRAMES))
+def test_order_payloads_are_byte_identical(name):
+    df = FRAMES[name]
+    assert_same_bytes(order_columns(df, now=NOW), iterrows_orders(df))
+
+
+def test_fields_restrict_and_order_the_columns():
+    df = FRAMES["mixed"]
+    columns = product_columns(df, fields=("name", "id"))
+    assert list(columns) == ["id", "name"]
+    assert records(columns)[0] == {"id": 1, "name": "Café"}
+
+
+def test_coercion_errors_match_iterrows():
+    df = pd.DataFrame({"product_id": [1.0, np.nan], "quantity": [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        iterrows_forecasts(df, 1)
+    with pytest.raises(ValueError):
+        forecast_columns(df, 1, now=NOW)
+    # NaN is not valid JSON for either encoder
+    columns = forecast_columns(df.fillna(0).assign(quantity=[1.0, np.nan]), 1, now=NOW)
+    with pytest.raises(ValueError):
+        dumps({"data": records(columns)}, columns)
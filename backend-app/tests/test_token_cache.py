@@ -0,0 +1,61 @@
+from deployment.token_cache import TokenCache
+from tests.conftest import ADMIN, login
+
+USER = {"id": 1, "email": "admin@example.com", "name": "Admin User", "organization_id": 1}
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = TokenCache(ttl=60, clock=clock)
+    cache.put("token", USER)
+
+    clock.now += 59
+    assert cache.get("token") is USER
+    clock.now += 1
+    assert cache.get("token") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_entries_never_outlive_the_exp_claim():
+    clock = Clock()
+    cache = TokenCache(ttl=60, clock=clock)
+    cache.put("token", USER, expires_at=clock.now + 10)
+
+    clock.now += 10
+    assert cache.get("token") is None
+
+
+def test_least_recently_used_tokens_are_evicted():
+    cache = TokenCache(max_entries=2, clock=Clock())
+    cache.put("a", USER)
+    cache.put("b", USER)
+    cache.get("a")
+    cache.put("c", USER)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is USER and cache.get("c") is USER
+    stats = cache.stats()
+    assert (stats["evictions"], stats["hits"], stats["misses"]) == (1, 3, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_logout_revokes_the_cached_token(client):
+    headers = login(client, ADMIN)
+    assert client.get("/api/system/cache", headers=headers).status_code == 200
+    before = client.get("/api/system/cache", headers=headers).json()["data"]["tokens"]
+    assert before["hits"] >= 1
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    response = client.get("/api/system/cache", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+    # Other tokens of the user stay valid
+    assert client.get("/api/system/cache", headers=login(client, ADMIN)).status_code == 200
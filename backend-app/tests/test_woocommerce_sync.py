@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from data_ingestion.process_woocommerce_export import WooCommerceDataProcessor
+from data_ingestion.woocommerce_standin import StandInServer
+from data_ingestion.woocommerce_sync import (
+    CURSOR_OVERLAP_SECONDS, WOOCOMMERCE_ORDERS, WooCommerceSync, _gmt, order_lines,
+)
+from storage.parquet_store import CLEANED_SALES, ParquetStore
+
+COLUMNS = ['order_id', 'product_id', 'quantity', 'status']
+
+
+class EditingServer(StandInServer):
+    """Stand-in server that edits orders while the sync is reading their pages."""
+
+    def __init__(self, edit_on_requests, **kwargs):
+        super().__init__(**kwargs)
+        self.edit_on_requests = set(edit_on_requests)
+        self.orders_served = 0
+        # Every edit is stamped a minute after the previous one (the modified_after filter has one-second resolution)
+        self.clock = datetime.now(timezone.utc)
+
+    def page(self, resource, query):
+        response = super().page(resource, query)
+        if resource == "orders":
+            self.orders_served += 1
+            if self.orders_served in self.edit_on_requests:
+                # Edits move records from the pages already read to the end of the modified order
+                self.clock += timedelta(minutes=1)
+                self.modify(orders=40, new_orders=5, now=self.clock)
+        return response
+
+
+class SlowServer(StandInServer):
+    """Stand-in server that takes a while per page and records how many requests overlap."""
+
+    def __init__(self, delay=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.windows = set()
+        self._counter = threading.Lock()
+
+    def page(self, resource, query):
+        with self._counter:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if resource == "orders" and "modified_before" in query:
+                self.windows.add(query["modified_before"][0])
+        try:
+            time.sleep(self.delay)
+            return super().page(resource, query)
+        finally:
+            with self._counter:
+                self.in_flight -= 1
+
+
+def stored_lines(sync, organization_id=1):
+    stored = sync.store.read(WOOCOMMERCE_ORDERS, columns=COLUMNS, organization_id=organization_id)
+    return sorted(stored.astype(str).values.tolist())
+
+
+def server_lines(server):
+    return sorted(order_lines(server.orders)[COLUMNS].astype(str).values.tolist())
+
+
+def run_sync(server, tmp_path, **kwargs):
+    sync = WooCommerceSync(ParquetStore(str(tmp_path / "store")), str(tmp_path / "sync"), per_page=50,
+                           backoff_base=0.01)
+    connection = (server.url, server.consumer_key, server.consumer_secret)
+    return sync, asyncio.run(sync.sync(1, connection, **kwargs))
+
+
+def test_records_edited_during_the_fetch_are_not_lost(tmp_path):
+    with EditingServer(edit_on_requests={2, 5, 9}, orders=600, products=20, seed=7) as server:
+        sync, result = run_sync(server, tmp_path)
+
+        assert result["orders"] == len(server.orders)
+        assert stored_lines(sync) == server_lines(server)
+
+
+def test_incremental_sync_after_edits_during_the_fetch(tmp_path):
+    with EditingServer(edit_on_requests={3}, orders=400, products=20, seed=11) as server:
+        sync, _ = run_sync(server, tmp_path)
+        server.edit_on_requests = {server.orders_served + 1}
+        server.clock += timedelta(minutes=1)
+        server.modify(orders=60, products=3, new_orders=10, now=server.clock)
+        sync, result = run_sync(server, tmp_path)
+
+        assert result["orders"] >= 70
+        assert stored_lines(sync) == server_lines(server)
+
+
+def partition_files(store, dataset, organization_id=1):
+    root = store.path(dataset, organization_id)
+    return {month: sorted(os.listdir(os.path.join(root, month))) for month in os.listdir(root)}
+
+
+def test_incremental_sync_rewrites_only_the_changed_months(tmp_path):
+    with EditingServer(edit_on_requests=(), orders=2000, products=20, seed=3) as server:
+        sync, first = run_sync(server, tmp_path)
+        before = partition_files(sync.store, WOOCOMMERCE_ORDERS)
+        order = server.orders[0]
+        order["line_items"][0]["quantity"] += 1
+        order["date_modified_gmt"] = (server.clock + timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%S")
+        sync, result = run_sync(server, tmp_path)
+        after = partition_files(sync.store, WOOCOMMERCE_ORDERS)
+
+        changed = {month for month in before if before[month] != after.get(month)}
+        # The edited order, plus those sharing the previous cursor's second (the windows overlap)
+        since = _gmt(first["cursors"]["orders"]) - timedelta(seconds=CURSOR_OVERLAP_SECONDS)
+        fetched = [o for o in server.orders if _gmt(o["date_modified_gmt"]) > since]
+        assert result["orders"] == len(fetched)
+        assert changed == {"year_month=" + o["date_created"][:7] for o in fetched}
+        assert len(before) > 1 and set(after) == set(before)
+        assert stored_lines(sync) == server_lines(server)
+        daily = sync.store.read(CLEANED_SALES, columns=['date', 'product', 'sales'], organization_id=1)
+        expected = WooCommerceDataProcessor().daily_sales_frame(order_lines(server.orders))
+        assert sorted(daily.astype(str).values.tolist()) == sorted(expected.astype(str).values.tolist())
+
+
+def test_cursors_are_saved_and_bound_the_next_fetch(tmp_path):
+    with EditingServer(edit_on_requests=(), orders=300, products=20, seed=5) as server:
+        sync, first = run_sync(server, tmp_path)
+        newest = max(_gmt(o["date_modified_gmt"]) for o in server.orders)
+        assert _gmt(first["cursors"]["orders"]) == newest
+        assert sync.load_cursors(1) == first["cursors"]
+
+        sync, unchanged = run_sync(server, tmp_path)
+        # Nothing changed: only the records inside the overlap window are fetched again
+        overlap = newest - timedelta(seconds=CURSOR_OVERLAP_SECONDS)
+        assert unchanged["orders"] == sum(_gmt(o["date_modified_gmt"]) > overlap for o in server.orders)
+        assert unchanged["cursors"] == first["cursors"]
+
+        sync, full = run_sync(server, tmp_path, full=True)
+        assert full["orders"] == len(server.orders)
+        assert stored_lines(sync) == server_lines(server)
+
+
+def test_time_windows_are_fetched_concurrently(tmp_path):
+    with SlowServer(orders=1000, products=20, seed=13) as server:
+        sync, result = run_sync(server, tmp_path)
+
+        assert server.max_in_flight >= 4
+        # The 20 pages are split into one window per connection, the last one open-ended
+        assert len(server.windows) == 7
+        assert result["orders"] == len(server.orders)
+        assert stored_lines(sync) == server_lines(server)
@@ -0,0 +1,31 @@
+"use client";
+import { useInfiniteQuery } from '@tanstack/react-query';
+import { apiService, ListQuery } from '../lib/api';
+// import { mockApiService } from '../lib/mock-data'; // Uncomment to use mock data instead of backend
+
+// Pages through an organization's sales forecasts: every page requests the
+// cursor the previous one returned in X-Next-Cursor, and `total` is the
+// number of matching rows (X-Total-Count).
+export const useSalesForecasts = (organizationId: number, query: Omit<ListQuery, 'cursor'> = {}) => {
+  return useInfiniteQuery({
+    queryKey: ['sales-forecasts', organizationId, query],
+    queryFn: async ({ pageParam }) => {
+      const response = await apiService.getSalesForecasts(organizationId, { ...query, cursor: pageParam });
+
+      // Alternative: Use mock data (uncomment the line below and comment the line above)
+      // const response = await mockApiService.getSalesForecasts(organizationId, { ...query, cursor: pageParam });
+
+      if (response.success && response.data) {
+        return {
+          items: response.data,
+          total: response.total ?? response.data.length,
+          nextCursor: response.nextCursor ?? null,
+        };
+      }
+      throw new Error(response.error || 'Failed to fetch sales forecasts');
+    },
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
+    enabled: !!organizationId,
+  });
+};
@@ -39,6 +39,33 @@ export interface WooCommerceOrder {
   customerId?: number;
 }
 
+// Server-side pagination, projection and filters for the listing endpoints.
+// The total number of matching rows is returned in the X-Total-Count header
+// and the cursor of the next page in X-Next-Cursor.
+export interface ListQuery {
+  limit?: number;
+  cursor?: string;
+  fields?: string[];
+  startDate?: string;
+  endDate?: string;
+  productId?: number;
+  status?: string;
+}
+
+function toQueryString(query?: ListQuery): string {
+  if (!query) return '';
+  const params = new URLSearchParams();
+  if (query.limit !== undefined) params.set('limit', String(query.limit));
+  if (query.cursor) params.set('cursor', query.cursor);
+  if (query.fields?.length) params.set('fields', query.fields.join(','));
+  if (query.startDate) params.set('start_date', query.startDate);
+  if (query.endDate) params.set('end_date', query.endDate);
+  if (query.productId !== undefined) params.set('product_id', String(query.productId));
+  if (query.status) params.set('status', query.status);
+  const qs = params.toString();
+  return qs ? `?${qs}` : '';
+}
+
 export interface User {
   id: number;
   email: string;
@@ -70,6 +97,21 @@ export interface ApiResponse<T> {
   message?: string;
 }
 
+// Paging of a listing response: the number of matching rows (X-Total-Count)
+// and the cursor of the next page (X-Next-Cursor, null on the last page).
+export interface PageInfo {
+  total?: number;
+  nextCursor?: string | null;
+}
+
+export type PagedResponse<T> = ApiResponse<T[]> & PageInfo;
+
+function pageInfo(headers: Headers): PageInfo {
+  const total = headers.get('X-Total-Count');
+  if (total === null) return {};
+  return { total: Number(total), nextCursor: headers.get('X-Next-Cursor') };
+}
+
 class ApiService {
   private getAuthHeaders(): Record<string, string> {
     const token = this.getToken();
@@ -99,7 +141,7 @@ class ApiService {
   private async request<T>(
     endpoint: string,
     options: RequestInit = {}
-  ): Promise<ApiResponse<T>> {
+  ): Promise<ApiResponse<T> & PageInfo> {
     try {
       const url = `${API_BASE_URL}${endpoint}`;
       const headers = {
@@ -123,7 +165,7 @@ class ApiService {
       }
 
       const data = await response.json();
-      return data;
+      return { ...data, ...pageInfo(response.headers) };
     } catch (error) {
       console.error('API request failed:', error);
       return {
@@ -213,8 +255,8 @@ class ApiService {
   }
 
   // Sales forecasts endpoints
-  async getSalesForecasts(organizationId: number): Promise<ApiResponse<SalesForecast[]>> {
-    return this.request<SalesForecast[]>(`/api/sales-forecasts/${organizationId}`);
+  async getSalesForecasts(organizationId: number, query?: ListQuery): Promise<PagedResponse<SalesForecast>> {
+    return this.request<SalesForecast[]>(`/api/sales-forecasts/${organizationId}${toQueryString(query)}`);
   }
 
   async createSalesForecast(data: Omit<SalesForecast, 'id' | 'forecastDate'>): Promise<ApiResponse<SalesForecast>> {
@@ -244,12 +286,12 @@ class ApiService {
     });
   }
 
-  async getWooCommerceProducts(organizationId: number): Promise<ApiResponse<WooCommerceProduct[]>> {
-    return this.request<WooCommerceProduct[]>(`/api/woocommerce/products/${organizationId}`);
+  async getWooCommerceProducts(organizationId: number, query?: ListQuery): Promise<PagedResponse<WooCommerceProduct>> {
+    return this.request<WooCommerceProduct[]>(`/api/woocommerce/products/${organizationId}${toQueryString(query)}`);
   }
 
-  async getWooCommerceOrders(organizationId: number): Promise<ApiResponse<WooCommerceOrder[]>> {
-    return this.request<WooCommerceOrder[]>(`/api/woocommerce/orders/${organizationId}`);
+  async getWooCommerceOrders(organizationId: number, query?: ListQuery): Promise<PagedResponse<WooCommerceOrder>> {
+    return this.request<WooCommerceOrder[]>(`/api/woocommerce/orders/${organizationId}${toQueryString(query)}`);
   }
 }
 
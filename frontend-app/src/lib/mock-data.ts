@@ -1,5 +1,18 @@
 // Mock data service for development and testing
-import { DashboardData, Organization, SalesForecast, WooCommerceProduct, WooCommerceOrder, ApiResponse } from './api';
+import { DashboardData, Organization, SalesForecast, WooCommerceProduct, WooCommerceOrder, ApiResponse, ListQuery, PagedResponse } from './api';
+
+// One page of `items` with the paging the backend returns in X-Total-Count / X-Next-Cursor
+// (the mock cursor is the offset of the next page)
+function paginate<T>(items: T[], query?: ListQuery): PagedResponse<T> {
+  const offset = query?.cursor ? Number(query.cursor) : 0;
+  const end = offset + (query?.limit ?? items.length);
+  return {
+    success: true,
+    data: items.slice(offset, end),
+    total: items.length,
+    nextCursor: end < items.length ? String(end) : null
+  };
+}
 
 // Mock dashboard data
 export const mockDashboardData: DashboardData = {
@@ -179,15 +192,12 @@ class MockApiService {
   }
 
   // Sales forecasts endpoints
-  async getSalesForecasts(organizationId: number): Promise<ApiResponse<SalesForecast[]>> {
+  async getSalesForecasts(organizationId: number, query?: ListQuery): Promise<PagedResponse<SalesForecast>> {
     await this.delay(600);
     
     const forecasts = mockSalesForecasts.filter(forecast => forecast.organizationId === organizationId);
     
-    return {
-      success: true,
-      data: forecasts
-    };
+    return paginate(forecasts, query);
   }
 
   async createSalesForecast(data: Omit<SalesForecast, 'id' | 'forecastDate'>): Promise<ApiResponse<SalesForecast>> {
@@ -261,22 +271,16 @@ class MockApiService {
     };
   }
 
-  async getWooCommerceProducts(organizationId: number): Promise<ApiResponse<WooCommerceProduct[]>> {
+  async getWooCommerceProducts(organizationId: number, query?: ListQuery): Promise<PagedResponse<WooCommerceProduct>> {
     await this.delay(900);
     
-    return {
-      success: true,
-      data: mockWooCommerceProducts
-    };
+    return paginate(mockWooCommerceProducts, query);
   }
 
-  async getWooCommerceOrders(organizationId: number): Promise<ApiResponse<WooCommerceOrder[]>> {
+  async getWooCommerceOrders(organizationId: number, query?: ListQuery): Promise<PagedResponse<WooCommerceOrder>> {
     await this.delay(800);
     
-    return {
-      success: true,
-      data: mockWooCommerceOrders
-    };
+    return paginate(mockWooCommerceOrders, query);
   }
 }
 